@@ -1,16 +1,38 @@
 # Voronoi Diagram Module
 from geometry import Coordinate, Point, Vertex, HalfEdge
-from polygon import Polygon
+from precision import Precision
+from polygon import Polygon, clip_ring
 from events import Event, SiteEvent, CircleEvent
 from beachline import Arc, Breakpoint
 from tree import Node, LeafNode, InternalNode, Tree
-from voronoi import Voronoi
+from voronoi import Voronoi, SweepCancelled
+from delaunay import DelaunayTriangulation
+from culling import SiteIndex
+from region import Region, clip_to_regions, create_region_diagrams
+from locate import CellLocator
+from ordering import hilbert_keys, hilbert_order, reorder_diagram
+from batch import DiagramBatch, create_voronoi_diagrams
+from shared import SharedDiagram, share_diagram
+from outofcore import CellStore, create_voronoi_diagram_out_of_core
+from periodic import create_periodic_voronoi_diagram, fold_cells
+from raster import jump_flood, rasterize_voronoi, rasterize_cells
+from export import GeoJSONWriter, WKBWriter, SVGWriter
+from interpolate import NaturalNeighborInterpolator
+from tracing import TraceRecorder, load_trace, replay
 from utils import (
     create_voronoi_diagram,
+    default_bounding_box,
     visualize_voronoi,
     generate_random_points,
     generate_grid_points,
     generate_circle_points
 )
 
-__version__ = '1.0.0'
\ No newline at end of file
+__version__ = '1.0.0'
+
+def __getattr__(name):
+    # The service pulls in asyncio and hashlib, so it is only loaded when asked for
+    if name == 'DiagramService':
+        from service import DiagramService
+        return DiagramService
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -0,0 +1,142 @@
+from itertools import repeat
+
+import numpy as np
+
+from geometry import Vertex
+from polygon import Polygon
+from utils import default_bounding_box
+from voronoi import Voronoi
+
+class DiagramBatch:
+    """
+    Array-backed results of many diagrams built over the same bounding polygon.
+
+    Per-diagram rows are concatenated; diagram i owns rows
+    `site_offsets[i]:site_offsets[i + 1]` of `sites` and `areas`, and likewise
+    for vertices and edges. Indices stored in `edges` (vertex pairs) and
+    `edge_sites` (the cells on either side, -1 for the outside) are local to
+    their diagram.
+    """
+
+    def __init__(self, sites, site_offsets, vertices, vertex_offsets, edges, edge_sites, edge_offsets, areas=None):
+        self.sites = sites
+        self.site_offsets = site_offsets
+        self.vertices = vertices
+        self.vertex_offsets = vertex_offsets
+        self.edges = edges
+        self.edge_sites = edge_sites
+        self.edge_offsets = edge_offsets
+        self.areas = areas
+
+    def __len__(self):
+        return len(self.site_offsets) - 1
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        sites = slice(self.site_offsets[index], self.site_offsets[index + 1])
+        vertices = slice(self.vertex_offsets[index], self.vertex_offsets[index + 1])
+        edges = slice(self.edge_offsets[index], self.edge_offsets[index + 1])
+        return {
+            'sites': self.sites[sites],
+            'vertices': self.vertices[vertices],
+            'edges': self.edges[edges],
+            'edge_sites': self.edge_sites[edges],
+            'areas': self.areas[sites] if self.areas is not None else None,
+        }
+
+    @staticmethod
+    def from_diagrams(diagrams, areas=False, dtype=np.float64):
+        return DiagramBatch.concatenate([_diagram_batch(diagram, areas, dtype) for diagram in diagrams])
+
+    @staticmethod
+    def concatenate(batches):
+        def offsets(name):
+            counts = np.concatenate([np.diff(getattr(batch, name)) for batch in batches] or [np.empty(0)])
+            return np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        def stack(name, shape, dtype):
+            arrays = [getattr(batch, name) for batch in batches]
+            return np.concatenate(arrays) if arrays else np.empty(shape, dtype=dtype)
+
+        dtype = batches[0].sites.dtype if batches else np.float64
+
+        areas = None
+        if batches and all(batch.areas is not None for batch in batches):
+            areas = np.concatenate([batch.areas for batch in batches])
+        return DiagramBatch(
+            stack('sites', (0, 2), dtype), offsets('site_offsets'),
+            stack('vertices', (0, 2), dtype), offsets('vertex_offsets'),
+            stack('edges', (0, 2), np.int32), stack('edge_sites', (0, 2), np.int32), offsets('edge_offsets'),
+            areas,
+        )
+
+def _diagram_batch(voronoi, areas=False, dtype=np.float64):
+    site_index = {id(site): index for index, site in enumerate(voronoi.sites)}
+    vertex_index = {}
+    vertices = []
+    edges = np.empty((len(voronoi.edges), 2), dtype=np.int32)
+    edge_sites = np.empty((len(voronoi.edges), 2), dtype=np.int32)
+    for row, edge in enumerate(voronoi.edges):
+        for column, half in enumerate((edge, edge.twin)):
+            origin: Vertex = half.origin
+            key = id(origin)
+            if key not in vertex_index:
+                vertex_index[key] = len(vertices)
+                vertices.append((origin.x, origin.y))
+            edges[row, column] = vertex_index[key]
+            point = half.incident_point
+            edge_sites[row, column] = site_index[id(point)] if point is not None else -1
+    sites = np.array([(site.x, site.y) for site in voronoi.sites], dtype=dtype).reshape(-1, 2)
+    vertices = np.array(vertices, dtype=dtype).reshape(-1, 2)
+    cell_areas = np.array([site.area() for site in voronoi.sites], dtype=dtype) if areas else None
+    return DiagramBatch(sites, np.array([0, len(sites)]), vertices, np.array([0, len(vertices)]),
+                        edges, edge_sites, np.array([0, len(edges)]), cell_areas)
+
+def _build_chunk(point_sets, polygon, areas, precision, dtype, engine):
+    diagrams = []
+    for points in point_sets:
+        voronoi = Voronoi(polygon.copy(), precision=precision, engine=engine)
+        voronoi.create_diagram(points=points)
+        diagrams.append(voronoi)
+    return DiagramBatch.from_diagrams(diagrams, areas=areas, dtype=dtype)
+
+def create_voronoi_diagrams(point_sets, bounding_polygon=None, processes=None, chunksize=64, areas=False,
+                            precision=None, dtype=np.float64, engine="fortune"):
+    """
+    Create many Voronoi diagrams that share one bounding polygon.
+
+    The polygon is preprocessed once and copied for each diagram, and results
+    come back as a DiagramBatch of flat arrays rather than object graphs, which
+    keeps transfer from worker processes cheap.
+
+    Args:
+        point_sets: Sequence of point lists, each a list of (x, y) coordinates
+        bounding_polygon: Optional list of (x, y) coordinates or a Polygon; defaults
+            to a box around all point sets
+        processes: Number of worker processes, or None to build in this process
+        chunksize: Number of diagrams sent to a worker per task
+        areas: Whether to compute cell areas
+        precision: Optional Precision for the predicates, e.g. Precision(exact=True) for integer input
+        dtype: Floating point type of the coordinate and area arrays, e.g. np.float32 to halve memory
+        engine: Construction engine passed to Voronoi, "fortune" or "delaunay"
+
+    Returns:
+        A DiagramBatch with one entry per point set, in input order
+    """
+    point_sets = list(point_sets)
+    if bounding_polygon is None:
+        xs = [x for points in point_sets for x, _ in points]
+        ys = [y for points in point_sets for _, y in points]
+        bounding_polygon = default_bounding_box(min(xs), min(ys), max(xs), max(ys))
+    polygon = bounding_polygon if isinstance(bounding_polygon, Polygon) else Polygon(bounding_polygon)
+    chunks = [point_sets[start:start + chunksize] for start in range(0, len(point_sets), chunksize)]
+    if processes is None:
+        return DiagramBatch.concatenate([_build_chunk(chunk, polygon, areas, precision, dtype, engine)
+                                         for chunk in chunks])
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = executor.map(_build_chunk, chunks, repeat(polygon), repeat(areas), repeat(precision), repeat(dtype),
+                               repeat(engine))
+        return DiagramBatch.concatenate(list(results))
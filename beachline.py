@@ -1,5 +1,6 @@
 import numpy as np
 from geometry import Coordinate
+from precision import DEFAULT_PRECISION
 
 class Arc:
     def __init__(self, origin: Coordinate, circle_event=None):
@@ -20,10 +21,11 @@ class Arc:
         return y
 
 class Breakpoint:
-    def __init__(self, breakpoint: tuple, edge=None):
+    def __init__(self, breakpoint: tuple, edge=None, precision=DEFAULT_PRECISION):
         self.breakpoint = breakpoint
         self._edge = None
         self.edge = edge
+        self.precision = precision
 
     def __repr__(self):
         return f"Breakpoint({self.breakpoint[0].name}, {self.breakpoint[1].name})"
@@ -32,47 +34,50 @@ class Breakpoint:
         i, j = self.breakpoint
         return not (i.y == j.y and j.x < i.x)
 
-    def get_intersection(self, l, max_y=None):
+    def intersection_x(self, l):
+        """x of the breakpoint at sweep line l, without allocating the full intersection"""
+        return self._intersection_x(l)[0]
+
+    def _intersection_x(self, l):
+        # Also returns the site whose parabola gives the breakpoint's y
         i, j = self.breakpoint
-        result = Coordinate()
-        p: Coordinate = i
         a = i.x
         b = i.y
         c = j.x
         d = j.y
         u = 2 * (b - l)
         v = 2 * (d - l)
-        
+
         if i.y == j.y:
-            result.x = (i.x + j.x) / 2
-            if j.x < i.x:
-                result.y = max_y or float('inf')
-                return result
-        elif i.y == l:
-            result.x = i.x
-            p = j
-        elif j.y == l:
-            result.x = j.x
-        else:
-            if abs(u - v) < 1e-10:
-                result.x = (a + c) / 2
-            else:
-                discriminant = v * (a**2 * u - 2*a*c*u + b**2*(u-v) + c**2*u) + d**2*u*(v-u) + l**2*(u-v)**2
-                if discriminant < 0:
-                    discriminant = 0
-                
-                x = -(np.sqrt(discriminant) + a*v - c*u) / (u - v)
-                result.x = x
-                
+            return (i.x + j.x) / 2, i
+        if i.y == l:
+            return i.x, j
+        if j.y == l:
+            return j.x, i
+        if abs(u - v) < self.precision.tolerance():
+            return (a + c) / 2, i
+        discriminant = v * (a**2 * u - 2*a*c*u + b**2*(u-v) + c**2*u) + d**2*u*(v-u) + l**2*(u-v)**2
+        if discriminant < 0:
+            discriminant = 0
+        return -(np.sqrt(discriminant) + a*v - c*u) / (u - v), i
+
+    def get_intersection(self, l, max_y=None):
+        i, j = self.breakpoint
+        result = Coordinate()
+        result.x, p = self._intersection_x(l)
+        if i.y == j.y and j.x < i.x:
+            result.y = max_y or float('inf')
+            return result
+
         a = p.x
         b = p.y
         x = result.x
         u = 2 * (b - l)
-        
-        if abs(u) < 1e-10:
+
+        if abs(u) < self.precision.tolerance():
             result.y = float("inf")
             return result
-            
+
         result.y = 1 / u * (x ** 2 - 2 * a * x + a ** 2 + b ** 2 - l ** 2)
         return result
 
@@ -0,0 +1,687 @@
+import sys
+import time
+import random
+import argparse
+from collections import Counter
+
+def _random_points(n, seed=0):
+    rng = random.Random(seed)
+    return [(rng.uniform(0, 1000), rng.uniform(0, 1000)) for _ in range(n)]
+
+def _default_polygon(points):
+    from polygon import Polygon
+    from utils import default_bounding_box
+    return Polygon(default_bounding_box(min(p[0] for p in points), min(p[1] for p in points),
+                                        max(p[0] for p in points), max(p[1] for p in points)))
+
+def _timed(function, *args, repeat=3, **kwargs):
+    """Return the best wall-clock time of `repeat` calls and the last result"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def bench_site_allocations(args):
+    """Count objects constructed per site event, broken down by type, and those recycled from the sweep's pools"""
+    import weakref
+    from voronoi import Voronoi
+
+    counts = Counter()
+    reused = Counter()
+    # Objects already constructed once; __init__ on one of them is a reuse, not an allocation
+    seen = weakref.WeakValueDictionary()
+
+    def profile(frame, event, arg):
+        if event == "call" and frame.f_code.co_name == "__init__":
+            instance = frame.f_locals.get("self")
+            caller = frame.f_back
+            if caller.f_code.co_name == "__init__" and caller.f_locals.get("self") is instance:
+                return
+            if instance is not None:
+                if seen.get(id(instance)) is instance:
+                    reused[type(instance).__name__] += 1
+                    return
+                try:
+                    seen[id(instance)] = instance
+                except TypeError:
+                    pass
+                counts[type(instance).__name__] += 1
+
+    class CountingVoronoi(Voronoi):
+        def handle_site_event(self, event):
+            sys.setprofile(profile)
+            try:
+                return super().handle_site_event(event)
+            finally:
+                sys.setprofile(None)
+
+    for n in args.sizes:
+        counts.clear()
+        reused.clear()
+        points = _random_points(n)
+        CountingVoronoi(_default_polygon(points)).create_diagram(points)
+        total = sum(counts.values())
+        breakdown = ", ".join(f"{name}={count / n:.2f}" for name, count in counts.most_common())
+        recycled = ", ".join(f"{name}={count / n:.2f}" for name, count in reused.most_common())
+        print(f"n={n}: {total / n:.2f} allocations per site event ({breakdown}); "
+              f"{sum(reused.values()) / n:.2f} recycled ({recycled or 'none'})")
+
+def bench_gc(args):
+    """Sweep time with the cyclic garbage collector running and paused"""
+    import gc
+    from utils import create_voronoi_diagram
+
+    for n in args.sizes:
+        points = _random_points(n)
+        gc.collect()
+        collections = sum(stats['collections'] for stats in gc.get_stats())
+        enabled_time, _ = _timed(create_voronoi_diagram, points, repeat=1)
+        collections = sum(stats['collections'] for stats in gc.get_stats()) - collections
+        gc.collect()
+        disabled_time, _ = _timed(create_voronoi_diagram, points, disable_gc=True, repeat=1)
+        print(f"n={n}: gc enabled {enabled_time:.3f}s ({collections} collections), "
+              f"disabled {disabled_time:.3f}s ({enabled_time / disabled_time:.2f}x)")
+
+def bench_progress(args):
+    """Sweep time without checkpoints, and with a progress callback, time budget and cancellation token"""
+    import threading
+    from utils import create_voronoi_diagram
+
+    for n in args.sizes:
+        points = _random_points(n)
+        plain_time, _ = _timed(create_voronoi_diagram, points)
+        calls = []
+        monitored_time, _ = _timed(create_voronoi_diagram, points, progress=lambda *call: calls.append(call),
+                                   time_budget=3600, cancel=threading.Event())
+        print(f"n={n}: plain {plain_time:.3f}s, monitored {monitored_time:.3f}s "
+              f"({monitored_time / plain_time - 1:+.1%}, {len(calls) // 3} progress calls per sweep)")
+
+def bench_trace(args):
+    """Sweep time with the event recorder, trace size, and replaying the beach line operations from the trace"""
+    from tracing import TraceRecorder, replay
+    from utils import create_voronoi_diagram
+
+    for n in args.sizes:
+        points = _random_points(n)
+        plain_time, _ = _timed(create_voronoi_diagram, points, repeat=1)
+        recorder = TraceRecorder()
+        recorded_time, _ = _timed(create_voronoi_diagram, points, recorder=recorder, repeat=1)
+        events = recorder.to_array()
+        replay_time, result = _timed(replay, events, recorder.settings)
+        print(f"n={n}: sweep {plain_time:.3f}s, recorded {recorded_time:.3f}s, "
+              f"{len(events)} events in {events.nbytes / 1024:.0f} KiB, replay {replay_time:.3f}s "
+              f"({result['arcs_differ']} steps differ)")
+
+def bench_grid(args):
+    """Square grids (n is rounded to a square) with the general sweep and the degenerate fast path"""
+    import math
+    from utils import create_voronoi_diagram, generate_grid_points
+
+    for n in args.sizes:
+        side = max(math.isqrt(n), 2)
+        points = generate_grid_points(side, side, 0, 1000, 0, 1000)
+        box = [(-1, -1), (1001, -1), (1001, 1001), (-1, 1001)]
+        # Only the edge counts are kept, so one diagram is in memory at a time
+        general_time, general = _timed(lambda: len(create_voronoi_diagram(points, box).edges), repeat=1)
+        fast_time, fast = _timed(lambda: len(create_voronoi_diagram(points, box, degenerate=True).edges), repeat=1)
+        print(f"{side}x{side} grid: general {general_time:.2f}s, degenerate {fast_time:.2f}s "
+              f"({general_time / fast_time:.2f}x), {general} vs {fast} edges")
+
+def bench_viewport_culling(args):
+    """Sweep a fixed-size viewport with and without the grid culling pre-pass"""
+    from culling import SiteIndex
+    from utils import create_voronoi_diagram
+
+    viewport = [(480, 480), (520, 480), (520, 520), (480, 520)]
+    for n in args.sizes:
+        points = _random_points(n)
+        index_time, index = _timed(SiteIndex, points, repeat=1)
+        culled_time, culled = _timed(create_voronoi_diagram, points, viewport, site_index=index, repeat=1)
+        full_time, _ = _timed(create_voronoi_diagram, points, viewport, repeat=1)
+        print(f"n={n}: full {full_time:.3f}s, culled {culled_time:.3f}s "
+              f"({len(culled.sites)} sites swept), index build {index_time:.3f}s")
+
+def bench_deduplicate(args):
+    """GPS-like input with 8% repeated fixes: sweeping everything against the deduplication pre-pass"""
+    from culling import deduplicate_sites
+    from utils import create_voronoi_diagram
+
+    for n in args.sizes:
+        rng = random.Random(n)
+        points = _random_points(n)
+        points += [points[rng.randrange(n)] for _ in range(int(n * 0.08))]
+        rng.shuffle(points)
+        polygon = _default_polygon(points)
+        prepass_time, (survivors, _) = _timed(deduplicate_sites, points, 1e-9)
+        full_time, full = _timed(create_voronoi_diagram, points, polygon, repeat=1)
+        dedup_time, dedup = _timed(create_voronoi_diagram, points, polygon, deduplicate=1e-9, repeat=1)
+        print(f"n={len(points)}: all sites {full_time:.3f}s ({len(full.edges)} edges), "
+              f"deduplicated {dedup_time:.3f}s ({len(survivors)} sites, {len(dedup.edges)} edges), "
+              f"pre-pass {prepass_time * 1000:.1f} ms")
+
+def bench_periodic(args):
+    """Periodic cells from ghost sites near the border against tiling the input nine times"""
+    from periodic import create_periodic_voronoi_diagram
+    from utils import create_voronoi_diagram
+
+    for n in args.sizes:
+        points = _random_points(n)
+        periodic_time, periodic = _timed(create_periodic_voronoi_diagram, points, (0, 0, 1000, 1000), repeat=1)
+        tiled = [(x + dx, y + dy) for dx in (-1000, 0, 1000) for dy in (-1000, 0, 1000) for x, y in points]
+        tiled_time, _ = _timed(create_voronoi_diagram, tiled, [(-1000, -1000), (2000, -1000), (2000, 2000),
+                                                              (-1000, 2000)], repeat=1)
+        ghosts = len(periodic.sites) - n
+        print(f"n={n}: ghost sites {periodic_time:.3f}s ({ghosts} ghosts, {ghosts / n:.1%} of n), "
+              f"nine tiles {tiled_time:.3f}s ({8 * n} copies)")
+
+def bench_region_clip(args):
+    """Clipping every cell to a wiggly concave coastline with a hole, against per-cell Sutherland-Hodgman"""
+    import numpy as np
+    from polygon import clip_ring
+    from region import Region
+    from utils import create_voronoi_diagram
+
+    points = _random_points(5000)
+    voronoi = create_voronoi_diagram(points, [(-10, -10), (1010, -10), (1010, 1010), (-10, 1010)], engine="delaunay")
+    rings = [site.ring(counterclockwise=True) for site in voronoi.sites]
+    for m in args.sizes:
+        angles = np.linspace(0, 2 * np.pi, m, endpoint=False)
+        radii = 400 + 30 * np.sin(37 * angles) + 10 * np.sin(301 * angles)
+        coast = np.column_stack([500 + radii * np.cos(angles), 500 + radii * np.sin(angles)])
+        region_time, region = _timed(Region, coast, [0.2 * coast + 400], repeat=1)
+        clip_time, _ = _timed(region.clip_rings, rings, repeat=1)
+        # The reference is far too slow to run in full: time a sample of cells and scale up
+        sample = rings[:20]
+
+        def per_cell():
+            for cell in sample:
+                edges = [(x1, y1, x2, y2) for (x1, y1), (x2, y2) in zip(cell, cell[1:] + cell[:1])]
+                for ring in [region.exterior] + region.holes:
+                    clip_ring([tuple(point) for point in ring.tolist()], edges)
+
+        reference_time, _ = _timed(per_cell, repeat=1)
+        print(f"{len(rings)} cells, {m} boundary vertices: index {region_time:.3f}s, clip {clip_time:.3f}s, "
+              f"per-cell clipping ~{reference_time * len(rings) / len(sample):.1f}s (extrapolated)")
+
+def bench_many_regions(args):
+    """One sweep clipped to 100 regions, against a sweep per region"""
+    import os
+    import random
+    from region import create_region_diagrams
+    from utils import create_voronoi_diagram
+
+    rng = random.Random(0)
+    regions = []
+    for _ in range(100):
+        x, y, size = rng.uniform(0, 900), rng.uniform(0, 900), rng.uniform(20, 100)
+        regions.append([(x, y), (x + size, y), (x + size, y + size), (x, y + size)])
+    processes = os.cpu_count() or 1
+    for n in args.sizes:
+        points = _random_points(n)
+        once_time, _ = _timed(create_region_diagrams, points, regions, repeat=1)
+        pool_time, _ = _timed(create_region_diagrams, points, regions, processes=processes, repeat=1)
+        # A sweep per region is too slow to run in full: time a sample of regions and scale up
+        sample = regions[:10]
+        each_time, _ = _timed(lambda: [create_voronoi_diagram(points, region) for region in sample], repeat=1)
+        print(f"n={n}, {len(regions)} regions: one sweep {once_time:.3f}s, with {processes} processes "
+              f"{pool_time:.3f}s, a sweep per region ~{each_time * len(regions) / len(sample):.1f}s (extrapolated)")
+
+def bench_point_location(args):
+    """Batched cell lookup: grid jump-and-walk against brute-force nearest site"""
+    import numpy as np
+    from locate import CellLocator
+    from utils import create_voronoi_diagram
+
+    rng = np.random.default_rng(0)
+    for n in args.sizes:
+        voronoi = create_voronoi_diagram(_random_points(n))
+        # Queries outside the bounding polygon have no cell, so only draw them inside it
+        polygon = voronoi.bounding_poly
+        queries = rng.uniform((polygon.min_x, polygon.min_y), (polygon.max_x, polygon.max_y), (1_000_000, 2))
+        queries = queries[polygon.inside_many(queries[:, 0], queries[:, 1])]
+        build_time, locator = _timed(CellLocator, voronoi, repeat=1)
+        locate_time, cells = _timed(locator.locate, queries)
+        sample = queries[:20000]
+        brute_time, brute = _timed(
+            lambda: np.argmin(((sample[:, None, :] - locator.sites[None]) ** 2).sum(axis=2), axis=1), repeat=1)
+        agreement = np.mean(brute == cells[:20000])
+        print(f"n={n}: locator {len(queries) / locate_time:,.0f} queries/s (build {build_time:.3f}s), "
+              f"brute force {len(sample) / brute_time:,.0f} queries/s, agreement {agreement:.4f}")
+
+def bench_batch(args):
+    """Many small diagrams: one call per diagram against the batch entry point"""
+    import os
+    from batch import create_voronoi_diagrams
+    from utils import create_voronoi_diagram
+
+    box = [(0, 0), (1000, 0), (1000, 1000), (0, 1000)]
+    point_sets = [_random_points(50, seed=seed) for seed in range(200)]
+    single_time, _ = _timed(lambda: [create_voronoi_diagram(points, box) for points in point_sets], repeat=1)
+    batch_time, _ = _timed(create_voronoi_diagrams, point_sets, box, repeat=1)
+    processes = os.cpu_count() or 1
+    pool_time, _ = _timed(create_voronoi_diagrams, point_sets, box, processes=processes, repeat=1)
+    print(f"{len(point_sets)} diagrams of 50 sites: one call each {single_time:.3f}s, "
+          f"batch {batch_time:.3f}s, batch with {processes} processes {pool_time:.3f}s")
+
+def bench_shared_memory(args):
+    """Handing a finished diagram to another process: pickling its object graph against a shared memory export"""
+    import sys
+    import pickle
+    import threading
+    from shared import SharedDiagram, share_diagram
+    from utils import create_voronoi_diagram
+
+    def deep(function):
+        # Pickle recurses along the half-edge links; give it the stack it needs in a thread
+        result, limit = [], sys.getrecursionlimit()
+
+        def run():
+            try:
+                result.append(f"{_timed(function, repeat=1)[0]:.3f}s")
+            except RecursionError:
+                result.append("fails")
+
+        threading.stack_size(1 << 29)
+        sys.setrecursionlimit(10 ** 6)
+        try:
+            thread = threading.Thread(target=run)
+            thread.start()
+            thread.join()
+        finally:
+            threading.stack_size(0)
+            sys.setrecursionlimit(limit)
+        return result[0]
+
+    for n in args.sizes:
+        points = _random_points(n)
+        voronoi = create_voronoi_diagram(points, _default_polygon(points))
+        graph = (voronoi.sites, voronoi.edges)
+
+        def round_trip():
+            return pickle.loads(pickle.dumps(graph, protocol=pickle.HIGHEST_PROTOCOL))
+
+        try:
+            round_trip()
+            default = "works"
+        except RecursionError:
+            default = "RecursionError"
+        pickled = deep(round_trip)
+        share_time, shared = _timed(share_diagram, voronoi, repeat=1)
+        attach_time, attached = _timed(SharedDiagram.attach, shared.name)
+        rebuild_time, _ = _timed(lambda: attached._rebuild(), repeat=1)
+        print(f"n={n}: pickle round trip {pickled} ({default} at the default recursion limit); "
+              f"shared memory export {share_time:.3f}s ({shared.memory.size / 2 ** 20:.1f} MiB), "
+              f"attach {attach_time * 1000:.2f} ms, object view {rebuild_time:.3f}s")
+        attached.close()
+        shared.close()
+        shared.unlink()
+
+def bench_import_time(args):
+    """Cold import time and peak memory of each entry module in a fresh interpreter"""
+    import os
+    import subprocess
+
+    probe = ("import resource, sys, time\n"
+             "start = time.perf_counter()\n"
+             "{statement}\n"
+             "elapsed = time.perf_counter() - start\n"
+             "print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, 'matplotlib' in sys.modules)")
+    statements = {
+        "(interpreter)": "pass",
+        "numpy": "import numpy",
+        "voronoi": "import voronoi",
+        "batch": "import batch",
+        "utils": "import utils",
+        "utils + rendering": "import utils, matplotlib.pyplot",
+    }
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name, statement in statements.items():
+        output = subprocess.run([sys.executable, "-c", probe.format(statement=statement)], cwd=directory,
+                                capture_output=True, text=True, check=True).stdout.split()
+        elapsed, max_rss, plotting = float(output[0]), int(output[1]), output[2] == "True"
+        print(f"{name:>18}: {elapsed * 1000:7.1f} ms, peak RSS {max_rss / 1024:6.1f} MB"
+              f"{', loads matplotlib' if plotting else ''}")
+
+def bench_engines(args):
+    """Fortune's sweep against the Delaunay engine on several point distributions"""
+    import numpy as np
+    from utils import create_voronoi_diagram
+
+    def distributions(n):
+        rng = np.random.default_rng(0)
+        side = int(np.ceil(np.sqrt(n)))
+        grid = np.stack(np.meshgrid(np.arange(side), np.arange(side)), axis=-1).reshape(-1, 2)[:n] * (1000 / side)
+        centers = rng.uniform(100, 900, (10, 2))
+        clustered = np.clip(centers[rng.integers(0, 10, n)] + rng.normal(0, 30, (n, 2)), 0, 1000)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+        circle = 500 + 400 * np.column_stack([np.cos(angles), np.sin(angles)])
+        return {"uniform": rng.uniform(0, 1000, (n, 2)), "grid": grid, "clustered": clustered, "circle": circle}
+
+    for n in args.sizes:
+        for name, points in distributions(n).items():
+            points = [tuple(point) for point in points.tolist()]
+            times = {}
+            for engine in ("fortune", "delaunay"):
+                try:
+                    times[engine], _ = _timed(create_voronoi_diagram, points, engine=engine, repeat=1)
+                except Exception as error:
+                    times[engine] = None
+                    print(f"n={n} {name}: {engine} failed ({type(error).__name__}: {error})")
+            if None not in times.values():
+                print(f"n={n} {name:>9}: fortune {times['fortune']:.3f}s, delaunay {times['delaunay']:.3f}s "
+                      f"({times['fortune'] / times['delaunay']:.1f}x)")
+
+def bench_out_of_core(args):
+    """Peak traced memory and time of the banded out-of-core build against the in-memory one"""
+    import os
+    import shutil
+    import tempfile
+    import tracemalloc
+    import numpy as np
+    from outofcore import create_voronoi_diagram_out_of_core
+    from utils import create_voronoi_diagram
+
+    def peak(function, *args, **kwargs):
+        tracemalloc.start()
+        try:
+            elapsed, _ = _timed(function, *args, repeat=1, **kwargs)
+            return elapsed, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    directory = tempfile.mkdtemp()
+    try:
+        for n in args.sizes:
+            points = np.random.default_rng(0).uniform(0, 1000, (n, 2))
+            path = os.path.join(directory, "points.npy")
+            np.save(path, points)
+            memory_time, memory_peak = peak(create_voronoi_diagram, [tuple(point) for point in points.tolist()])
+            banded_time, banded_peak = peak(create_voronoi_diagram_out_of_core, path, os.path.join(directory, "cells"),
+                                            band_size=500, chunk_size=10_000)
+            print(f"n={n}: in memory {memory_time:.3f}s peak {memory_peak / 2 ** 20:.1f} MB, "
+                  f"out of core (500 sites per band) {banded_time:.3f}s peak {banded_peak / 2 ** 20:.1f} MB")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def bench_raster(args):
+    """Jump-flooded label raster against the exact diagram followed by per-pixel lookup"""
+    import numpy as np
+    from locate import CellLocator
+    from raster import rasterize_voronoi
+    from utils import create_voronoi_diagram
+
+    box = [(0, 0), (1000, 0), (1000, 1000), (0, 1000)]
+    width = 512
+    centers = (np.arange(width) + 0.5) * (1000 / width)
+    grid_x, grid_y = np.meshgrid(centers, centers)
+    pixels = np.column_stack([grid_x.ravel(), grid_y.ravel()])
+    for n in args.sizes:
+        points = _random_points(n)
+        raster_time, labels = _timed(rasterize_voronoi, points, box, width=width, repeat=1)
+        exact_time, voronoi = _timed(create_voronoi_diagram, points, box, repeat=1)
+        # The Delaunay engine closes every ring, so it serves as the per-pixel reference
+        reference = CellLocator(create_voronoi_diagram(points, box, engine="delaunay")).locate(pixels, outside=None)
+        sites = np.array(points)
+        labels = labels.ravel()
+        excess = (np.hypot(*(sites[labels] - pixels).T) - np.hypot(*(sites[reference] - pixels).T)) / (1000 / width)
+        print(f"n={n}: {width}x{width} raster {raster_time:.3f}s, exact sweep {exact_time:.3f}s, "
+              f"{np.mean(labels == reference):.4f} of pixels exact, worst {excess.max():.2f} px off")
+
+def bench_cell_raster(args):
+    """Scanline label fill of a finished diagram against per-pixel point location"""
+    import os
+    import tempfile
+    import numpy as np
+    from locate import CellLocator
+    from raster import rasterize_cells
+    from utils import create_voronoi_diagram
+
+    box = [(0, 0), (1000, 0), (1000, 1000), (0, 1000)]
+    width = 2048
+    centers = (np.arange(width) + 0.5) * (1000 / width)
+    grid_x, grid_y = np.meshgrid(centers, centers)
+    pixels = np.column_stack([grid_x.ravel(), grid_y.ravel()])
+    for n in args.sizes:
+        voronoi = create_voronoi_diagram(_random_points(n), box, engine="delaunay")
+        fill_time, labels = _timed(rasterize_cells, voronoi, width=width)
+        locate_time, cells = _timed(CellLocator(voronoi).locate, pixels, repeat=1)
+        with tempfile.TemporaryDirectory() as directory:
+            tiled_time, _ = _timed(rasterize_cells, voronoi, width=4 * width, out=os.path.join(directory, "labels.npy"),
+                                   repeat=1)
+        print(f"n={n}: {width}x{width} scanline {fill_time:.3f}s, point location {locate_time:.3f}s "
+              f"(agreement {np.mean(labels.ravel() == cells):.4f}), "
+              f"{4 * width}x{4 * width} tiled to a memory map {tiled_time:.3f}s")
+
+def bench_hilbert_order(args):
+    """Passes over cells and neighbours, with sites in input order against Hilbert-curve order"""
+    import numpy as np
+    from batch import _diagram_batch
+    from ordering import reorder_diagram
+    from raster import rasterize_cells
+    from utils import create_voronoi_diagram
+
+    box = [(0, 0), (1000, 0), (1000, 1000), (0, 1000)]
+
+    def neighbour_sums(voronoi):
+        # Flatten to arrays, then sum each cell's neighbouring areas with a scattered gather
+        batch = _diagram_batch(voronoi, areas=True)
+        left, right = batch.edge_sites[:, 0], batch.edge_sites[:, 1]
+        inner = (left >= 0) & (right >= 0)
+        sums = np.zeros(len(batch.areas))
+        np.add.at(sums, left[inner], batch.areas[right[inner]])
+        np.add.at(sums, right[inner], batch.areas[left[inner]])
+        return sums
+
+    def passes(voronoi):
+        area_time, _ = _timed(lambda: [site.area() for site in voronoi.sites])
+        adjacency_time, _ = _timed(neighbour_sums, voronoi)
+        raster_time, _ = _timed(rasterize_cells, voronoi, width=2048)
+        return area_time, adjacency_time, raster_time
+
+    for n in args.sizes:
+        voronoi = create_voronoi_diagram(_random_points(n), box, engine="delaunay")
+        before = passes(voronoi)
+        reorder_time, _ = _timed(reorder_diagram, voronoi, repeat=1)
+        after = passes(voronoi)
+        print(f"n={n}: reorder {reorder_time:.3f}s; input order / Hilbert order: "
+              + ", ".join(f"{name} {old:.3f}s / {new:.3f}s" for name, old, new in
+                          zip(("areas", "adjacency", "2048x2048 raster"), before, after)))
+
+def bench_export(args):
+    """Streaming GeoJSON/WKB/SVG writers against building features in memory and calling json.dumps"""
+    import json
+    import os
+    import tempfile
+    import tracemalloc
+    from export import GeoJSONWriter, SVGWriter, WKBWriter
+    from utils import create_voronoi_diagram
+
+    def in_memory(voronoi, path):
+        features = []
+        for index, site in enumerate(voronoi.sites):
+            ring = [list(corner) for corner in site.ring()]
+            features.append({"type": "Feature", "properties": {"site": index},
+                             "geometry": {"type": "Polygon", "coordinates": [ring + ring[:1]]}})
+        for edge in voronoi.edges:
+            start, end = edge.get_origin(), edge.twin.get_origin()
+            if start and end:
+                features.append({"type": "Feature", "properties": {},
+                                 "geometry": {"type": "LineString", "coordinates": [[start.x, start.y], [end.x, end.y]]}})
+        with open(path, "w") as file:
+            file.write(json.dumps({"type": "FeatureCollection", "features": features}))
+
+    def streamed(writer):
+        def export(voronoi, path):
+            with writer(path) as output:
+                output.write(voronoi)
+        return export
+
+    exporters = {
+        "json.dumps": in_memory,
+        "GeoJSONWriter": streamed(GeoJSONWriter),
+        "GeoJSONWriter(digits=3)": streamed(lambda path: GeoJSONWriter(path, digits=3)),
+        "WKBWriter": streamed(WKBWriter),
+        "SVGWriter": None,
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cells")
+        for n in args.sizes:
+            voronoi = create_voronoi_diagram(_random_points(n), engine="delaunay")
+            exporters["SVGWriter"] = streamed(lambda path: SVGWriter(path, voronoi.bounding_poly))
+            for name, export in exporters.items():
+                elapsed, _ = _timed(export, voronoi, path)
+                tracemalloc.start()
+                export(voronoi, path)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"n={n} {name:>24}: {elapsed:.3f}s, peak {peak / 2 ** 20:6.1f} MB, "
+                      f"{os.path.getsize(path) / 2 ** 20:6.1f} MB written")
+
+def bench_interpolation(args):
+    """Natural-neighbour interpolation of 10M grid queries, against a per-query Python loop"""
+    import numpy as np
+    from interpolate import NaturalNeighborInterpolator
+    from utils import create_voronoi_diagram
+
+    def per_query(voronoi, values, query):
+        # One query at a time: clip every cell to the query's side of the bisector and sum the pieces
+        qx, qy = query
+        weights = []
+        for site in voronoi.sites:
+            sx, sy = site.x - qx, site.y - qy
+            limit = (sx * sx + sy * sy) / 2
+            ring = [(x - qx, y - qy) for x, y in site.ring()]
+            piece = []
+            for (ax, ay), (bx, by) in zip(ring, ring[1:] + ring[:1]):
+                side_a, side_b = ax * sx + ay * sy - limit, bx * sx + by * sy - limit
+                if side_a <= 0:
+                    piece.append((ax, ay))
+                if (side_a <= 0) != (side_b <= 0):
+                    t = side_a / (side_a - side_b)
+                    piece.append((ax + t * (bx - ax), ay + t * (by - ay)))
+            area = abs(sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(piece, piece[1:] + piece[:1]))) / 2
+            weights.append(area)
+        return sum(w * value for w, value in zip(weights, values)) / sum(weights)
+
+    side = 3163
+    centers = (np.arange(side) + 0.5) * (1000 / side)
+    grid_x, grid_y = np.meshgrid(centers, centers)
+    queries = np.column_stack([grid_x.ravel(), grid_y.ravel()])
+    box = [(0, 0), (1000, 0), (1000, 1000), (0, 1000)]
+    for n in args.sizes:
+        points = _random_points(n)
+        voronoi = create_voronoi_diagram(points, box, engine="delaunay")
+        values = np.array([x + 2 * y for x, y in points])
+        build_time, interpolator = _timed(NaturalNeighborInterpolator, voronoi, values, repeat=1)
+        batch_time, result = _timed(interpolator, queries, repeat=1)
+        sample = queries[::len(queries) // 20]
+        loop_time, loop = _timed(lambda: [per_query(voronoi, values, query) for query in sample], repeat=1)
+        print(f"n={n}: {len(queries):,} queries in {batch_time:.1f}s ({len(queries) / batch_time:,.0f}/s, "
+              f"build {build_time:.3f}s), per-query loop {len(sample) / loop_time:,.0f}/s, "
+              f"max difference {np.abs(result[::len(queries) // 20] - loop).max():.2e}")
+
+def bench_jobs(args):
+    """Statistics for a directory of input files: main.py's one-at-a-time path against the pipelined batch runner"""
+    import io
+    import json
+    import shutil
+    import tempfile
+    from jobs import find_inputs, load_input, run_jobs
+    from utils import create_voronoi_diagram
+
+    directory = tempfile.mkdtemp()
+    try:
+        for n in args.sizes:
+            files = max(10, 20000 // n)
+            for index in range(files):
+                with open(f"{directory}/{n}-{index}.json", 'w') as f:
+                    json.dump({'points': _random_points(n, seed=index)}, f)
+            paths = find_inputs(f"{directory}/{n}-*.json")
+
+            def one_at_a_time():
+                for path in paths:
+                    voronoi = create_voronoi_diagram(*load_input(path))
+                    [site.area() for site in voronoi.sites]
+
+            serial_time, _ = _timed(one_at_a_time, repeat=1)
+            summary = run_jobs(paths, render=None, log=io.StringIO())
+            print(f"{files} files of {n} points: one at a time {serial_time:.3f}s, "
+                  f"pipelined {summary['elapsed']:.3f}s ({serial_time / summary['elapsed']:.2f}x)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def bench_service(args):
+    """Throughput and latency of the diagram service against building every request in turn"""
+    import asyncio
+    from service import DiagramService, load_test, _build
+
+    async def serve_and_load(n, requests):
+        service = await DiagramService(queue_size=32).start()
+        try:
+            return await load_test(service.host, service.port, requests=requests, concurrency=16,
+                                   points=n, distinct=max(requests // 4, 1)), dict(service.stats)
+        finally:
+            await service.close()
+
+    for n in args.sizes:
+        requests = max(20, 40000 // n)
+        report, stats = asyncio.run(serve_and_load(n, requests))
+        rng = random.Random(0)
+        point_sets = [[[rng.uniform(0, 1000), rng.uniform(0, 1000)] for _ in range(n)] for _ in range(4)]
+        blocking_time, _ = _timed(lambda: [_build(points, None, "fortune", False) for points in point_sets],
+                                  repeat=1)
+        print(f"n={n}: {requests} requests at {report['throughput']:.1f}/s, p50 {report['p50'] * 1000:.0f} ms, "
+              f"p99 {report['p99'] * 1000:.0f} ms ({stats['coalesced']} coalesced); "
+              f"blocking in turn {len(point_sets) / blocking_time:.1f}/s")
+
+BENCHMARKS = {
+    "site-allocations": bench_site_allocations,
+    "gc": bench_gc,
+    "progress": bench_progress,
+    "trace": bench_trace,
+    "grid": bench_grid,
+    "viewport-culling": bench_viewport_culling,
+    "deduplicate": bench_deduplicate,
+    "periodic": bench_periodic,
+    "region-clip": bench_region_clip,
+    "many-regions": bench_many_regions,
+    "point-location": bench_point_location,
+    "batch": bench_batch,
+    "shared-memory": bench_shared_memory,
+    "import-time": bench_import_time,
+    "engines": bench_engines,
+    "out-of-core": bench_out_of_core,
+    "raster": bench_raster,
+    "cell-raster": bench_cell_raster,
+    "hilbert-order": bench_hilbert_order,
+    "export": bench_export,
+    "interpolation": bench_interpolation,
+    "jobs": bench_jobs,
+    "service": bench_service,
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run performance benchmarks')
+    parser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK',
+                        help=f"Benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000], help='Input sizes')
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    args.benchmarks = args.benchmarks or list(BENCHMARKS)
+    return args
+
+def main():
+    args = parse_args()
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    for name in args.benchmarks:
+        print(f"== {name}")
+        BENCHMARKS[name](args)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
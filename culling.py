@@ -0,0 +1,109 @@
+import numpy as np
+
+from grid import BucketGrid
+
+class SiteIndex:
+    """
+    Uniform grid over a point cloud, used to pick the sites whose Voronoi
+    cells can reach a bounding polygon before running the sweep.
+
+    Build the index once and reuse it for many polygons; each query then only
+    touches the grid buckets around the polygon.
+    """
+
+    def __init__(self, points, sites_per_bucket=4):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(self.points) == 0:
+            raise ValueError("SiteIndex needs at least one point")
+        min_x, min_y = self.points.min(axis=0)
+        max_x, max_y = self.points.max(axis=0)
+        self.grid = BucketGrid(min_x, min_y, max_x, max_y, len(self.points), sites_per_bucket)
+        column, row = self.grid.bucket_of(self.points[:, 0], self.points[:, 1])
+        self.grid.fill(np.arange(len(self.points)), row * self.grid.columns + column)
+
+    def in_box(self, min_x, min_y, max_x, max_y):
+        """Indices of the points inside the given box"""
+        candidates = self.grid.in_box(min_x, min_y, max_x, max_y)
+        x, y = self.points[candidates, 0], self.points[candidates, 1]
+        return candidates[(x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y)]
+
+    def nearest_distance(self, x, y):
+        """Distance from (x, y) to the closest point in the index"""
+        radius = self.grid.bucket_size
+        while True:
+            candidates = self.in_box(x - radius, y - radius, x + radius, y + radius)
+            if len(candidates) > 0:
+                distances = np.hypot(self.points[candidates, 0] - x, self.points[candidates, 1] - y)
+                nearest = distances.min()
+                # Anything outside the searched box is at least `radius` away.
+                if nearest <= radius:
+                    return float(nearest)
+                radius = nearest
+            else:
+                radius *= 2
+
+    def cull(self, polygon):
+        """
+        Indices of the points whose cells can intersect the polygon, in input order.
+
+        The polygon's bounding box is covered with probe buckets. A point q in a
+        probe with centre c and half-diagonal h is owned by a site no farther from
+        q than c's nearest site, so every owner lies within nearest(c) + 2h of c.
+        The result is a conservative superset of the sites that matter.
+        """
+        size = self.grid.bucket_size
+        columns = max(int(np.ceil((polygon.max_x - polygon.min_x) / size)), 1)
+        rows = max(int(np.ceil((polygon.max_y - polygon.min_y) / size)), 1)
+        width = (polygon.max_x - polygon.min_x) / columns
+        height = (polygon.max_y - polygon.min_y) / rows
+        half_diagonal = 0.5 * np.hypot(width, height)
+        keep = np.zeros(len(self.points), dtype=bool)
+        for row in range(rows):
+            center_y = polygon.min_y + (row + 0.5) * height
+            for column in range(columns):
+                center_x = polygon.min_x + (column + 0.5) * width
+                radius = self.nearest_distance(center_x, center_y) + 2 * half_diagonal
+                candidates = self.in_box(center_x - radius, center_y - radius,
+                                         center_x + radius, center_y + radius)
+                distances = np.hypot(self.points[candidates, 0] - center_x,
+                                     self.points[candidates, 1] - center_y)
+                keep[candidates[distances <= radius]] = True
+        return np.flatnonzero(keep)
+
+def deduplicate_sites(points, tolerance=0.0):
+    """
+    Drop duplicate and nearly coincident sites before running the sweep.
+
+    Sites are snapped to a grid of cell size `tolerance` (or compared exactly
+    when it is 0) and sorted by their grid keys, so equal keys end up next to
+    each other. The first site of each group in input order survives. Two sites
+    closer than `tolerance` that straddle a grid line are both kept.
+
+    Args:
+        points: Sequence or (n, 2) array of (x, y) coordinates
+        tolerance: Grid cell size; sites snapping to the same cell are merged
+
+    Returns:
+        A tuple (survivors, site_map): the indices of the surviving points in
+        input order, and for every input point the position of its surviving
+        site in `survivors`
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if tolerance < 0:
+        raise ValueError("tolerance must be non-negative")
+    if len(points) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    keys = np.floor(points / tolerance) if tolerance > 0 else points
+    # Stable, so each group of equal keys starts with its earliest input index
+    order = np.lexsort((keys[:, 1], keys[:, 0]))
+    sorted_keys = keys[order]
+    starts = np.ones(len(points), dtype=bool)
+    starts[1:] = np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)
+    group = np.cumsum(starts) - 1
+    first = order[starts]
+    # Number the groups by their first input index, so survivors keep input order
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first)] = np.arange(len(first))
+    site_map = np.empty(len(points), dtype=np.int64)
+    site_map[order] = rank[group]
+    return np.sort(first), site_map
@@ -0,0 +1,293 @@
+import numpy as np
+
+from geometry import Point, Vertex, HalfEdge
+from polygon import clip_ring
+
+def _orient(ax, ay, bx, by, cx, cy):
+    return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+
+def _incircle(ax, ay, bx, by, cx, cy, dx, dy):
+    # Positive when d lies inside the circumcircle of the counter-clockwise triangle abc
+    adx, ady = ax - dx, ay - dy
+    bdx, bdy = bx - dx, by - dy
+    cdx, cdy = cx - dx, cy - dy
+    return ((adx * adx + ady * ady) * (bdx * cdy - cdx * bdy)
+            - (bdx * bdx + bdy * bdy) * (adx * cdy - cdx * ady)
+            + (cdx * cdx + cdy * cdy) * (adx * bdy - bdx * ady))
+
+class DelaunayTriangulation:
+    """
+    Randomized incremental Delaunay triangulation with walk-based point location.
+
+    Points are inserted in a biased randomized order (shuffled rounds of doubling
+    size, each sorted along a snake-ordered grid) so that a visibility walk from
+    the previously created triangle stays short. Each insertion splits the
+    containing triangle, or the edge the point lies on, and restores the Delaunay
+    property with edge flips.
+
+    The three corners of the enclosing super triangle are kept as vertices
+    `n`, `n + 1` and `n + 2`. They are placed far enough from `bounds` that they
+    never own any point of it, so every real site has a closed triangle fan.
+
+    After construction `triangles` holds counter-clockwise vertex triples and
+    `neighbors[t, i]` the triangle across the edge opposite `triangles[t, i]`
+    (-1 for none).
+    """
+
+    def __init__(self, points, bounds=None, seed=0, checkpoint=None, every=1000):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.count = len(points)
+        min_x, min_y = points.min(axis=0) if len(points) else (0.0, 0.0)
+        max_x, max_y = points.max(axis=0) if len(points) else (1.0, 1.0)
+        if bounds is not None:
+            min_x, min_y = min(min_x, bounds[0]), min(min_y, bounds[1])
+            max_x, max_y = max(max_x, bounds[2]), max(max_y, bounds[3])
+        extent = max(max_x - min_x, max_y - min_y) or 1.0
+        center_x, center_y = (min_x + max_x) / 2, (min_y + max_y) / 2
+        corners = np.array([(center_x - 40 * extent, center_y - 30 * extent),
+                            (center_x + 40 * extent, center_y - 30 * extent),
+                            (center_x, center_y + 40 * extent)])
+        self.points = np.concatenate([points, corners])
+        self._xs = self.points[:, 0].tolist()
+        self._ys = self.points[:, 1].tolist()
+        n = self.count
+        self._vertices = [[n, n + 1, n + 2]]
+        self._neighbors = [[-1, -1, -1]]
+        self.vertex_triangle = [-1] * n + [0, 0, 0]
+        self.duplicates = []
+        last = 0
+        # checkpoint(inserted, remaining) is called every `every` insertions, and may raise to stop
+        next_checkpoint = every if checkpoint is not None else float("inf")
+        for inserted, index in enumerate(self._insertion_order(points, seed)):
+            if inserted >= next_checkpoint:
+                next_checkpoint += every
+                checkpoint(inserted, n - inserted)
+            last = self._insert(int(index), last)
+        self.triangles = np.array(self._vertices, dtype=np.int64)
+        self.neighbors = np.array(self._neighbors, dtype=np.int64)
+
+    @staticmethod
+    def _insertion_order(points, seed):
+        n = len(points)
+        order = np.random.default_rng(seed).permutation(n)
+        if n == 0:
+            return order
+        side = max(int(np.sqrt(n / 4)), 1)
+        low = points.min(axis=0)
+        size = np.maximum(points.max(axis=0) - low, 1e-300)
+        cell = np.minimum(((points - low) / size * side).astype(np.int64), side - 1)
+        # Snake order: alternate the column direction on every row
+        column = np.where(cell[:, 1] % 2 == 0, cell[:, 0], side - 1 - cell[:, 0])
+        key = cell[:, 1] * side + column
+        rounds = []
+        start = 0
+        while start < n:
+            stop = min(max(2 * start, 1), n)
+            chunk = order[start:stop]
+            rounds.append(chunk[np.argsort(key[chunk], kind="stable")])
+            start = stop
+        return np.concatenate(rounds)
+
+    def _set(self, t, vertices, neighbors):
+        self._vertices[t] = vertices
+        self._neighbors[t] = neighbors
+        for vertex in vertices:
+            self.vertex_triangle[vertex] = t
+
+    def _add(self, vertices, neighbors):
+        self._vertices.append(None)
+        self._neighbors.append(None)
+        t = len(self._vertices) - 1
+        self._set(t, vertices, neighbors)
+        return t
+
+    def _replace_neighbor(self, t, old, new):
+        if t != -1:
+            neighbors = self._neighbors[t]
+            neighbors[neighbors.index(old)] = new
+
+    def _locate(self, x, y, t):
+        xs, ys = self._xs, self._ys
+        while True:
+            a, b, c = self._vertices[t]
+            if _orient(xs[b], ys[b], xs[c], ys[c], x, y) < 0:
+                t = self._neighbors[t][0]
+            elif _orient(xs[c], ys[c], xs[a], ys[a], x, y) < 0:
+                t = self._neighbors[t][1]
+            elif _orient(xs[a], ys[a], xs[b], ys[b], x, y) < 0:
+                t = self._neighbors[t][2]
+            else:
+                return t
+
+    def _insert(self, p, start):
+        xs, ys = self._xs, self._ys
+        x, y = xs[p], ys[p]
+        t = self._locate(x, y, start)
+        vertices = self._vertices[t]
+        for vertex in vertices:
+            if xs[vertex] == x and ys[vertex] == y:
+                self.duplicates.append(p)
+                return t
+        for i in range(3):
+            b, c = vertices[(i + 1) % 3], vertices[(i + 2) % 3]
+            if _orient(xs[b], ys[b], xs[c], ys[c], x, y) == 0:
+                return self._split_edge(t, i, p)
+        return self._split_triangle(t, p)
+
+    def _split_triangle(self, t, p):
+        a, b, c = self._vertices[t]
+        na, nb, nc = self._neighbors[t]
+        t1 = self._add([b, c, p], [None, None, na])
+        t2 = self._add([c, a, p], [None, None, nb])
+        self._set(t, [a, b, p], [t1, t2, nc])
+        self._neighbors[t1][0], self._neighbors[t1][1] = t2, t
+        self._neighbors[t2][0], self._neighbors[t2][1] = t, t1
+        self._replace_neighbor(na, t, t1)
+        self._replace_neighbor(nb, t, t2)
+        self._legalize([t, t1, t2], p)
+        return t
+
+    def _split_edge(self, t, i, p):
+        a, b, c = (self._vertices[t][(i + k) % 3] for k in range(3))
+        _, nb, nc = (self._neighbors[t][(i + k) % 3] for k in range(3))
+        u = self._neighbors[t][i]
+        j = self._neighbors[u].index(t)
+        d = self._vertices[u][j]
+        uc, ub = self._neighbors[u][(j + 1) % 3], self._neighbors[u][(j + 2) % 3]
+        t1 = self._add([a, p, c], [u, nb, t])
+        u1 = self._add([d, p, b], [t, uc, u])
+        self._set(t, [a, b, p], [u1, t1, nc])
+        self._set(u, [d, c, p], [t1, u1, ub])
+        self._replace_neighbor(nb, t, t1)
+        self._replace_neighbor(uc, u, u1)
+        self._legalize([t, t1, u, u1], p)
+        return t
+
+    def _legalize(self, triangles, p):
+        xs, ys = self._xs, self._ys
+        stack = list(triangles)
+        while stack:
+            t = stack.pop()
+            vertices = self._vertices[t]
+            i = vertices.index(p)
+            u = self._neighbors[t][i]
+            if u == -1:
+                continue
+            j = self._neighbors[u].index(t)
+            d = self._vertices[u][j]
+            q, r = vertices[(i + 1) % 3], vertices[(i + 2) % 3]
+            if _incircle(xs[p], ys[p], xs[q], ys[q], xs[r], ys[r], xs[d], ys[d]) <= 0:
+                continue
+            a = self._neighbors[t][(i + 1) % 3]
+            b = self._neighbors[t][(i + 2) % 3]
+            c = self._neighbors[u][(j + 1) % 3]
+            e = self._neighbors[u][(j + 2) % 3]
+            self._set(t, [p, q, d], [c, u, b])
+            self._set(u, [p, d, r], [e, a, t])
+            self._replace_neighbor(c, u, t)
+            self._replace_neighbor(a, t, u)
+            stack.append(t)
+            stack.append(u)
+
+    def circumcenters(self):
+        a, b, c = (self.points[self.triangles[:, k]] for k in range(3))
+        b = b - a
+        c = c - a
+        d = 2 * (b[:, 0] * c[:, 1] - b[:, 1] * c[:, 0])
+        b2 = (b ** 2).sum(axis=1)
+        c2 = (c ** 2).sum(axis=1)
+        x = (c[:, 1] * b2 - b[:, 1] * c2) / d
+        y = (b[:, 0] * c2 - c[:, 0] * b2) / d
+        return np.column_stack([a[:, 0] + x, a[:, 1] + y])
+
+    def fan(self, vertex):
+        """Triangles around a vertex in counter-clockwise order"""
+        start = t = self.vertex_triangle[vertex]
+        triangles = []
+        while True:
+            triangles.append(t)
+            vertices = self._vertices[t]
+            t = self._neighbors[t][(vertices.index(vertex) + 1) % 3]
+            if t == start or t == -1:
+                return triangles
+
+def build_diagram(voronoi, points, checkpoint=None, every=1000):
+    """
+    Fill a Voronoi object's sites, edges and vertices from a Delaunay triangulation.
+
+    Cells are the circumcentres of each site's triangle fan, clipped to the
+    (convex) bounding polygon and linked into the same clockwise HalfEdge rings
+    and Vertex objects the sweep produces. If given, checkpoint(done, remaining)
+    is called every `every` steps, counting the point insertions and then the
+    cells built.
+    """
+    polygon = voronoi.bounding_poly
+    sites = [Point(x, y) for x, y in points]
+    voronoi.sites = sites
+    if not sites:
+        return
+    coordinates = np.array([(site.x, site.y) for site in sites], dtype=np.float64)
+    for name, index in enumerate(np.lexsort((coordinates[:, 0], -coordinates[:, 1]))):
+        sites[index].name = name
+    bounds = (polygon.min_x, polygon.min_y, polygon.max_x, polygon.max_y)
+    inserting = None
+    if checkpoint is not None:
+        def inserting(inserted, remaining):
+            checkpoint(inserted, remaining + len(sites))
+    triangulation = DelaunayTriangulation(coordinates, bounds=bounds, checkpoint=inserting, every=every)
+    centers = triangulation.circumcenters().tolist()
+
+    corners = [(float(point.x), float(point.y)) for point in polygon.points]
+    area = sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(corners, corners[1:] + corners[:1]))
+    if area < 0:
+        corners.reverse()
+    clip_edges = [(x1, y1, x2, y2) for (x1, y1), (x2, y2) in zip(corners, corners[1:] + corners[:1])]
+
+    duplicates = set(triangulation.duplicates)
+    vertex_of = {}
+    half_edges = {}
+    edges = []
+    # Steps carry on from the insertions, which took the first len(sites)
+    next_checkpoint = -(-len(sites) // every) * every if checkpoint is not None else float("inf")
+    for index, site in enumerate(sites):
+        if len(sites) + index >= next_checkpoint:
+            next_checkpoint += every
+            checkpoint(len(sites) + index, len(sites) - index)
+        if index in duplicates:
+            continue
+        ring = [tuple(centers[t]) for t in triangulation.fan(index)]
+        ring = clip_ring(ring, clip_edges)
+        ring.reverse()
+        ring = [vertex for k, vertex in enumerate(ring) if vertex != ring[k - 1]]
+        if len(ring) < 3:
+            continue
+        ring_vertices = []
+        for key in ring:
+            if key not in vertex_of:
+                vertex_of[key] = Vertex(key[0], key[1])
+            ring_vertices.append(vertex_of[key])
+        previous = None
+        for k, origin in enumerate(ring_vertices):
+            target = ring_vertices[(k + 1) % len(ring_vertices)]
+            edge = HalfEdge(site, origin=origin)
+            origin.connected_edges.append(edge)
+            twin = half_edges.pop((id(target), id(origin)), None)
+            if twin is not None:
+                edge.twin = twin
+            else:
+                half_edges[(id(origin), id(target))] = edge
+                edges.append(edge)
+            if previous is not None:
+                previous.set_next(edge)
+            else:
+                site.first_edge = edge
+            previous = edge
+        previous.set_next(site.first_edge)
+
+    # Whatever is still unpaired runs along the bounding polygon
+    for edge in half_edges.values():
+        target = edge.next.origin
+        edge.twin = HalfEdge(None, origin=target)
+        target.connected_edges.append(edge.twin)
+    voronoi.edges = edges
+    voronoi._vertices = list(vertex_of.values())
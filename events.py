@@ -1,5 +1,6 @@
 import numpy as np
 from geometry import Coordinate
+from precision import DEFAULT_PRECISION
 
 class Event:
     circle_event = False
@@ -78,21 +79,32 @@ class CircleEvent(Event):
         return self
 
     @staticmethod
-    def create_circle_event(left_node, middle_node, right_node, sweep_line):
+    def create_circle_event(left_node, middle_node, right_node, sweep_line, precision=DEFAULT_PRECISION,
+                            free_list=None):
         if left_node is None or right_node is None or middle_node is None:
             return None
         left_arc = left_node.get_value()
         middle_arc = middle_node.get_value()
         right_arc = right_node.get_value()
         a, b, c = left_arc.origin, middle_arc.origin, right_arc.origin
-        if CircleEvent.create_circle(a, b, c):
-            x, y, radius = CircleEvent.create_circle(a, b, c)
+        circle = CircleEvent.create_circle(a, b, c, precision)
+        if circle:
+            x, y, radius = circle
+            if free_list:
+                # Reuse a discarded event and its centre instead of allocating new ones
+                event = free_list.pop()
+                event.center.x = x
+                event.center.y = y
+                event.__init__(event.center, radius, middle_node, (a, b, c), (left_arc, middle_arc, right_arc))
+                return event
             return CircleEvent(center=Coordinate(x, y), radius=radius, arc_node=middle_node, point_triple=(a, b, c),
                                arc_triple=(left_arc, middle_arc, right_arc))
         return None
 
     @staticmethod
-    def create_circle(a, b, c):
+    def create_circle(a, b, c, precision=DEFAULT_PRECISION):
+        if precision.exact:
+            return precision.circle(a, b, c)
         A = b.x - a.x
         B = b.y - a.y
         C = c.x - a.x
@@ -101,7 +113,7 @@ class CircleEvent(Event):
         F = (c.x - a.x) * (a.x + c.x) + (c.y - a.y) * (a.y + c.y)
         G = 2 * ((b.x - a.x) * (c.y - b.y) - (b.y - a.y) * (c.x - b.x))
         
-        if abs(G) < 1e-10:
+        if abs(G) < precision.tolerance(degree=2):
             return False
             
         x = (D * E - B * F) / G
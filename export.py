@@ -0,0 +1,193 @@
+import os
+import struct
+from itertools import islice
+
+import numpy as np
+
+from geometry import Vertex
+
+def _rings(voronoi):
+    """Yield (index, site, ring) for every cell with at least three vertices, rings counter-clockwise"""
+    for index, site in enumerate(voronoi.sites):
+        # Exports use the counter-clockwise exterior convention
+        ring = site.ring(counterclockwise=True)
+        if len(ring) >= 3:
+            yield index, site, ring
+
+def _segments(voronoi):
+    """Yield the (start, end) coordinates of every finished edge"""
+    for edge in voronoi.edges:
+        start = edge.get_origin()
+        end = edge.twin.get_origin()
+        if isinstance(start, Vertex) and isinstance(end, Vertex):
+            yield (start.x, start.y), (end.x, end.y)
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+class _StreamWriter:
+    """
+    Base class of the streaming writers.
+
+    The DCEL is walked once and cells or edges are converted `chunk_size` at a
+    time: their coordinates go through a single NumPy array, where optional
+    quantization to `digits` decimals happens, and are then serialized per
+    geometry. Output is written to the file whenever more than `buffer_size`
+    characters or bytes are pending, so memory use does not depend on the
+    diagram size. Writers are context managers; leaving the block writes any
+    footer and flushes, but never closes a file handle that was passed in.
+    """
+
+    binary = False
+    header = ''
+    footer = ''
+
+    def __init__(self, file, digits=None, chunk_size=4096, buffer_size=1 << 20):
+        self._owned = isinstance(file, (str, os.PathLike))
+        self.file = open(file, 'wb' if self.binary else 'w') if self._owned else file
+        self.digits = digits
+        self.chunk_size = chunk_size
+        self.buffer_size = buffer_size
+        self._pieces = []
+        self._size = 0
+        self._closed = False
+        if self.header:
+            self._write(self.header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write(self, piece):
+        self._pieces.append(piece)
+        self._size += len(piece)
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._pieces:
+            self.file.write((b'' if self.binary else '').join(self._pieces))
+            self._pieces = []
+            self._size = 0
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self.footer:
+            self._write(self.footer)
+        self.flush()
+        if self._owned:
+            self.file.close()
+
+    def _array(self, points):
+        array = np.array(points, dtype=np.float64).reshape(-1, 2)
+        return np.round(array, self.digits) if self.digits is not None else array
+
+    def write_cells(self, voronoi):
+        for chunk in _chunks(_rings(voronoi), self.chunk_size):
+            # Closed rings, back to back, with ends[k] the end of ring k
+            counts = np.array([len(ring) + 1 for _, _, ring in chunk])
+            ends = np.cumsum(counts).tolist()
+            coordinates = self._array([point for _, _, ring in chunk for point in ring + ring[:1]])
+            sites = self._array([(site.x, site.y) for _, site, _ in chunk])
+            self._write(self._cells([index for index, _, _ in chunk], sites, coordinates, ends))
+
+    def write_edges(self, voronoi):
+        for chunk in _chunks(_segments(voronoi), self.chunk_size):
+            self._write(self._edges(self._array([point for segment in chunk for point in segment])))
+
+    def write(self, voronoi):
+        """Write every cell followed by every edge"""
+        self.write_cells(voronoi)
+        self.write_edges(voronoi)
+
+class GeoJSONWriter(_StreamWriter):
+    """
+    Newline-delimited GeoJSON: one Feature per line, cells as Polygons with the
+    site's index and coordinates as properties, edges as LineStrings.
+    """
+
+    def _cells(self, indices, sites, coordinates, ends):
+        # The repr of a list of float lists is valid JSON and is formatted in C
+        points = coordinates.tolist()
+        lines = []
+        start = 0
+        for index, (x, y), end in zip(indices, sites.tolist(), ends):
+            lines.append(f'{{"type":"Feature","properties":{{"site":{index},"x":{x!r},"y":{y!r}}},'
+                         f'"geometry":{{"type":"Polygon","coordinates":[{points[start:end]!r}]}}}}\n')
+            start = end
+        return ''.join(lines)
+
+    def _edges(self, coordinates):
+        points = coordinates.tolist()
+        return ''.join(f'{{"type":"Feature","properties":{{}},'
+                       f'"geometry":{{"type":"LineString","coordinates":{points[k:k + 2]!r}}}}}\n'
+                       for k in range(0, len(points), 2))
+
+class WKBWriter(_StreamWriter):
+    """
+    Little-endian WKB geometries written back to back: a Polygon per cell and a
+    LineString per edge. Each geometry carries its own length, so the stream
+    can be read sequentially.
+    """
+
+    binary = True
+    _polygon = struct.Struct('<BIII')
+    _line = struct.Struct('<BII2d2d')
+
+    def _cells(self, indices, sites, coordinates, ends):
+        data = coordinates.astype('<f8').tobytes()
+        pieces = []
+        start = 0
+        for end in ends:
+            pieces.append(self._polygon.pack(1, 3, 1, end - start))
+            pieces.append(data[start * 16:end * 16])
+            start = end
+        return b''.join(pieces)
+
+    def _edges(self, coordinates):
+        pack = self._line.pack
+        return b''.join(pack(1, 2, 2, *segment) for segment in coordinates.reshape(-1, 4).tolist())
+
+class SVGWriter(_StreamWriter):
+    """
+    SVG with a path per cell (carrying a data-site attribute) and per edge,
+    in diagram coordinates flipped so that y points up.
+    """
+
+    def __init__(self, file, polygon, digits=None, chunk_size=4096, buffer_size=1 << 20, stroke_width=None):
+        min_x, min_y = float(polygon.min_x), float(polygon.min_y)
+        width, height = float(polygon.max_x) - min_x, float(polygon.max_y) - min_y
+        stroke_width = stroke_width or max(width, height) / 1000
+        self.header = (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{min_x!r} {-min_y - height!r} '
+                       f'{width!r} {height!r}">\n<g transform="scale(1,-1)" fill="none" stroke="black" '
+                       f'stroke-width="{stroke_width!r}">\n')
+        self.footer = '</g>\n</svg>\n'
+        super().__init__(file, digits, chunk_size, buffer_size)
+
+    @staticmethod
+    def _path(values):
+        # Coordinate pairs after the first "M x y" are implicit line-tos
+        return 'M' + repr(values)[1:-1].replace(',', '')
+
+    def _cells(self, indices, sites, coordinates, ends):
+        values = coordinates.ravel().tolist()
+        paths = []
+        start = 0
+        for index, end in zip(indices, ends):
+            # The closing point is implied by Z
+            paths.append(f'<path data-site="{index}" d="{self._path(values[2 * start:2 * end - 2])}Z"/>\n')
+            start = end
+        return ''.join(paths)
+
+    def _edges(self, coordinates):
+        values = coordinates.ravel().tolist()
+        return ''.join(f'<path d="{self._path(values[k:k + 4])}"/>\n' for k in range(0, len(values), 4))
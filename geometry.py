@@ -56,6 +56,9 @@ class Point(Coordinate):
 
     def area(self, digits=None):
         x, y = self._get_xy()
+        # Work relative to the site so large coordinates do not cancel out
+        x = np.subtract(x, self.x)
+        y = np.subtract(y, self.y)
         if digits is not None:
             return round(self._shoelace(x, y), digits)
         return float(self._shoelace(x, y))
@@ -78,6 +81,13 @@ class Point(Coordinate):
             return None
         return [border.origin for border in borders if isinstance(border.origin, Vertex)]
 
+    def ring(self, counterclockwise=False):
+        """The (x, y) corners of the cell, clockwise as stored unless asked otherwise, without unplaced vertices"""
+        ring = [(float(vertex.x), float(vertex.y)) for vertex in self.vertices() if vertex.x is not None]
+        if counterclockwise:
+            ring.reverse()
+        return ring
+
     def _get_xy(self):
         coordinates = self.vertices()
         if coordinates is None:
@@ -0,0 +1,69 @@
+import numpy as np
+
+class BucketGrid:
+    """
+    Uniform grid of square buckets over a box, listing items by the buckets they touch.
+
+    The bucket side is chosen so that `count` items spread over the box come
+    to about `per_bucket` items per bucket. Coordinates outside the box fall
+    into its edge buckets. After `fill`, `order` holds the items bucket after
+    bucket and the items of bucket b are `order[starts[b]:starts[b + 1]]`.
+
+    Args:
+        min_x, min_y, max_x, max_y: The box covered by the grid
+        count: Number of items the grid is sized for
+        per_bucket: Average number of items per bucket
+    """
+
+    def __init__(self, min_x, min_y, max_x, max_y, count, per_bucket=1.0):
+        self.min_x, self.min_y = float(min_x), float(min_y)
+        area = max((max_x - min_x) * (max_y - min_y), 1e-300)
+        self.bucket_size = float(np.sqrt(area * per_bucket / max(count, 1))) or 1.0
+        self.columns = int((max_x - min_x) // self.bucket_size) + 1
+        self.rows = int((max_y - min_y) // self.bucket_size) + 1
+        self.order = None
+        self.starts = None
+
+    def bucket_of(self, x, y):
+        """Column and row of the bucket holding each (x, y)"""
+        column = np.clip(((x - self.min_x) // self.bucket_size).astype(np.int64), 0, self.columns - 1)
+        row = np.clip(((y - self.min_y) // self.bucket_size).astype(np.int64), 0, self.rows - 1)
+        return column, row
+
+    def center(self, column, row):
+        """Coordinates of the centre of each bucket"""
+        return self.min_x + (column + 0.5) * self.bucket_size, self.min_y + (row + 0.5) * self.bucket_size
+
+    def cover(self, low_x, low_y, high_x, high_y):
+        """
+        Expand boxes into the buckets they overlap.
+
+        Returns:
+            A tuple (items, buckets) with one entry per overlapped bucket of
+            each box, `items` being the box's index and `buckets` the bucket's
+            index row * columns + column
+        """
+        first_column, first_row = self.bucket_of(low_x, low_y)
+        last_column, last_row = self.bucket_of(high_x, high_y)
+        widths = last_column - first_column + 1
+        spans = widths * (last_row - first_row + 1)
+        items = np.repeat(np.arange(len(spans)), spans)
+        offsets = np.arange(len(items)) - np.repeat(np.cumsum(spans) - spans, spans)
+        columns = first_column[items] + offsets % widths[items]
+        rows = first_row[items] + offsets // widths[items]
+        return items, rows * self.columns + columns
+
+    def fill(self, items, buckets):
+        """List the items by bucket, given the bucket index of each"""
+        order = np.argsort(buckets, kind="stable")
+        self.order = np.asarray(items)[order]
+        self.starts = np.searchsorted(buckets[order], np.arange(self.rows * self.columns + 1))
+
+    def in_box(self, min_x, min_y, max_x, max_y):
+        """The items listed in the buckets a box overlaps; an item listed in several of them repeats"""
+        (first_column, last_column), (first_row, last_row) = self.bucket_of(
+            np.array([min_x, max_x]), np.array([min_y, max_y]))
+        chunks = [self.order[self.starts[row * self.columns + first_column]:
+                             self.starts[row * self.columns + last_column + 1]]
+                  for row in range(first_row, last_row + 1)]
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
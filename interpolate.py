@@ -0,0 +1,200 @@
+import numpy as np
+
+from locate import CellLocator
+
+class NaturalNeighborInterpolator:
+    """
+    Natural-neighbour (Sibson) interpolation of values given at the sites.
+
+    Inserting a query point q into the diagram would give it a cell made of
+    pieces stolen from its natural neighbours; the weight of neighbour i is the
+    area of the part of cell i that is closer to q than to site i, over the
+    total. Each piece is cell i clipped by one half-plane, so its area comes
+    from the shoelace formula over the cell's cached ring with the clipped
+    edges replaced, relative to q as in `Point.area`.
+
+    Candidates start as the query's cell and its neighbours. A query whose
+    stolen pieces reach an edge shared with a site outside its candidates
+    takes in the next ring of neighbours and is evaluated again, so the
+    result is exact whatever the neighbourhood size.
+
+    Cell rings must be closed; use a diagram built with engine="delaunay" to
+    be sure of that at the bounding polygon.
+    """
+
+    def __init__(self, voronoi, values=None, locator=None):
+        self.locator = locator or CellLocator(voronoi)
+        self.sites = self.locator.sites
+        self.neighbors = self.locator.neighbors
+        self.values = None if values is None else np.asarray(values, dtype=np.float64)
+        self._cache_rings(voronoi)
+
+    def _cache_rings(self, voronoi):
+        """Pad every ring to the same length, repeating its first vertex, with the site across each edge"""
+        index_of = {id(site): index for index, site in enumerate(voronoi.sites)}
+        rings, across = [], []
+        for index, site in enumerate(voronoi.sites):
+            borders = [edge for edge in site.borders() if edge.origin is not None and edge.origin.x is not None]
+            rings.append([(edge.origin.x, edge.origin.y) for edge in borders])
+            across.append([index_of.get(id(edge.twin.incident_point), -1) for edge in borders])
+        length = max((len(ring) for ring in rings), default=0) + 1
+        self.rings = np.zeros((len(rings), length, 2), dtype=np.float64)
+        # Padding edges are degenerate and lead back into the cell itself
+        self.across = np.repeat(np.arange(len(rings))[:, None], length - 1, axis=1)
+        for index, (ring, sides) in enumerate(zip(rings, across)):
+            if not ring:
+                continue
+            self.rings[index] = ring + [ring[0]] * (length - len(ring))
+            self.across[index, :len(sides)] = sides
+
+    def _stolen(self, queries, candidates):
+        """
+        Area of each candidate cell closer to its query than to the candidate's site.
+
+        Also returns the (query row, site) pairs where a stolen piece reaches an
+        edge shared with a site outside the query's candidates.
+        """
+        count = len(candidates)
+        # Coordinates relative to the query; a point x is closer to the query than
+        # to site s when x . s <= |s|^2 / 2
+        sites = self.sites[candidates] - queries[:, None, :]
+        rings = self.rings[candidates] - queries[:, None, None, :]
+        side = (rings[..., 0] * sites[:, :, None, 0] + rings[..., 1] * sites[:, :, None, 1]
+                - 0.5 * (sites ** 2).sum(axis=2)[:, :, None])
+        inside = side <= 0
+        start, end = rings[:, :, :-1], rings[:, :, 1:]
+        start_in, end_in = inside[:, :, :-1], inside[:, :, 1:]
+        kept = start_in & end_in
+        twice_area = np.where(kept, start[..., 0] * end[..., 1] - start[..., 1] * end[..., 0], 0.0).sum(axis=2)
+
+        # A convex cell cut by a line has at most one edge leaving the half-plane
+        # and one entering it; close the clipped ring through their crossings
+        leaving = start_in & ~end_in
+        entering = ~start_in & end_in
+        cut = leaving.any(axis=2)
+
+        def crossing(edges):
+            index = edges.argmax(axis=2)[..., None]
+            a = np.take_along_axis(start, index[..., None], axis=2)[:, :, 0]
+            b = np.take_along_axis(end, index[..., None], axis=2)[:, :, 0]
+            side_a = np.take_along_axis(side[:, :, :-1], index, axis=2)[..., 0]
+            side_b = np.take_along_axis(side[:, :, 1:], index, axis=2)[..., 0]
+            t = side_a / np.where(side_a == side_b, 1.0, side_a - side_b)
+            return a, a + t[..., None] * (b - a), b
+
+        def cross(a, b):
+            return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+        exit_start, exit_point, _ = crossing(leaving)
+        _, entry_point, entry_end = crossing(entering)
+        closing = cross(exit_start, exit_point) + cross(exit_point, entry_point) + cross(entry_point, entry_end)
+        stolen = 0.5 * np.abs(twice_area + np.where(cut, closing, 0.0))
+
+        # A stolen piece with a part of an edge to a site outside the candidates
+        # means that site is a natural neighbour too
+        touched = (start_in | end_in) & (stolen > 0)[..., None]
+        rows, columns, edges = np.nonzero(touched)
+        neighbor = self.across[candidates[rows, columns], edges]
+        keys = np.sort((np.arange(count)[:, None] * len(self.sites) + candidates).ravel())
+        wanted = rows * len(self.sites) + neighbor
+        position = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        missing = (keys[position] != wanted) & (neighbor >= 0)
+        return stolen, rows[missing], neighbor[missing]
+
+    def _unique_rows(self, candidates):
+        """
+        Drop repeated candidates from each row and trim the rows to the longest
+        remaining one; the gaps left in shorter rows repeat their first entry and
+        are flagged as duplicates, so they are never counted twice.
+        """
+        candidates = np.sort(candidates, axis=1)
+        duplicate = np.zeros(candidates.shape, dtype=bool)
+        duplicate[:, 1:] = candidates[:, 1:] == candidates[:, :-1]
+        candidates = np.sort(np.where(duplicate, len(self.sites), candidates), axis=1)
+        duplicate = candidates == len(self.sites)
+        width = max(int((~duplicate).sum(axis=1).max(initial=1)), 1)
+        candidates, duplicate = candidates[:, :width], duplicate[:, :width]
+        return np.where(duplicate, candidates[:, :1], candidates), duplicate
+
+    def weights(self, points):
+        """
+        Sibson weights of a batch of query points.
+
+        Args:
+            points: Array-like of shape (m, 2)
+
+        Returns:
+            A tuple (neighbors, weights) of arrays of shape (m, k): site indices
+            (rows padded with repeats) and weights summing to 1 per row, NaN for
+            queries outside the bounding polygon
+        """
+        queries = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        owners = self.locator.locate(queries, outside=-1)
+        outside = owners < 0
+        owners = np.where(outside, 0, owners)
+        candidates, duplicate = self._unique_rows(np.concatenate([owners[:, None], self.neighbors[owners]], axis=1))
+        pending = np.arange(len(queries))
+        blocks = []
+        while len(pending) > 0:
+            stolen, rows, sites = self._stolen(queries[pending], candidates)
+            stolen[duplicate] = 0.0
+            incomplete = np.zeros(len(pending), dtype=bool)
+            incomplete[rows] = True
+            blocks.append((pending[~incomplete], candidates[~incomplete], stolen[~incomplete]))
+            if not incomplete.any():
+                break
+            # Add the sites found to be missing, padding rows with their first candidate
+            rows, sites = np.unique(np.stack([np.cumsum(incomplete)[rows] - 1, sites]), axis=1)
+            counts = np.bincount(rows, minlength=int(incomplete.sum()))
+            extra = np.repeat(candidates[incomplete, :1], counts.max(), axis=1)
+            extra[rows, np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)] = sites
+            pending = pending[incomplete]
+            candidates, duplicate = self._unique_rows(np.concatenate([candidates[incomplete], extra], axis=1))
+
+        width = max((block.shape[1] for _, block, _ in blocks), default=1)
+        neighbors = np.empty((len(queries), width), dtype=np.int64)
+        weights = np.zeros((len(queries), width), dtype=np.float64)
+        for rows, block, stolen in blocks:
+            neighbors[rows, :block.shape[1]] = block
+            neighbors[rows, block.shape[1]:] = block[:, -1:]
+            weights[rows, :block.shape[1]] = stolen
+        total = weights.sum(axis=1, keepdims=True)
+        weights = np.divide(weights, total, out=np.zeros_like(weights), where=total > 0)
+        weights[outside] = np.nan
+        return neighbors, weights
+
+    def _interpolate_chunk(self, points, values):
+        neighbors, weights = self.weights(points)
+        if values.ndim == 1:
+            return (weights * values[neighbors]).sum(axis=1)
+        return (weights[..., None] * values[neighbors]).sum(axis=1)
+
+    def __call__(self, points, values=None, chunk_size=8192, workers=None):
+        """
+        Interpolate site values at a batch of query points.
+
+        Args:
+            points: Array-like of shape (m, 2)
+            values: Optional array of shape (n,) or (n, k) of values at `voronoi.sites`;
+                defaults to the values given at construction
+            chunk_size: Number of queries evaluated together
+            workers: Number of threads to spread chunks over, or None for this thread
+
+        Returns:
+            An array of shape (m,) or (m, k), NaN outside the bounding polygon
+        """
+        values = self.values if values is None else np.asarray(values, dtype=np.float64)
+        if values is None:
+            raise ValueError("No values to interpolate")
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        chunks = [points[start:start + chunk_size] for start in range(0, len(points), chunk_size)]
+        if workers is None:
+            results = [self._interpolate_chunk(chunk, values) for chunk in chunks]
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self._interpolate_chunk, chunks, [values] * len(chunks)))
+        if not results:
+            return np.empty((0,) + values.shape[1:])
+        return np.concatenate(results)
@@ -0,0 +1,177 @@
+import io
+import os
+import sys
+import glob
+import json
+import time
+import queue
+import threading
+
+FORMATS = ('png', 'svg', 'geojson', 'wkb')
+
+# Marks the end of a stage's input
+_DONE = None
+
+def find_inputs(source):
+    """The .json files in a directory, or the files matching a glob pattern, sorted"""
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name) for name in os.listdir(source) if name.endswith('.json'))
+    return sorted(glob.glob(source, recursive=True))
+
+def load_input(path):
+    """Read a points file in main.py's format, returning (points, bounding_polygon)"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return data.get('points', []), data.get('bounding_polygon', None)
+    return data, None
+
+def _encode(voronoi, render, dpi):
+    """Render or export a diagram into bytes"""
+    from export import GeoJSONWriter, WKBWriter, SVGWriter
+
+    if render == 'png':
+        from utils import visualize_voronoi
+        buffer = io.BytesIO()
+        visualize_voronoi(voronoi, output_file=buffer, dpi=dpi)
+        return buffer.getvalue()
+    if render == 'wkb':
+        buffer = io.BytesIO()
+        with WKBWriter(buffer) as writer:
+            writer.write(voronoi)
+        return buffer.getvalue()
+    buffer = io.StringIO()
+    with (SVGWriter(buffer, voronoi.bounding_poly) if render == 'svg' else GeoJSONWriter(buffer)) as writer:
+        writer.write(voronoi)
+    return buffer.getvalue().encode()
+
+def _process(points, bounding_polygon, render, engine, dpi):
+    """Worker side: build one diagram, compute its statistics and encode the output in memory"""
+    from utils import create_voronoi_diagram
+
+    start = time.perf_counter()
+    voronoi = create_voronoi_diagram([tuple(point) for point in points], bounding_polygon, engine=engine)
+    constructed = time.perf_counter()
+    areas = [site.area() for site in voronoi.sites]
+    statistics = {
+        'points': len(points),
+        'vertices': len(voronoi.vertices),
+        'edges': len(voronoi.edges),
+        'min_area': min(areas) if areas else None,
+        'max_area': max(areas) if areas else None,
+        'average_area': sum(areas) / len(areas) if areas else None,
+    }
+    counted = time.perf_counter()
+    payload = _encode(voronoi, render, dpi) if render else None
+    timings = {'construct': constructed - start, 'statistics': counted - constructed,
+               'render': time.perf_counter() - counted}
+    return statistics, timings, payload
+
+def run_jobs(paths, output=None, render='png', processes=None, readers=4, writers=2, queue_size=64,
+             engine='fortune', dpi=300, log=sys.stdout):
+    """
+    Build the diagrams of many input files as a pipeline.
+
+    Reader threads load and parse the files, a process pool builds each
+    diagram, computes its statistics and renders or exports it in memory, and
+    writer threads save the results. The stages are connected by queues of
+    at most `queue_size` entries, so memory stays flat however many files
+    there are. One JSON line is written to `log` per file, in completion order,
+    with its statistics and per-stage timings in seconds (or its error).
+
+    Args:
+        paths: Input files in main.py's JSON format
+        output: Directory for the rendered or exported files; outputs are named after
+            their inputs, so inputs should have distinct file names
+        render: One of FORMATS, or None for statistics only
+        processes: Worker processes (default: CPU count)
+        readers: Threads loading input files
+        writers: Threads writing outputs and log lines
+        queue_size: Capacity of each queue between the stages
+        engine: Construction engine, "fortune" or "delaunay"
+        dpi: Resolution of PNG renders
+        log: Text stream receiving the JSON lines
+
+    Returns:
+        A dict with the number of files, the number that failed and the elapsed seconds
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if render is not None and render not in FORMATS:
+        raise ValueError(f"Unknown format {render!r}, expected one of {', '.join(FORMATS)}")
+    if render is not None and output is None:
+        raise ValueError("An output directory is needed unless render is None")
+    if output is not None:
+        os.makedirs(output, exist_ok=True)
+    pending = queue.Queue()
+    for path in paths:
+        pending.put(path)
+    loaded = queue.Queue(maxsize=queue_size)
+    submitted = queue.Queue(maxsize=queue_size)
+    lock = threading.Lock()
+    failed = [0]
+
+    def emit(record):
+        with lock:
+            if 'error' in record:
+                failed[0] += 1
+            log.write(json.dumps(record) + '\n')
+
+    def read():
+        while True:
+            try:
+                path = pending.get_nowait()
+            except queue.Empty:
+                loaded.put(_DONE)
+                return
+            start = time.perf_counter()
+            try:
+                loaded.put((path, load_input(path), time.perf_counter() - start))
+            except Exception as error:
+                loaded.put((path, error, time.perf_counter() - start))
+
+    def write():
+        while True:
+            job = submitted.get()
+            if job is _DONE:
+                return
+            path, future, load_time = job
+            record = {'file': path}
+            try:
+                if isinstance(future, Exception):
+                    raise future
+                statistics, timings, payload = future.result()
+                start = time.perf_counter()
+                if payload is not None:
+                    stem = os.path.splitext(os.path.basename(path))[0]
+                    record['output'] = os.path.join(output, f'{stem}.{render}')
+                    with open(record['output'], 'wb') as f:
+                        f.write(payload)
+                record.update(statistics)
+                record['timings'] = {'load': load_time, **timings, 'write': time.perf_counter() - start}
+            except Exception as error:
+                record['error'] = f'{type(error).__name__}: {error}'
+            emit(record)
+
+    start = time.perf_counter()
+    threads = ([threading.Thread(target=read, daemon=True) for _ in range(readers)] +
+               [threading.Thread(target=write, daemon=True) for _ in range(writers)])
+    for thread in threads:
+        thread.start()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        remaining = readers
+        while remaining:
+            job = loaded.get()
+            if job is _DONE:
+                remaining -= 1
+                continue
+            path, data, load_time = job
+            if not isinstance(data, Exception):
+                data = executor.submit(_process, *data, render, engine, dpi)
+            # Blocks once `queue_size` jobs are waiting to be written
+            submitted.put((path, data, load_time))
+        for _ in range(writers):
+            submitted.put(_DONE)
+        for thread in threads:
+            thread.join()
+    return {'files': len(paths), 'failed': failed[0], 'elapsed': time.perf_counter() - start}
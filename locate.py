@@ -0,0 +1,92 @@
+import numpy as np
+
+from grid import BucketGrid
+
+class CellLocator:
+    """
+    Point location over a finished Voronoi diagram.
+
+    A uniform bucket grid is laid over the bounding polygon and every cell is
+    registered in the buckets its bounding box (taken from `Point.ring()`)
+    overlaps. Each bucket remembers the registered cell whose site is closest
+    to the bucket centre. A query jumps to its bucket's cell and then walks
+    across cell edges: it crosses an edge whenever the query lies on the far
+    side of that edge's bisector, i.e. is closer to the neighbouring site,
+    until no edge of the current cell separates it from its site.
+    """
+
+    def __init__(self, voronoi, cells_per_bucket=1.0):
+        self.voronoi = voronoi
+        self.polygon = voronoi.bounding_poly
+        sites = voronoi.sites
+        index_of = {id(site): index for index, site in enumerate(sites)}
+        self.sites = np.array([(site.x, site.y) for site in sites], dtype=np.float64)
+        self.neighbors = self._neighbor_table(voronoi.edges, index_of, len(sites))
+        self._build_grid(sites, cells_per_bucket)
+
+    @staticmethod
+    def _neighbor_table(edges, index_of, count):
+        pairs = []
+        for edge in edges:
+            a, b = edge.incident_point, edge.twin.incident_point
+            if a is not None and b is not None:
+                pairs.append((index_of[id(a)], index_of[id(b)]))
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        pairs = np.unique(np.concatenate([pairs, pairs[:, ::-1]]), axis=0)
+        degree = np.bincount(pairs[:, 0], minlength=count)
+        # Pad each row with the cell itself, which can never be strictly closer.
+        table = np.repeat(np.arange(count)[:, None], max(int(degree.max(initial=0)), 1), axis=1)
+        starts = np.concatenate([[0], np.cumsum(degree)[:-1]])
+        slot = np.arange(len(pairs)) - starts[pairs[:, 0]]
+        table[pairs[:, 0], slot] = pairs[:, 1]
+        return table
+
+    def _build_grid(self, sites, cells_per_bucket):
+        polygon = self.polygon
+        self.grid = grid = BucketGrid(polygon.min_x, polygon.min_y, polygon.max_x, polygon.max_y,
+                                      len(sites), cells_per_bucket)
+
+        boxes = np.empty((len(sites), 4), dtype=np.float64)
+        for index, site in enumerate(sites):
+            xs, ys = zip((float(site.x), float(site.y)), *site.ring())
+            boxes[index] = min(xs), min(ys), max(xs), max(ys)
+
+        # Expand every cell into the (bucket, cell) pairs its bounding box covers.
+        cells, bucket = grid.cover(boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3])
+        center_x, center_y = grid.center(bucket % grid.columns, bucket // grid.columns)
+        distance = (self.sites[cells, 0] - center_x) ** 2 + (self.sites[cells, 1] - center_y) ** 2
+        order = np.lexsort((distance, bucket))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = bucket[order][1:] != bucket[order][:-1]
+        self.jump = np.zeros(grid.rows * grid.columns, dtype=np.int64)
+        self.jump[bucket[order][first]] = cells[order][first]
+
+    def locate(self, points, outside=-1):
+        """
+        Find the cell containing each query point.
+
+        Args:
+            points: Array-like of shape (m, 2) with query coordinates
+            outside: Value reported for queries outside the bounding polygon
+
+        Returns:
+            An int array of indices into `voronoi.sites`
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        x, y = points[:, 0], points[:, 1]
+        column, row = self.grid.bucket_of(x, y)
+        cells = self.jump[row * self.grid.columns + column]
+        active = np.arange(len(points))
+        while len(active) > 0:
+            current = cells[active]
+            qx, qy = x[active, None], y[active, None]
+            candidates = self.neighbors[current]
+            distance = (self.sites[candidates, 0] - qx) ** 2 + (self.sites[candidates, 1] - qy) ** 2
+            own = (self.sites[current, 0] - qx[:, 0]) ** 2 + (self.sites[current, 1] - qy[:, 0]) ** 2
+            best = distance.argmin(axis=1)
+            moved = distance[np.arange(len(active)), best] < own
+            cells[active[moved]] = candidates[moved, best[moved]]
+            active = active[moved]
+        if outside is not None:
+            cells[~self.polygon.inside_many(x, y)] = outside
+        return cells
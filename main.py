@@ -1,6 +1,5 @@
 import os
 import sys
-import json
 import argparse
 from utils import (
     create_voronoi_diagram,
@@ -9,6 +8,7 @@ from utils import (
     generate_grid_points,
     generate_circle_points
 )
+from voronoi import ENGINES
 
 def parse_args():
     parser = argparse.ArgumentParser(description='Generate Voronoi diagram from input points')
@@ -18,28 +18,59 @@ def parse_args():
     input_group.add_argument('--random', type=int, help='Generate N random points')
     input_group.add_argument('--grid', type=str, help='Generate a grid of points, format: ROWSxCOLUMNS')
     input_group.add_argument('--circle', type=int, help='Generate N points arranged in a circle')
+    input_group.add_argument('--batch', type=str,
+                             help='Directory of JSON files, or a glob pattern, to process as a pipelined batch')
     
-    parser.add_argument('--output', type=str, help='Output PNG file', required=True)
+    parser.add_argument('--output', type=str, help='Output PNG file (output directory with --batch)')
     parser.add_argument('--labels', action='store_true', help='Show labels on the diagram')
     parser.add_argument('--title', type=str, help='Title for the diagram')
     parser.add_argument('--dpi', type=int, default=300, help='Resolution of the output image')
+    parser.add_argument('--trace', type=str, help='Record the sweep events to this file (replay with tracing.py)')
     
-    return parser.parse_args()
+    batch_group = parser.add_argument_group('batch mode')
+    batch_group.add_argument('--format', default='png', help='Output format of each diagram: png, svg, geojson or wkb')
+    batch_group.add_argument('--no-render', action='store_true', help='Only print statistics')
+    batch_group.add_argument('--engine', choices=ENGINES, default='fortune', help='Construction engine')
+    batch_group.add_argument('--processes', type=int, default=None, help='Worker processes (default: CPU count)')
+    batch_group.add_argument('--readers', type=int, default=4, help='Threads loading input files')
+    batch_group.add_argument('--writers', type=int, default=2, help='Threads writing outputs')
+    batch_group.add_argument('--queue-size', type=int, default=64, help='Capacity of the queues between stages')
+    
+    args = parser.parse_args()
+    if args.output is None and not (args.batch and args.no_render):
+        parser.error('--output is required unless running --batch with --no-render')
+    if args.batch:
+        from jobs import FORMATS
+        
+        if args.format not in FORMATS:
+            parser.error(f"argument --format: invalid choice: {args.format!r} (choose from {', '.join(FORMATS)})")
+    return args
+
+def run_batch(args):
+    from jobs import find_inputs, run_jobs
+    
+    paths = find_inputs(args.batch)
+    if not paths:
+        print(f"Error: no input files match {args.batch}", file=sys.stderr)
+        return 1
+    # One JSON line per file on stdout, the summary on stderr
+    summary = run_jobs(paths, output=args.output, render=None if args.no_render else args.format,
+                       processes=args.processes, readers=args.readers, writers=args.writers,
+                       queue_size=args.queue_size, engine=args.engine, dpi=args.dpi)
+    print(f"Processed {summary['files']} files in {summary['elapsed']:.2f}s "
+          f"({summary['files'] / summary['elapsed']:.1f} files/s, {summary['failed']} failed)", file=sys.stderr)
+    return 1 if summary['failed'] else 0
 
 def main():
     args = parse_args()
+    if args.batch:
+        return run_batch(args)
     
     # Generate or load points
     if args.file:
-        with open(args.file, 'r') as f:
-            data = json.load(f)
+        from jobs import load_input
         
-        if isinstance(data, dict):
-            points = data.get('points', [])
-            bounding_polygon = data.get('bounding_polygon', None)
-        else:
-            points = data
-            bounding_polygon = None
+        points, bounding_polygon = load_input(args.file)
             
     elif args.random:
         points = generate_random_points(args.random)
@@ -64,7 +95,14 @@ def main():
         os.makedirs(output_dir)
     
     # Create and visualize the Voronoi diagram
-    voronoi = create_voronoi_diagram(points, bounding_polygon)
+    recorder = None
+    if args.trace:
+        from tracing import TraceRecorder
+        recorder = TraceRecorder()
+    voronoi = create_voronoi_diagram(points, bounding_polygon, recorder=recorder)
+    if recorder is not None:
+        recorder.save(args.trace)
+        print(f"Sweep trace of {len(recorder)} events saved to {args.trace}")
     output_file = visualize_voronoi(
         voronoi, 
         output_file=args.output,
@@ -0,0 +1,100 @@
+import numpy as np
+
+def hilbert_keys(x, y, bounds=None, bits=16):
+    """
+    Positions of points along a Hilbert curve through their bounding box.
+
+    The box is divided into a 2**bits by 2**bits grid and each point gets the
+    index of its grid cell along the curve, so points with close keys are
+    close in the plane. All points are processed at once, one bit per step.
+
+    Args:
+        x: Array of x coordinates
+        y: Array of y coordinates
+        bounds: Optional (min_x, min_y, max_x, max_y) of the grid; defaults to the points' box
+        bits: Grid resolution in bits per axis, at most 31
+
+    Returns:
+        An array of uint64 keys
+    """
+    if not 1 <= bits <= 31:
+        raise ValueError("bits must be between 1 and 31")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) == 0:
+        return np.empty(0, dtype=np.uint64)
+    min_x, min_y, max_x, max_y = bounds if bounds is not None else (x.min(), y.min(), x.max(), y.max())
+    side = (1 << bits) - 1
+    extent = max(max_x - min_x, max_y - min_y) or 1.0
+    # One scale for both axes keeps the curve's locality isotropic
+    grid_x = np.clip((x - min_x) / extent * side, 0, side).astype(np.uint64)
+    grid_y = np.clip((y - min_y) / extent * side, 0, side).astype(np.uint64)
+    keys = np.zeros(len(x), dtype=np.uint64)
+    for bit in range(bits - 1, -1, -1):
+        s = np.uint64(1 << bit)
+        rx = (grid_x & s) > 0
+        ry = (grid_y & s) > 0
+        keys += s * s * ((3 * rx.astype(np.uint64)) ^ ry.astype(np.uint64))
+        # Rotate the lower quadrants so the curve continues from where it left off
+        flip = rx & ~ry
+        grid_x[flip] = side - grid_x[flip]
+        grid_y[flip] = side - grid_y[flip]
+        swap = ~ry
+        grid_x[swap], grid_y[swap] = grid_y[swap], grid_x[swap]
+    return keys
+
+def hilbert_order(points, bounds=None, bits=16):
+    """The permutation that sorts (x, y) points along a Hilbert curve, ties kept in input order"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return np.argsort(hilbert_keys(points[:, 0], points[:, 1], bounds=bounds, bits=bits), kind="stable")
+
+def reorder_diagram(voronoi, bits=16):
+    """
+    Renumber the sites, vertices and edges of a finished diagram along a Hilbert curve.
+
+    Sites, vertices and edge midpoints are each sorted by their Hilbert key
+    over the bounding polygon, so neighbouring cells, vertices and edges get
+    nearby positions in their lists, and in any arrays built from them. Site
+    names are set to the new positions.
+
+    `site_indices` maps every site back to its index in the input and
+    `site_map` maps every input index to its site's position, composed with
+    any culling or deduplication the diagram was built with.
+
+    Args:
+        voronoi: A finished Voronoi diagram, modified in place
+        bits: Grid resolution of the keys in bits per axis
+
+    Returns:
+        The permutation applied to the sites: new position i holds the site
+        that was at position permutation[i]
+    """
+    polygon = voronoi.bounding_poly
+    bounds = (polygon.min_x, polygon.min_y, polygon.max_x, polygon.max_y)
+    permutation = hilbert_order([(site.x, site.y) for site in voronoi.sites], bounds=bounds, bits=bits)
+    voronoi.sites = [voronoi.sites[index] for index in permutation.tolist()]
+    for position, site in enumerate(voronoi.sites):
+        site.name = position
+    vertices = [vertex for vertex in voronoi._vertices if vertex.x is not None]
+    unplaced = [vertex for vertex in voronoi._vertices if vertex.x is None]
+    order = hilbert_order([(vertex.x, vertex.y) for vertex in vertices], bounds=bounds, bits=bits)
+    voronoi._vertices = [vertices[index] for index in order.tolist()] + unplaced
+    midpoints = [((edge.origin.x + edge.twin.origin.x) / 2, (edge.origin.y + edge.twin.origin.y) / 2)
+                 for edge in voronoi.edges]
+    order = hilbert_order(midpoints, bounds=bounds, bits=bits)
+    voronoi.edges = [voronoi.edges[index] for index in order.tolist()]
+    # Compose with the site <-> input mappings of culling and deduplication
+    inverse = np.empty(len(permutation), dtype=np.int64)
+    inverse[permutation] = np.arange(len(permutation))
+    if voronoi.site_indices is None:
+        voronoi.site_indices = permutation.astype(np.int64)
+        voronoi.site_map = inverse
+    else:
+        voronoi.site_indices = np.asarray(voronoi.site_indices)[permutation]
+        if voronoi.site_map is None:
+            # Only the sites are known, so the map stops at the last input index that has one
+            voronoi.site_map = np.full(int(voronoi.site_indices.max(initial=-1)) + 1, -1, dtype=np.int64)
+            voronoi.site_map[voronoi.site_indices] = np.arange(len(permutation))
+        else:
+            voronoi.site_map = np.where(voronoi.site_map >= 0, inverse[np.maximum(voronoi.site_map, 0)], -1)
+    return permutation
@@ -0,0 +1,238 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from polygon import Polygon
+from utils import default_bounding_box
+from voronoi import Voronoi
+
+SITE_DTYPE = np.dtype([('x', '<f8'), ('y', '<f8'), ('index', '<i8')])
+
+def _read(path, dtype, shape=None):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return np.empty((0,) + (shape or ()), dtype=dtype)
+    array = np.memmap(path, dtype=dtype, mode='r')
+    return array.reshape((-1,) + shape) if shape else array
+
+class CellStore:
+    """
+    Disk-backed cells written by `create_voronoi_diagram_out_of_core`.
+
+    Three flat files hold the result: `sites.bin` with one (x, y, index) record
+    per cell, where index is the site's row in the input, `ends.bin` with the
+    end offset of each cell's ring and `vertices.bin` with the clockwise ring
+    vertices of all cells back to back. They are memory-mapped, so opening a
+    store costs nothing regardless of its size.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.sites = _read(os.path.join(directory, 'sites.bin'), SITE_DTYPE)
+        self.ends = _read(os.path.join(directory, 'ends.bin'), np.int64)
+        self.vertices = _read(os.path.join(directory, 'vertices.bin'), np.float64, (2,))
+
+    def __len__(self):
+        return len(self.sites)
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start = self.ends[index - 1] if index > 0 else 0
+        return int(self.sites[index]['index']), np.asarray(self.vertices[start:self.ends[index]])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+class _CellWriter:
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.paths = [os.path.join(directory, name) for name in ('sites.bin', 'ends.bin', 'vertices.bin')]
+        for path in self.paths:
+            open(path, 'wb').close()
+        self.total = 0
+
+    def write(self, sites, rings):
+        counts = np.array([len(ring) for ring in rings], dtype=np.int64)
+        ends = self.total + np.cumsum(counts)
+        self.total = int(ends[-1]) if len(ends) else self.total
+        vertices = np.array([vertex for ring in rings for vertex in ring], dtype=np.float64).reshape(-1, 2)
+        for path, array in zip(self.paths, (sites, ends, vertices)):
+            with open(path, 'ab') as file:
+                file.write(np.ascontiguousarray(array).tobytes())
+
+def _chunks(points, chunk_size):
+    for start in range(0, len(points), chunk_size):
+        yield start, np.asarray(points[start:start + chunk_size], dtype=np.float64).reshape(-1, 2)
+
+def _partition(points, directory, band_size, chunk_size):
+    """
+    Externally sort the sites by y: bucket them into band files on disk.
+
+    A first pass takes the bounding box and an evenly strided sample of the y
+    coordinates, whose quantiles become the band edges so that every band holds
+    about `band_size` sites. A second pass appends each chunk's sites to their
+    band files; each band is sorted in memory when it is swept.
+    """
+    count = len(points)
+    bands = max(int(np.ceil(count / band_size)), 1)
+    stride = max(count // (bands * 256), 1)
+    low = np.full(2, np.inf)
+    high = np.full(2, -np.inf)
+    sample = []
+    for start, chunk in _chunks(points, chunk_size):
+        low = np.minimum(low, chunk.min(axis=0))
+        high = np.maximum(high, chunk.max(axis=0))
+        sample.append(chunk[(-start) % stride::stride, 1])
+    edges = np.quantile(np.concatenate(sample), np.arange(1, bands) / bands) if bands > 1 else np.empty(0)
+
+    paths = [os.path.join(directory, f'band_{band:06d}.bin') for band in range(bands)]
+    for path in paths:
+        open(path, 'wb').close()
+    for start, chunk in _chunks(points, chunk_size):
+        records = np.empty(len(chunk), dtype=SITE_DTYPE)
+        records['x'], records['y'] = chunk[:, 0], chunk[:, 1]
+        records['index'] = np.arange(start, start + len(chunk))
+        band = np.searchsorted(edges, records['y'], side='right')
+        order = np.argsort(band, kind='stable')
+        bounds = np.searchsorted(band[order], np.arange(bands + 1))
+        for index in np.flatnonzero(np.diff(bounds)):
+            with open(paths[index], 'ab') as file:
+                file.write(records[order[bounds[index]:bounds[index + 1]]].tobytes())
+    return paths, edges, (low[0], low[1], high[0], high[1])
+
+class _BandWindow:
+    """The bands currently held in memory, loaded on demand and dropped once passed"""
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.loaded = {}
+
+    def band(self, index):
+        if index not in self.loaded:
+            records = np.fromfile(self.paths[index], dtype=SITE_DTYPE)
+            self.loaded[index] = records[np.argsort(records['y'], kind='stable')]
+        return self.loaded[index]
+
+    def release(self, below):
+        for index in [index for index in self.loaded if index < below]:
+            del self.loaded[index]
+
+def _reach(voronoi, owned, domain=None):
+    """
+    The extent of the sites that can affect the owned cells.
+
+    A cell computed from a subset of the sites can only be too large, and a
+    vertex v of the true cell is final when the circle around it through the
+    site holds no other site. v.y - |v - site| is concave, so over the computed
+    cell it is smallest at one of its vertices (and likewise for the other
+    sides of the circle): the computed vertices bound every circle that has to
+    be searched. Adding the sites found there only shrinks the cells, so one
+    more pass over that extent is final.
+
+    Args:
+        voronoi: A finished diagram whose first `owned` sites are the owned ones
+        owned: Number of owned sites
+        domain: Optional (min_x, min_y, max_x, max_y) box
+
+    Returns:
+        The (min_x, min_y, max_x, max_y) bounding box of those circles, or, given
+        a domain, how far the box reaches past it (0 if it stays inside)
+    """
+    min_x = min_y = np.inf
+    max_x = max_y = -np.inf
+    for site in voronoi.sites[:owned]:
+        for x, y in site.ring():
+            radius = np.hypot(x - site.x, y - site.y)
+            min_x, max_x = min(min_x, x - radius), max(max_x, x + radius)
+            min_y, max_y = min(min_y, y - radius), max(max_y, y + radius)
+    if domain is None:
+        return min_x, min_y, max_x, max_y
+    return float(max(0.0, domain[0] - min_x, max_x - domain[2], domain[1] - min_y, max_y - domain[3]))
+
+def create_voronoi_diagram_out_of_core(points, output, bounding_polygon=None, band_size=100_000,
+                                      chunk_size=1_000_000, workdir=None, precision=None, engine="fortune"):
+    """
+    Create a Voronoi diagram of more points than fit in memory.
+
+    The sites are externally sorted by y into band files, then swept one band at
+    a time together with a halo of sites from the neighbouring bands. Cells of
+    the band's own sites are checked to be final against the halo (the band is
+    redone once with the halo they call for otherwise) and appended to a
+    CellStore on disk.
+    Only the bands overlapping the current halo and one band-sized diagram are
+    ever in memory, so peak memory follows `band_size` rather than the number
+    of points.
+
+    Args:
+        points: Array-like of shape (n, 2) supporting slicing, e.g. np.load(path, mmap_mode='r'),
+            or the path of a .npy file
+        output: Directory for the CellStore files
+        bounding_polygon: Optional list of (x, y) coordinates or a Polygon; defaults to a box
+            around all points
+        band_size: Number of sites per band; the halo costs a few rows of sites on either side,
+            so bands should hold well over sqrt(n) sites (the size of a beach line)
+        chunk_size: Number of points read from the input at a time
+        workdir: Directory for the temporary band files; defaults to a fresh temporary directory
+        precision: Optional precision.Precision for the predicates
+        engine: Construction engine passed to Voronoi, "fortune" or "delaunay"
+
+    Returns:
+        A CellStore over `output`, with cells ordered band by band and by y within a band
+    """
+    if isinstance(points, (str, os.PathLike)):
+        points = np.load(points, mmap_mode='r')
+    directory = tempfile.mkdtemp(dir=workdir)
+    try:
+        paths, edges, (min_x, min_y, max_x, max_y) = _partition(points, directory, band_size, chunk_size)
+        if bounding_polygon is None:
+            bounding_polygon = default_bounding_box(min_x, min_y, max_x, max_y)
+        polygon = bounding_polygon if isinstance(bounding_polygon, Polygon) else Polygon(bounding_polygon)
+        band_edges = np.concatenate([[min_y], edges, [max_y]])
+        window = _BandWindow(paths)
+        writer = _CellWriter(output)
+        margin = None
+        for band in range(len(paths)):
+            own = window.band(band)
+            if len(own) == 0:
+                continue
+            lo, hi = band_edges[band], band_edges[band + 1]
+            if margin is None:
+                margin = 3 * np.sqrt(float(max_x - min_x or 1.0) * max(hi - lo, 1e-12) / len(own))
+            low, high = lo - margin, hi + margin
+            while True:
+                halo = []
+                below = band - 1
+                while below >= 0 and band_edges[below + 1] >= low:
+                    records = window.band(below)
+                    halo.append(records[np.searchsorted(records['y'], low):])
+                    below -= 1
+                above = band + 1
+                while above < len(paths) and band_edges[above] <= high:
+                    records = window.band(above)
+                    halo.append(records[:np.searchsorted(records['y'], high, side='right')])
+                    above += 1
+                sites = np.concatenate([own] + halo)
+                voronoi = Voronoi(polygon.copy(), precision=precision, engine=engine)
+                voronoi.create_diagram(points=list(zip(sites['x'].tolist(), sites['y'].tolist())))
+                # Past the data extent there is nothing left to load
+                loaded_low = -np.inf if below < 0 else low
+                loaded_high = np.inf if above >= len(paths) else high
+                _, reach_low, _, reach_high = _reach(voronoi, len(own))
+                if loaded_low <= reach_low and reach_high <= loaded_high:
+                    break
+                # The cells can only shrink, so one more pass over this range is final
+                low, high = min(low, reach_low), max(high, reach_high)
+            # Start the next band from the halo this one turned out to need
+            # (the outermost bands reach the polygon, which says nothing about the others)
+            needed_below = lo - reach_low if band > 0 else 0.0
+            needed_above = reach_high - hi if band < len(paths) - 1 else 0.0
+            margin = 1.25 * max(needed_below, needed_above, 0.0) or margin
+            rings = [site.ring() for site in voronoi.sites[:len(own)]]
+            writer.write(own, rings)
+            window.release(below + 1)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return CellStore(output)
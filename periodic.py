@@ -0,0 +1,105 @@
+import numpy as np
+
+from outofcore import _reach
+from polygon import Polygon, clip_ring
+from voronoi import Voronoi
+
+def _ghosts(points, domain, margin):
+    """Periodic images of the points lying within `margin` of the domain, and the point each one copies"""
+    min_x, min_y, max_x, max_y = domain
+    width, height = max_x - min_x, max_y - min_y
+    # A margin wider than the domain needs images from more than one period away
+    reach_x, reach_y = int(np.ceil(margin / width)), int(np.ceil(margin / height))
+    images, sources = [], []
+    for i in range(-reach_x, reach_x + 1):
+        for j in range(-reach_y, reach_y + 1):
+            if i == 0 and j == 0:
+                continue
+            x = points[:, 0] + i * width
+            y = points[:, 1] + j * height
+            near = ((x >= min_x - margin) & (x <= max_x + margin) &
+                    (y >= min_y - margin) & (y <= max_y + margin))
+            images.append(np.column_stack([x[near], y[near]]))
+            sources.append(np.flatnonzero(near))
+    return np.concatenate(images), np.concatenate(sources)
+
+def create_periodic_voronoi_diagram(points, domain, margin=None, precision=None, engine="fortune"):
+    """
+    Create a Voronoi diagram on a torus, with both axes wrapping around the domain.
+
+    Points are wrapped into the domain, and only their periodic images within
+    `margin` of it are added as ghost sites, instead of tiling the input nine
+    times. The diagram is swept over the domain grown by the margin. Cells
+    of the original points are then checked to be final against the ghosts,
+    and the diagram is rebuilt once with the wider margin they call for if not.
+
+    Args:
+        points: Sequence or (n, 2) array of (x, y) coordinates
+        domain: The periodic box as (min_x, min_y, max_x, max_y)
+        margin: Width of the ghost layer; defaults to four times the mean site spacing
+        precision: Optional precision.Precision for the predicates
+        engine: Construction engine passed to Voronoi, "fortune" or "delaunay"
+
+    Returns:
+        A Voronoi diagram whose first n sites are the points in input order,
+        followed by the ghosts. `site_indices` maps every site to the input
+        index it copies, and each original cell is the full periodic cell,
+        which may extend past the domain; see fold_cells.
+    """
+    min_x, min_y, max_x, max_y = domain = tuple(float(value) for value in domain)
+    width, height = max_x - min_x, max_y - min_y
+    if width <= 0 or height <= 0:
+        raise ValueError("The periodic domain must have a positive width and height")
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    points = np.column_stack([min_x + np.mod(points[:, 0] - min_x, width),
+                              min_y + np.mod(points[:, 1] - min_y, height)])
+    owned = len(points)
+    if owned == 0:
+        raise ValueError("A periodic diagram needs at least one point")
+    if margin is None:
+        margin = 4 * np.sqrt(width * height / owned)
+    while True:
+        ghosts, sources = _ghosts(points, domain, margin)
+        polygon = Polygon([(min_x - margin, min_y - margin), (max_x + margin, min_y - margin),
+                           (max_x + margin, max_y + margin), (min_x - margin, max_y + margin)])
+        voronoi = Voronoi(polygon, precision=precision, engine=engine)
+        voronoi.create_diagram(points=[tuple(point) for point in np.concatenate([points, ghosts]).tolist()])
+        needed = _reach(voronoi, owned, domain)
+        if needed <= margin:
+            break
+        margin = needed
+    voronoi.site_indices = np.concatenate([np.arange(owned), sources])
+    voronoi.periodic_domain = domain
+    return voronoi
+
+def fold_cells(voronoi):
+    """
+    Fold the cells of a periodic diagram back into its domain.
+
+    Each original cell is clipped to the domain, and so is every ghost cell
+    reaching into it: those pieces are the parts of the original's cell that
+    wrap around the edges of the domain.
+
+    Args:
+        voronoi: A diagram from create_periodic_voronoi_diagram
+
+    Returns:
+        A list with, for each input point, the rings of (x, y) tuples that
+        together make up its cell inside the domain
+    """
+    min_x, min_y, max_x, max_y = voronoi.periodic_domain
+    # Counter-clockwise, so the domain is on the left of every edge
+    edges = [(min_x, min_y, max_x, min_y), (max_x, min_y, max_x, max_y),
+             (max_x, max_y, min_x, max_y), (min_x, max_y, min_x, min_y)]
+    pieces = [[] for _ in range(int(voronoi.site_indices.max()) + 1)]
+    for site, index in zip(voronoi.sites, voronoi.site_indices.tolist()):
+        ring = site.ring()
+        if len(ring) < 3:
+            continue
+        xs, ys = zip(*ring)
+        if max(xs) <= min_x or min(xs) >= max_x or max(ys) <= min_y or min(ys) >= max_y:
+            continue
+        ring = clip_ring(ring, edges)
+        if len(ring) >= 3:
+            pieces[index].append(ring)
+    return pieces
@@ -1,5 +1,6 @@
 import numpy as np
 from geometry import Coordinate, Vertex, HalfEdge
+from precision import Precision
 
 class Polygon:
     def __init__(self, tuples):
@@ -11,11 +12,23 @@ class Polygon:
         max_x = max([p.x for p in self.points])
         center = Coordinate((max_x + min_x) / 2, (max_y + min_y) / 2)
         self.min_y, self.min_x, self.max_y, self.max_x, self.center = min_y, min_x, max_y, max_x, center
+        self.precision = Precision(scale=Precision.extent(min_x, min_y, max_x, max_y))
         self.points = self._order_points(self.points)
         self.polygon_vertices = []
         for point in self.points:
             self.polygon_vertices.append(Vertex(point.x, point.y))
 
+    def copy(self):
+        # Share the already ordered corners, but give the copy its own vertices
+        # since building a diagram attaches edges to them.
+        polygon = Polygon.__new__(Polygon)
+        polygon.points = list(self.points)
+        polygon.min_y, polygon.min_x, polygon.max_y, polygon.max_x = self.min_y, self.min_x, self.max_y, self.max_x
+        polygon.center = self.center
+        polygon.precision = self.precision
+        polygon.polygon_vertices = [Vertex(point.x, point.y) for point in self.points]
+        return polygon
+
     def _order_points(self, points):
         clockwise = sorted(points, key=lambda point: (-180 - self._calculate_angle(point, self.center)) % 360)
         return clockwise
@@ -123,7 +136,7 @@ class Polygon:
 
     def _norm(self, vector):
         mag = self._magnitude(np.array(vector))
-        if mag < 1e-10:
+        if mag < self.precision.tolerance():
             return np.array(vector)
         return np.array(vector) / mag
 
@@ -138,7 +151,7 @@ class Polygon:
         v3 = np.array([-direction[1], direction[0]])
         
         dot_prod = np.dot(v2, v3)
-        if abs(dot_prod) < 1e-10:
+        if abs(dot_prod) < self.precision.tolerance():
             return []
             
         t1 = np.cross(v2, v1) / dot_prod
@@ -163,6 +176,49 @@ class Polygon:
             if intersect:
                 inside = not inside
         return inside
+
+    def inside_many(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        vertices = self.points + self.points[0:1]
+        inside = np.zeros(np.broadcast(x, y).shape, dtype=bool)
+        for i in range(0, len(vertices) - 1):
+            xi, yi = vertices[i].x, vertices[i].y
+            xj, yj = vertices[i + 1].x, vertices[i + 1].y
+            crosses = (yi > y) != (yj > y)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                inside ^= crosses & (x < (xj - xi) * (y - yi) / (yj - yi) + xi)
+        return inside
         
     def get_coordinates(self):
-        return [(i.x, i.y) for i in self.points]
\ No newline at end of file
+        return [(i.x, i.y) for i in self.points]
+
+def clip_ring(ring, edges):
+    """
+    Clip a ring of (x, y) tuples to a convex polygon by Sutherland-Hodgman.
+
+    `edges` are the polygon's sides as (x1, y1, x2, y2), with the inside on
+    their left. Each crossing is computed from the segment's endpoints in
+    lexicographic order, so neighbouring cells get bit-identical points.
+    """
+    for x1, y1, x2, y2 in edges:
+        if not ring:
+            return ring
+        dx, dy = x2 - x1, y2 - y1
+        side = [dx * (y - y1) - dy * (x - x1) for x, y in ring]
+        if min(side) >= 0:
+            continue
+        clipped = []
+        for k in range(len(ring)):
+            current, following = ring[k], ring[(k + 1) % len(ring)]
+            s_current, s_following = side[k], side[(k + 1) % len(ring)]
+            if s_current >= 0:
+                clipped.append(current)
+            if (s_current >= 0) != (s_following >= 0):
+                (px, py), s_p, (qx, qy), s_q = ((current, s_current, following, s_following)
+                                                if current <= following else
+                                                (following, s_following, current, s_current))
+                ratio = s_p / (s_p - s_q)
+                clipped.append((px + ratio * (qx - px), py + ratio * (qy - py)))
+        ring = clipped
+    return ring
@@ -0,0 +1,69 @@
+import math
+from fractions import Fraction
+
+class Precision:
+    """
+    Numeric settings for the geometric predicates.
+
+    Tolerances are relative to the extent of the input: a test on a quantity
+    of degree k in coordinate differences (a length is degree 1, a cross
+    product degree 2) uses `relative * scale ** k`.
+
+    In exact mode every site is snapped to a multiple of `grid` and the circle
+    event predicates are evaluated on the integer grid units, so collinearity,
+    orientation and coincident circle centres are decided without rounding.
+    """
+
+    def __init__(self, scale=None, relative=1e-10, exact=False, grid=1):
+        self.scale = scale
+        self.relative = relative
+        self.exact = exact
+        self.grid = grid
+        self._grid = Fraction(grid)
+
+    def __repr__(self):
+        return f"Precision(scale={self.scale}, relative={self.relative}, exact={self.exact}, grid={self.grid})"
+
+    def with_scale(self, scale):
+        return Precision(scale=scale, relative=self.relative, exact=self.exact, grid=self.grid)
+
+    @staticmethod
+    def extent(min_x, min_y, max_x, max_y):
+        return float(max(max_x - min_x, max_y - min_y)) or 1.0
+
+    def tolerance(self, degree=1):
+        scale = self.scale if self.scale is not None else 1.0
+        return self.relative * scale ** degree
+
+    def units(self, value):
+        return int(round(float(value) / self.grid))
+
+    def snap(self, value):
+        if not self.exact:
+            return value
+        units = self.units(value)
+        return units * self.grid if isinstance(self.grid, int) else float(units * self._grid)
+
+    def orientation(self, a, b, c):
+        # Sign of the cross product (b - a) x (c - b): 1 counter-clockwise, -1 clockwise
+        ax, ay, bx, by, cx, cy = (self.units(v) for v in (a.x, a.y, b.x, b.y, c.x, c.y))
+        cross = (bx - ax) * (cy - by) - (by - ay) * (cx - bx)
+        return (cross > 0) - (cross < 0)
+
+    def circle(self, a, b, c):
+        ax, ay, bx, by, cx, cy = (self.units(v) for v in (a.x, a.y, b.x, b.y, c.x, c.y))
+        A = bx - ax
+        B = by - ay
+        C = cx - ax
+        D = cy - ay
+        E = A * (ax + bx) + B * (ay + by)
+        F = C * (ax + cx) + D * (ay + cy)
+        G = 2 * (A * (cy - by) - B * (cx - bx))
+        if G == 0:
+            return False
+        x = Fraction(D * E - B * F, G)
+        y = Fraction(A * F - C * E, G)
+        radius = math.sqrt((ax - x) ** 2 + (ay - y) ** 2) * float(self._grid)
+        return float(x * self._grid), float(y * self._grid), radius
+
+DEFAULT_PRECISION = Precision(scale=1.0)
@@ -0,0 +1,192 @@
+import os
+
+import numpy as np
+
+from polygon import Polygon
+from utils import default_bounding_box
+
+def _pixel_centers(polygon, width, height=None):
+    """Pixel centre coordinates of a raster over the polygon's bounding box; height keeps pixels square"""
+    box_width = float(polygon.max_x - polygon.min_x)
+    box_height = float(polygon.max_y - polygon.min_y)
+    if height is None:
+        height = max(int(round(width * box_height / box_width)), 1)
+    centers_x = polygon.min_x + (np.arange(width) + 0.5) * (box_width / width)
+    centers_y = polygon.min_y + (np.arange(height) + 0.5) * (box_height / height)
+    return centers_x, centers_y
+
+def _shift(labels, dy, dx):
+    """labels[r + dy, c + dx] at every (r, c), with -1 where that falls off the raster"""
+    rows, columns = labels.shape
+    shifted = np.full_like(labels, -1)
+    shifted[max(-dy, 0):rows - max(dy, 0), max(-dx, 0):columns - max(dx, 0)] = \
+        labels[max(dy, 0):rows - max(-dy, 0), max(dx, 0):columns - max(-dx, 0)]
+    return shifted
+
+def jump_flood(sites, centers_x, centers_y):
+    """
+    Approximate nearest-site labels of a pixel grid by jump flooding.
+
+    Every site seeds the pixel it falls in (the closest site wins when several
+    share a pixel). Rounds with steps of half the raster size down to one pixel,
+    plus a final one-pixel round, let each pixel adopt a label from the eight
+    pixels one step away whenever that label's site is closer. Labels are exact
+    except for pixels next to a cell boundary, which may take the neighbouring
+    site.
+
+    Args:
+        sites: Array of shape (n, 2) with site coordinates
+        centers_x: Increasing x coordinates of the pixel columns' centres, evenly spaced
+        centers_y: Increasing y coordinates of the pixel rows' centres, evenly spaced
+
+    Returns:
+        An int32 array of shape (len(centers_y), len(centers_x)) with indices into `sites`
+    """
+    sites = np.asarray(sites, dtype=np.float64).reshape(-1, 2)
+    rows, columns = len(centers_y), len(centers_x)
+    labels = np.full((rows, columns), -1, dtype=np.int32)
+    if len(sites) == 0:
+        return labels
+    pixel_x = (centers_x[-1] - centers_x[0]) / max(columns - 1, 1) or 1.0
+    pixel_y = (centers_y[-1] - centers_y[0]) / max(rows - 1, 1) or 1.0
+    column = np.clip(np.rint((sites[:, 0] - centers_x[0]) / pixel_x), 0, columns - 1).astype(np.int64)
+    row = np.clip(np.rint((sites[:, 1] - centers_y[0]) / pixel_y), 0, rows - 1).astype(np.int64)
+    pixel = row * columns + column
+    seed_distance = (sites[:, 0] - centers_x[column]) ** 2 + (sites[:, 1] - centers_y[row]) ** 2
+    order = np.lexsort((seed_distance, pixel))
+    _, first = np.unique(pixel[order], return_index=True)
+    labels.ravel()[pixel[order[first]]] = order[first]
+
+    def distance(candidates):
+        found = candidates >= 0
+        safe = np.where(found, candidates, 0)
+        result = (sites[safe, 0] - centers_x[None, :]) ** 2 + (sites[safe, 1] - centers_y[:, None]) ** 2
+        return np.where(found, result, np.inf)
+
+    best = distance(labels)
+    step = 1 << max(int(np.ceil(np.log2(max(rows, columns)))) - 1, 0)
+    steps = []
+    while step >= 1:
+        steps.append(step)
+        step //= 2
+    for step in steps + [1]:
+        source = labels.copy()
+        for dy in (-step, 0, step):
+            for dx in (-step, 0, step):
+                if dy == 0 and dx == 0:
+                    continue
+                candidates = _shift(source, dy, dx)
+                candidate_distance = distance(candidates)
+                closer = candidate_distance < best
+                labels[closer] = candidates[closer]
+                best[closer] = candidate_distance[closer]
+    return labels
+
+def rasterize_voronoi(points, bounding_polygon=None, width=512, height=None, outside=-1):
+    """
+    Create a site-ID raster of the Voronoi diagram without building the diagram.
+
+    The raster covers the bounding polygon's bounding box and is filled by jump
+    flooding, so it is accurate to about one pixel along cell boundaries.
+
+    Args:
+        points: List of (x, y) coordinates
+        bounding_polygon: Optional list of (x, y) coordinates or a Polygon; defaults to a box
+            around the points
+        width: Number of pixel columns
+        height: Number of pixel rows; defaults to keeping pixels square
+        outside: Label of pixels outside the bounding polygon, or None to label them too
+
+    Returns:
+        An int32 array of shape (height, width) with indices into `points`; row 0 is
+        the bottom (minimum y) of the bounding box
+    """
+    sites = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if bounding_polygon is None:
+        bounding_polygon = default_bounding_box(*sites.min(axis=0), *sites.max(axis=0))
+    polygon = bounding_polygon if isinstance(bounding_polygon, Polygon) else Polygon(bounding_polygon)
+    centers_x, centers_y = _pixel_centers(polygon, width, height)
+    labels = jump_flood(sites, centers_x, centers_y)
+    if outside is not None:
+        grid_x, grid_y = np.meshgrid(centers_x, centers_y)
+        labels[~polygon.inside_many(grid_x.ravel(), grid_y.ravel()).reshape(labels.shape)] = outside
+    return labels
+
+def _cell_edges(voronoi):
+    """Every cell ring as arrays of edge end points and the owning site's index"""
+    starts, ends, owners = [], [], []
+    for index, site in enumerate(voronoi.sites):
+        ring = site.ring()
+        if len(ring) < 3:
+            continue
+        starts.extend(ring)
+        ends.extend(ring[1:] + ring[:1])
+        owners.extend([index] * len(ring))
+    starts = np.array(starts, dtype=np.float64).reshape(-1, 2)
+    ends = np.array(ends, dtype=np.float64).reshape(-1, 2)
+    return starts, ends, np.array(owners, dtype=np.int64)
+
+def rasterize_cells(voronoi, width=512, height=None, out=None, tile_rows=1024, outside=-1):
+    """
+    Rasterize a finished diagram into an exact label image by scanline filling its cells.
+
+    Each cell ring, from `Point.ring()`, is intersected with the
+    horizontal lines through the pixel centres; sorted crossings are paired into
+    spans of pixels whose centres fall inside the cell. Rows are filled a tile
+    at a time, so `out` can be a memory-mapped file far larger than memory.
+
+    Args:
+        voronoi: A Voronoi object after create_diagram
+        width: Number of pixel columns over the bounding polygon's bounding box
+        height: Number of pixel rows; defaults to keeping pixels square
+        out: Optional int array of shape (height, width) to fill, or the path of a .npy file
+            to create as a memory map
+        tile_rows: Number of rows filled at a time
+        outside: Label of pixels not covered by any cell
+
+    Returns:
+        The label array, with indices into `voronoi.sites`; row 0 is the bottom
+        (minimum y) of the bounding box
+    """
+    polygon = voronoi.bounding_poly
+    centers_x, centers_y = _pixel_centers(polygon, width, height)
+    height = len(centers_y)
+    if out is None:
+        out = np.empty((height, width), dtype=np.int32)
+    elif isinstance(out, (str, os.PathLike)):
+        out = np.lib.format.open_memmap(out, mode='w+', dtype=np.int32, shape=(height, width))
+    pixel_width = centers_x[1] - centers_x[0] if width > 1 else float(polygon.max_x - polygon.min_x)
+    first_x = centers_x[0]
+
+    starts, ends, owners = _cell_edges(voronoi)
+    # Half-open in y, so a crossing on a shared vertex is counted exactly once per ring
+    low_y = np.minimum(starts[:, 1], ends[:, 1])
+    high_y = np.maximum(starts[:, 1], ends[:, 1])
+    keep = low_y < high_y
+    starts, ends, owners, low_y, high_y = starts[keep], ends[keep], owners[keep], low_y[keep], high_y[keep]
+    slope = (ends[:, 0] - starts[:, 0]) / (ends[:, 1] - starts[:, 1])
+
+    for top in range(0, height, tile_rows):
+        rows = centers_y[top:top + tile_rows]
+        tile = np.full((len(rows), width), outside, dtype=out.dtype)
+        edges = np.flatnonzero((low_y <= rows[-1]) & (high_y > rows[0]))
+        first_row = np.searchsorted(rows, low_y[edges], side='left')
+        last_row = np.searchsorted(rows, high_y[edges], side='left')
+        counts = last_row - first_row
+        edge = np.repeat(edges, counts)
+        row = np.repeat(first_row, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        x = starts[edge, 0] + (rows[row] - starts[edge, 1]) * slope[edge]
+        order = np.lexsort((x, owners[edge], row))
+        row, x, owner = row[order], x[order], owners[edge][order]
+        # Crossings of one ring on one row come in enter/leave pairs
+        enter, leave = slice(0, None, 2), slice(1, None, 2)
+        first = np.clip(np.ceil((x[enter] - first_x) / pixel_width), 0, width).astype(np.int64)
+        stop = np.clip(np.ceil((x[leave] - first_x) / pixel_width), 0, width).astype(np.int64)
+        lengths = np.maximum(stop - first, 0)
+        span = np.repeat(np.arange(len(lengths)), lengths)
+        columns = first[span] + np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        tile[row[enter][span], columns] = owner[enter][span]
+        out[top:top + len(rows)] = tile
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
@@ -0,0 +1,331 @@
+import numpy as np
+
+from grid import BucketGrid
+from precision import Precision
+
+def _signed_area(ring):
+    x, y = ring[:, 0], ring[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+class Region:
+    """
+    A polygon with holes, concave or not, for clipping the cells of a diagram.
+
+    The bounding polygon of a diagram has to be convex, so build the diagram
+    over a box around the region and clip its cells with `clip_cells`.
+
+    The boundary segments are kept in a uniform grid. Cells whose bounding box
+    touches no boundary segment are wholly inside or outside the region and
+    are classified all at once. Only the cells that the boundary crosses are
+    clipped one by one, against the few segments near them, so the cost grows
+    with the number of cells plus the boundary length near each crossing,
+    rather than with cells times boundary vertices.
+
+    Args:
+        exterior: Sequence of (x, y) corners of the outer boundary, in either order
+        holes: Sequence of rings of (x, y) corners cut out of the exterior
+        segments_per_bucket: Average number of boundary segments per grid bucket
+    """
+
+    def __init__(self, exterior, holes=(), segments_per_bucket=1):
+        rings = []
+        for index, ring in enumerate([exterior, *holes]):
+            ring = np.asarray(ring, dtype=np.float64).reshape(-1, 2)
+            if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+                ring = ring[:-1]
+            if len(ring) < 3:
+                raise ValueError("Region rings need at least three corners")
+            # The interior is on the left of every boundary segment: exterior
+            # counter-clockwise, holes clockwise
+            if (_signed_area(ring) > 0) != (index == 0):
+                ring = ring[::-1]
+            rings.append(ring)
+        self.exterior, self.holes = rings[0], rings[1:]
+        self.area = sum(_signed_area(ring) for ring in rings)
+        self.start = np.concatenate(rings)
+        self.end = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])
+        # Segments are numbered ring after ring; `following` links each to the next one round its ring
+        sizes = [len(ring) for ring in rings]
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        self.following = np.concatenate([np.roll(np.arange(offsets[k], offsets[k + 1]), -1)
+                                         for k in range(len(rings))])
+        self.min_x, self.min_y = self.exterior.min(axis=0)
+        self.max_x, self.max_y = self.exterior.max(axis=0)
+        # The same extent-scaled edge tolerance as Polygon, so both clip points near an edge alike
+        self.precision = Precision(scale=Precision.extent(self.min_x, self.min_y, self.max_x, self.max_y))
+        self.tolerance = self.precision.tolerance()
+        self.grid = grid = BucketGrid(self.min_x, self.min_y, self.max_x, self.max_y, len(self.start),
+                                      segments_per_bucket)
+        # Every segment is listed in each bucket its bounding box covers
+        low = np.minimum(self.start, self.end)
+        high = np.maximum(self.start, self.end)
+        grid.fill(*grid.cover(low[:, 0], low[:, 1], high[:, 0], high[:, 1]))
+        # Summed-area table of the bucket counts, to count a box's segments in O(1)
+        counts = np.diff(grid.starts).reshape(grid.rows, grid.columns)
+        self._summed = np.zeros((grid.rows + 1, grid.columns + 1), dtype=np.int64)
+        self._summed[1:, 1:] = counts.cumsum(axis=0).cumsum(axis=1)
+        # Whether each bucket centre is inside; decides empty buckets entirely
+        centers_x, _ = grid.center(np.arange(grid.columns), 0)
+        self._bucket_inside = np.array([self._crossings_at(row, centers_x) % 2 == 1 for row in range(grid.rows)])
+
+    def _row_segments(self, row):
+        grid = self.grid
+        return np.unique(grid.order[grid.starts[row * grid.columns]:grid.starts[(row + 1) * grid.columns]])
+
+    def _crossings_at(self, row, xs, y=None):
+        # Boundary crossings to the right of each x along the horizontal line through y
+        # (the centre of the bucket row by default); every crossing segment lies in this row
+        if y is None:
+            _, y = self.grid.center(0, row)
+        segments = self._row_segments(row)
+        (ax, ay), (bx, by) = self.start[segments].T, self.end[segments].T
+        straddle = (ay > y) != (by > y)
+        ax, ay, bx, by = ax[straddle], ay[straddle], bx[straddle], by[straddle]
+        crossings = np.sort(ax + (y - ay) * (bx - ax) / (by - ay))
+        return len(crossings) - np.searchsorted(crossings, xs, side="right")
+
+    def contains(self, x, y):
+        """Whether each point is inside the region (points on the boundary may go either way)"""
+        x, y = np.atleast_1d(np.asarray(x, dtype=np.float64)), np.atleast_1d(np.asarray(y, dtype=np.float64))
+        inside = np.zeros(len(x), dtype=bool)
+        within = (x >= self.min_x) & (x <= self.max_x) & (y >= self.min_y) & (y <= self.max_y)
+        _, rows = self.grid.bucket_of(x, y)
+        for index in np.flatnonzero(within):
+            inside[index] = self._crossings_at(rows[index], x[index:index + 1], y[index])[0] % 2 == 1
+        return inside
+
+    def _segments_in_box(self, min_x, min_y, max_x, max_y):
+        return np.unique(self.grid.in_box(min_x, min_y, max_x, max_y))
+
+    def clip_cells(self, voronoi):
+        """
+        Clip every cell of a diagram to the region.
+
+        Returns:
+            A list with, for each site, the rings of (x, y) tuples making up its
+            cell inside the region: outer rings counter-clockwise and holes clockwise,
+            so that the signed shoelace areas of the rings add up to the clipped area
+        """
+        return self.clip_rings([site.ring(counterclockwise=True) for site in voronoi.sites])
+
+    def clip_rings(self, rings):
+        """Clip convex counter-clockwise rings to the region, as in clip_cells"""
+        rings = [np.asarray(ring, dtype=np.float64).reshape(-1, 2) for ring in rings]
+        result = [[] for _ in rings]
+        valid = np.array([len(ring) >= 3 for ring in rings], dtype=bool)
+        indices = np.flatnonzero(valid)
+        if len(indices) == 0:
+            return result
+        sizes = np.array([len(rings[index]) for index in indices])
+        coordinates = np.concatenate([rings[index] for index in indices])
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        low = np.minimum.reduceat(coordinates, starts)
+        high = np.maximum.reduceat(coordinates, starts)
+        apart = ((high[:, 0] < self.min_x) | (low[:, 0] > self.max_x) |
+                 (high[:, 1] < self.min_y) | (low[:, 1] > self.max_y))
+        # Count the segments in each ring's box of buckets; with none, the whole ring
+        # shares the inside/outside status of any bucket it touches
+        first_column, first_row = self.grid.bucket_of(low[:, 0], low[:, 1])
+        last_column, last_row = self.grid.bucket_of(high[:, 0], high[:, 1])
+        summed = self._summed
+        counts = (summed[last_row + 1, last_column + 1] - summed[first_row, last_column + 1] -
+                  summed[last_row + 1, first_column] + summed[first_row, first_column])
+        inside = ~apart & (counts == 0) & self._bucket_inside[first_row, first_column]
+        for index in indices[inside]:
+            result[index] = [[tuple(point) for point in rings[index].tolist()]]
+        for position in np.flatnonzero(~apart & (counts > 0)):
+            index = indices[position]
+            segments = self._segments_in_box(*low[position], *high[position])
+            result[index] = self._clip_convex(rings[index], segments)
+        return result
+
+    def _clip_convex(self, cell, segments):
+        """Intersect one convex counter-clockwise ring with the region, given the boundary segments near it"""
+        tolerance = self.tolerance
+        edges = np.roll(cell, -1, axis=0) - cell
+        lengths = np.hypot(edges[:, 0], edges[:, 1])
+        keep = lengths > tolerance
+        cell, edges, lengths = cell[keep], edges[keep], lengths[keep]
+        if len(cell) < 3:
+            return []
+        normals = np.column_stack([-edges[:, 1], edges[:, 0]]) / lengths[:, None]
+        perimeter = np.concatenate([[0], np.cumsum(lengths)])
+
+        def distances(points):
+            # Signed distance of each point to each edge line, positive inside
+            return (points[:, None, 0] - cell[None, :, 0]) * normals[None, :, 0] + \
+                   (points[:, None, 1] - cell[None, :, 1]) * normals[None, :, 1]
+
+        # Cyrus-Beck: the parameter range of each segment inside the cell
+        a, b = self.start[segments], self.end[segments]
+        direction = b - a
+        level = distances(a)
+        rate = direction @ normals.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bound = -level / rate
+        t0 = np.max(np.where(rate > 0, bound, 0.0), axis=1, initial=0.0)
+        t1 = np.min(np.where(rate < 0, bound, 1.0), axis=1, initial=1.0)
+        parallel_out = np.any((rate == 0) & (level < -tolerance), axis=1)
+        t0, t1 = np.clip(t0, 0, 1), np.clip(t1, 0, 1)
+        p, q = a + t0[:, None] * direction, a + t1[:, None] * direction
+        middle = 0.5 * (p + q)
+        # Pieces along the cell's edge (or reduced to a point) are left to the walk round the cell
+        present = ~parallel_out & (t1 > t0) & (distances(middle).min(axis=1) > tolerance)
+        p_out = distances(p).min(axis=1) <= tolerance
+        q_out = distances(q).min(axis=1) <= tolerance
+        pieces = {}
+        for k in np.flatnonzero(present):
+            pieces[int(segments[k])] = (tuple(p[k]), tuple(q[k]), bool(p_out[k]), bool(q_out[k]))
+
+        def position(point):
+            # Distance along the cell's boundary, counter-clockwise from its first corner
+            edge = int(np.argmin(np.abs(distances(np.array([point]))[0])))
+            return perimeter[edge] + float(np.hypot(point[0] - cell[edge, 0], point[1] - cell[edge, 1]))
+
+        chains, loops, used = [], [], set()
+        for segment, (start, _, enters, _) in pieces.items():
+            if not enters:
+                continue
+            chain, current = [start], segment
+            while True:
+                used.add(current)
+                _, end, _, exits = pieces[current]
+                chain.append(end)
+                following = int(self.following[current])
+                if exits or following not in pieces:
+                    break
+                current = following
+            chains.append(chain)
+        for segment in pieces:
+            if segment in used:
+                continue
+            # A stretch of boundary wholly inside the cell
+            loop, current = [], segment
+            while current in pieces and current not in used:
+                used.add(current)
+                loop.append(pieces[current][0])
+                current = int(self.following[current])
+            if len(loop) >= 3:
+                loops.append(loop)
+
+        rings = []
+        if chains:
+            entries = np.array([position(chain[0]) for chain in chains])
+            exits = [position(chain[-1]) for chain in chains]
+            total = perimeter[-1]
+            corners = perimeter[:-1]
+            remaining = set(range(len(chains)))
+            while remaining:
+                first = current = min(remaining)
+                ring = []
+                while True:
+                    remaining.discard(current)
+                    ring.extend(chains[current])
+                    # Walk counter-clockwise round the cell to the next place the boundary enters it
+                    gap = (entries - exits[current] + tolerance) % total
+                    following = int(np.argmin(gap))
+                    passed = (corners - exits[current] + tolerance) % total
+                    between = np.flatnonzero((passed > tolerance) & (passed < gap[following]))
+                    ring.extend(tuple(cell[corner]) for corner in between[np.argsort(passed[between])])
+                    if following == first or following not in remaining:
+                        break
+                    current = following
+                if len(ring) >= 3:
+                    rings.append(ring)
+        elif self.contains(cell[0, 0], cell[0, 1])[0]:
+            rings.append([tuple(point) for point in cell.tolist()])
+        return [[(float(x), float(y)) for x, y in ring] for ring in rings + loops]
+
+# Cell rings shared with the worker processes of clip_to_regions
+_cells = None
+
+def _as_region(region):
+    if isinstance(region, Region):
+        return region
+    from polygon import Polygon
+
+    if isinstance(region, Polygon):
+        return Region([(point.x, point.y) for point in region.points])
+    return Region(region)
+
+def _set_cells(cells):
+    global _cells
+    _cells = cells
+
+def _clip_region(region):
+    """Clip the cells whose bounding boxes overlap a region's, returning {cell index: rings}"""
+    rings, low, high = _cells
+    touched = np.flatnonzero((high[:, 0] >= region.min_x) & (low[:, 0] <= region.max_x) &
+                             (high[:, 1] >= region.min_y) & (low[:, 1] <= region.max_y))
+    clipped = region.clip_rings([rings[index] for index in touched])
+    return {int(index): pieces for index, pieces in zip(touched.tolist(), clipped) if pieces}
+
+def clip_to_regions(voronoi, regions, processes=None):
+    """
+    Clip the cells of one diagram to many regions.
+
+    The cell rings and their bounding boxes are gathered once; each region
+    then only clips the cells whose boxes overlap its own.
+
+    Args:
+        voronoi: A finished diagram covering all of the regions
+        regions: Sequence of Regions, Polygons or lists of (x, y) corners
+        processes: Number of worker processes, or None to clip in this process
+
+    Returns:
+        A list with, for each region, a dict from site index to the rings of
+        the site's cell inside the region, as in Region.clip_cells; sites whose
+        cells miss the region are left out
+    """
+    regions = [_as_region(region) for region in regions]
+    rings = [np.array(site.ring(counterclockwise=True), dtype=np.float64).reshape(-1, 2) for site in voronoi.sites]
+    low = np.array([ring.min(axis=0) if len(ring) else (np.inf, np.inf) for ring in rings]).reshape(-1, 2)
+    high = np.array([ring.max(axis=0) if len(ring) else (-np.inf, -np.inf) for ring in rings]).reshape(-1, 2)
+    cells = (rings, low, high)
+    if processes is None:
+        _set_cells(cells)
+        try:
+            return [_clip_region(region) for region in regions]
+        finally:
+            _set_cells(None)
+    from concurrent.futures import ProcessPoolExecutor
+
+    # The cells are sent to each worker once, and only the regions per task
+    with ProcessPoolExecutor(max_workers=processes, initializer=_set_cells, initargs=(cells,)) as executor:
+        return list(executor.map(_clip_region, regions))
+
+def create_region_diagrams(points, regions, margin=None, precision=None, engine="fortune", processes=None):
+    """
+    Build one diagram for many regions and clip it to each of them.
+
+    The sweep runs once, over a box around the sites and all of the regions
+    grown by `margin`, instead of once per region. Keeping the regions away
+    from the box keeps them clear of the cells that the box itself cuts.
+
+    Args:
+        points: Sequence of (x, y) coordinates
+        regions: Sequence of Regions, Polygons or lists of (x, y) corners
+        margin: Gap between the regions and the box swept over; defaults to 5% of its extent
+        precision: Optional precision.Precision for the predicates
+        engine: Construction engine passed to Voronoi, "fortune" or "delaunay"
+        processes: Number of worker processes for the clipping, or None for this process
+
+    Returns:
+        The unclipped diagram and, for each region, a dict from site index to
+        the rings of its cell inside the region; see clip_to_regions
+    """
+    from polygon import Polygon
+    from voronoi import Voronoi
+
+    regions = [_as_region(region) for region in regions]
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    corners = np.concatenate([points] + [region.exterior for region in regions])
+    min_x, min_y = corners.min(axis=0)
+    max_x, max_y = corners.max(axis=0)
+    if margin is None:
+        margin = 0.05 * max(max_x - min_x, max_y - min_y, 1.0)
+    polygon = Polygon([(min_x - margin, min_y - margin), (max_x + margin, min_y - margin),
+                       (max_x + margin, max_y + margin), (min_x - margin, max_y + margin)])
+    voronoi = Voronoi(polygon, precision=precision, engine=engine)
+    voronoi.create_diagram(points=[tuple(point) for point in points.tolist()])
+    return voronoi, clip_to_regions(voronoi, regions, processes=processes)
@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+# Longest request or response line accepted; a diagram of n sites takes roughly 150n bytes
+LINE_LIMIT = 256 << 20
+
+def _build(points, bounding_polygon, engine, areas, time_budget=None):
+    """Worker side: build one diagram and flatten it to plain lists"""
+    from batch import _diagram_batch
+    from utils import create_voronoi_diagram
+
+    voronoi = create_voronoi_diagram([tuple(point) for point in points], bounding_polygon, engine=engine,
+                                     time_budget=time_budget)
+    entry = _diagram_batch(voronoi, areas=areas)[0]
+    return {key: value.tolist() for key, value in entry.items() if value is not None}
+
+class DiagramService:
+    """
+    Local asyncio server for Voronoi diagrams speaking newline-delimited JSON.
+
+    Each request line is an object with "points" (a list of [x, y]) and
+    optionally "id", "bounding_polygon", "engine" and "areas"; each response
+    line carries the same "id" with the flat arrays of `DiagramBatch`
+    ("sites", "vertices", "edges", "edge_sites" and "areas"), or "error".
+    Requests on one connection may be pipelined and are answered as they
+    finish. A sweep running longer than "time_budget" seconds (from the
+    request, or the service's default) is abandoned with a TimeoutError.
+
+    Diagrams are built in a process pool, so the event loop never blocks.
+    Identical requests in flight at the same time share one computation.
+    At most `queue_size` requests are admitted and unanswered at once, which
+    also bounds the queue of jobs waiting for a worker; past that, connections
+    stop being read, which pushes back on clients through TCP flow control.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, processes=None, queue_size=64, time_budget=None):
+        self.host = host
+        self.port = port
+        self.processes = processes
+        self.queue_size = queue_size
+        self.time_budget = time_budget
+        self.stats = {'requests': 0, 'computed': 0, 'coalesced': 0, 'errors': 0}
+        self._in_flight = {}
+        self._queue = None
+        self._slots = None
+        self._executor = None
+        self._server = None
+        self._dispatchers = []
+        self._connections = set()
+
+    async def start(self):
+        workers = self.processes or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        # Each admitted request holds a slot until answered and queues at most one job,
+        # so the queue never holds more than `queue_size` jobs
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._slots = asyncio.Semaphore(self.queue_size)
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(workers)]
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=LINE_LIMIT)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        for task in self._connections:
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            arguments, future = await self._queue.get()
+            try:
+                result = await loop.run_in_executor(self._executor, _build, *arguments)
+                future.set_result(result)
+            except Exception as error:
+                future.set_exception(error)
+            finally:
+                self._queue.task_done()
+
+    async def _diagram(self, request):
+        arguments = (request['points'], request.get('bounding_polygon'), request.get('engine', 'fortune'),
+                     bool(request.get('areas', False)), request.get('time_budget', self.time_budget))
+        key = hashlib.sha1(json.dumps(arguments).encode()).hexdigest()
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        self.stats['computed'] += 1
+        self._queue.put_nowait((arguments, future))
+        return await asyncio.shield(future)
+
+    async def _respond(self, line, writer, lock):
+        self.stats['requests'] += 1
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            response = {'id': request_id, **await self._diagram(request)}
+        except Exception as error:
+            self.stats['errors'] += 1
+            response = {'id': request_id, 'error': f'{type(error).__name__}: {error}'}
+        finally:
+            self._slots.release()
+        async with lock:
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+
+    async def _handle(self, reader, writer):
+        connection = asyncio.current_task()
+        self._connections.add(connection)
+        lock = asyncio.Lock()
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                # Nothing more is read from any client until a slot frees up
+                await self._slots.acquire()
+                task = asyncio.create_task(self._respond(line, writer, lock))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending)
+        except (asyncio.CancelledError, ConnectionError):
+            for task in pending:
+                task.cancel()
+        finally:
+            self._connections.discard(connection)
+            writer.close()
+
+async def load_test(host, port, requests=200, concurrency=16, points=200, distinct=50, seed=0):
+    """
+    Send `requests` diagram requests over `concurrency` connections.
+
+    Point sets are drawn from `distinct` random sets, so repeats exercise the
+    server's request coalescing.
+
+    Returns:
+        A dict with the request count, elapsed seconds, throughput and the
+        p50 and p99 latency in seconds
+    """
+    import random
+
+    rng = random.Random(seed)
+    point_sets = [[[rng.uniform(0, 1000), rng.uniform(0, 1000)] for _ in range(points)] for _ in range(distinct)]
+    order = [rng.randrange(distinct) for _ in range(requests)]
+    latencies = []
+
+    async def client(indices):
+        reader, writer = await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+        try:
+            for index in indices:
+                start = time.perf_counter()
+                writer.write(json.dumps({'id': index, 'points': point_sets[order[index]]}).encode() + b'\n')
+                await writer.drain()
+                response = json.loads(await reader.readline())
+                if 'error' in response:
+                    raise RuntimeError(response['error'])
+                latencies.append(time.perf_counter() - start)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(range(worker, requests, concurrency)) for worker in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'requests': requests,
+        'elapsed': elapsed,
+        'throughput': requests / elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p99': latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)],
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Voronoi diagram service')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve = subparsers.add_parser('serve', help='Run the server')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--processes', type=int, default=None, help='Worker processes (default: CPU count)')
+    serve.add_argument('--queue-size', type=int, default=64, help='Jobs waiting before clients are held back')
+    serve.add_argument('--time-budget', type=float, default=None, help='Seconds a sweep may run before it is abandoned')
+    load = subparsers.add_parser('load', help='Load-test a running server')
+    load.add_argument('--host', default='127.0.0.1')
+    load.add_argument('--port', type=int, default=8765)
+    load.add_argument('--requests', type=int, default=200)
+    load.add_argument('--concurrency', type=int, default=16)
+    load.add_argument('--points', type=int, default=200, help='Points per request')
+    load.add_argument('--distinct', type=int, default=50, help='Distinct point sets among the requests')
+    return parser.parse_args()
+
+async def _serve(args):
+    service = await DiagramService(args.host, args.port, args.processes, args.queue_size,
+                                   args.time_budget).start()
+    print(f"Serving on {service.host}:{service.port}")
+    await service.serve_forever()
+
+def main():
+    args = parse_args()
+    if args.command == 'serve':
+        try:
+            asyncio.run(_serve(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    report = asyncio.run(load_test(args.host, args.port, args.requests, args.concurrency, args.points, args.distinct))
+    print(f"{report['requests']} requests in {report['elapsed']:.2f}s: {report['throughput']:.1f} requests/s, "
+          f"p50 {report['p50'] * 1000:.1f} ms, p99 {report['p99'] * 1000:.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
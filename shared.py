@@ -0,0 +1,259 @@
+import os
+
+import numpy as np
+
+from geometry import Point, Vertex, HalfEdge
+
+# Columns of SharedDiagram.links: per half-edge, the index of its origin vertex, incident
+# site, twin, next and previous half-edge, -1 where there is none
+ORIGIN, SITE, TWIN, NEXT, PREV = range(5)
+
+_MAGIC = 0x564f524f4e4f4931
+# Header: magic, the pid of the owning process, then the counts of sites, vertices,
+# half-edges, edges, connected edge entries and bounding polygon corners
+_HEADER = 8
+
+def _shares_tracker(owner_pid):
+    """Whether this process uses the owner's resource tracker: it is the owner, or one of its multiprocessing children"""
+    import multiprocessing
+
+    parent = multiprocessing.parent_process()
+    return os.getpid() == owner_pid or (parent is not None and parent.pid == owner_pid)
+
+def _layout(sites, vertices, half_edges, edges, connected, corners):
+    """(name, dtype, shape) of the arrays following the header, in order"""
+    return [('sites', np.float64, (sites, 2)), ('names', np.int64, (sites,)), ('first_edge', np.int64, (sites,)),
+            ('vertices', np.float64, (vertices, 2)), ('connected_offsets', np.int64, (vertices + 1,)),
+            ('connected', np.int64, (connected,)), ('links', np.int64, (half_edges, 5)),
+            ('edges', np.int64, (edges,)), ('polygon', np.float64, (corners, 2))]
+
+def _size(dtype, shape):
+    return int(np.prod(shape)) * np.dtype(dtype).itemsize
+
+def _views(buffer, counts):
+    arrays, offset = {}, _HEADER * 8
+    for name, dtype, shape in _layout(*counts):
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        offset += _size(dtype, shape)
+    return arrays
+
+def _flatten(voronoi):
+    """The sites, vertices and half-edge links of a finished diagram as flat arrays"""
+    site_index = {id(site): index for index, site in enumerate(voronoi.sites)}
+    half_edges, half_edge_index = [], {}
+
+    def add(half_edge):
+        if half_edge is not None and id(half_edge) not in half_edge_index:
+            half_edge_index[id(half_edge)] = len(half_edges)
+            half_edges.append(half_edge)
+
+    for edge in voronoi.edges:
+        add(edge)
+    for site in voronoi.sites:
+        add(site.first_edge)
+    vertices = list(voronoi._vertices)
+    for vertex in vertices:
+        for half_edge in vertex.connected_edges:
+            add(half_edge)
+    # Everything reachable through the links gets a row, so no link points outside the table
+    position = 0
+    while position < len(half_edges):
+        half_edge = half_edges[position]
+        add(half_edge.twin)
+        add(half_edge.next)
+        add(half_edge.prev)
+        position += 1
+    vertex_index = {id(vertex): index for index, vertex in enumerate(vertices)}
+    for half_edge in half_edges:
+        origin = half_edge.origin
+        if isinstance(origin, Vertex) and id(origin) not in vertex_index:
+            vertex_index[id(origin)] = len(vertices)
+            vertices.append(origin)
+
+    def index_of(table, item):
+        return table[id(item)] if item is not None else -1
+
+    links = np.array([(vertex_index[id(half_edge.origin)] if isinstance(half_edge.origin, Vertex) else -1,
+                       site_index.get(id(half_edge.incident_point), -1),
+                       index_of(half_edge_index, half_edge.twin), index_of(half_edge_index, half_edge.next),
+                       index_of(half_edge_index, half_edge.prev)) for half_edge in half_edges],
+                     dtype=np.int64).reshape(-1, 5)
+    counts = np.array([len(vertex.connected_edges) for vertex in vertices], dtype=np.int64)
+    return {
+        'sites': np.array([(site.x, site.y) for site in voronoi.sites], dtype=np.float64).reshape(-1, 2),
+        'names': np.array([-1 if site.name is None else site.name for site in voronoi.sites], dtype=np.int64),
+        'first_edge': np.array([index_of(half_edge_index, site.first_edge) for site in voronoi.sites],
+                               dtype=np.int64),
+        'vertices': np.array([(np.nan if vertex.x is None else vertex.x, np.nan if vertex.y is None else vertex.y)
+                              for vertex in vertices], dtype=np.float64).reshape(-1, 2),
+        'connected_offsets': np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        'connected': np.array([half_edge_index[id(half_edge)] for vertex in vertices
+                               for half_edge in vertex.connected_edges], dtype=np.int64),
+        'links': links,
+        'edges': np.array([half_edge_index[id(edge)] for edge in voronoi.edges], dtype=np.int64),
+        'polygon': np.array([(point.x, point.y) for point in voronoi.bounding_poly.points],
+                            dtype=np.float64).reshape(-1, 2),
+    }
+
+class SharedDiagram:
+    """
+    A finished diagram held as flat arrays in one shared memory block.
+
+    Pickling a Voronoi copies its whole object graph and recurses along the
+    half-edge links. A SharedDiagram instead pickles as the name of its block,
+    so it can be passed to multiprocessing workers as is: they attach to the
+    block and read the arrays in place, without copying them. The linked
+    objects are only rebuilt if `voronoi` is accessed.
+
+    `links` holds one row per half-edge, indexed by the ORIGIN, SITE, TWIN,
+    NEXT and PREV columns. `edges` lists the half-edges of Voronoi.edges, and
+    `first_edge` the first half-edge of each site's cell. Vertex connected
+    edges are `connected[connected_offsets[i]:connected_offsets[i + 1]]`.
+
+    The process that shares a diagram owns the block and must `unlink` it
+    once the workers are done; every process `close`s its own view.
+    """
+
+    def __init__(self, memory, owner=False):
+        self.memory = memory
+        self.owner = owner
+        header = np.ndarray((_HEADER,), dtype=np.int64, buffer=memory.buf)
+        if header[0] != _MAGIC:
+            raise ValueError(f"Shared memory block {memory.name!r} does not hold a diagram")
+        self.owner_pid = int(header[1])
+        self._counts = tuple(int(count) for count in header[2:])
+        del header
+        arrays = _views(memory.buf, self._counts)
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        self._voronoi = None
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    @staticmethod
+    def share(voronoi, name=None):
+        """Copy a finished diagram into a new shared memory block, owned by this process"""
+        from multiprocessing import shared_memory
+
+        arrays = _flatten(voronoi)
+        counts = (len(arrays['sites']), len(arrays['vertices']), len(arrays['links']), len(arrays['edges']),
+                  len(arrays['connected']), len(arrays['polygon']))
+        size = _HEADER * 8 + sum(_size(dtype, shape) for _, dtype, shape in _layout(*counts))
+        memory = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+        header = np.ndarray((_HEADER,), dtype=np.int64, buffer=memory.buf)
+        header[:] = (_MAGIC, os.getpid()) + counts
+        del header
+        views = _views(memory.buf, counts)
+        for key, view in views.items():
+            view[...] = arrays[key]
+        del views
+        return SharedDiagram(memory, owner=True)
+
+    @staticmethod
+    def attach(name):
+        """Map a diagram shared by another process, without copying it"""
+        from multiprocessing import shared_memory
+
+        try:
+            memory = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            memory = None
+        if memory is not None:
+            return SharedDiagram(memory)
+        # Before Python 3.13, attaching registers the block with this process's resource
+        # tracker, which unlinks it when the process exits. Take it off again, unless the
+        # tracker is the owner's own, as in workers forked or spawned by the owner.
+        memory = shared_memory.SharedMemory(name=name)
+        shared = SharedDiagram(memory)
+        if os.name == "posix" and not _shares_tracker(shared.owner_pid):
+            from multiprocessing import resource_tracker
+
+            # The tracker knows POSIX blocks by their name with its leading slash
+            resource_tracker.unregister("/" + memory.name, "shared_memory")
+        return shared
+
+    def __reduce__(self):
+        return SharedDiagram.attach, (self.name,)
+
+    def __len__(self):
+        return len(self.sites)
+
+    def cell(self, index):
+        """The clockwise ring of vertex coordinates of a site's cell, read from the arrays"""
+        first = int(self.first_edge[index])
+        ring = []
+        half_edge = first
+        while half_edge != -1:
+            origin = self.links[half_edge, ORIGIN]
+            if origin != -1:
+                ring.append(origin)
+            half_edge = int(self.links[half_edge, NEXT])
+            if half_edge == first:
+                break
+        return self.vertices[np.array(ring, dtype=np.int64)]
+
+    @property
+    def voronoi(self):
+        """The diagram as linked objects, rebuilt from the arrays on first access"""
+        if self._voronoi is None:
+            self._voronoi = self._rebuild()
+        return self._voronoi
+
+    def _rebuild(self):
+        from polygon import Polygon
+        from voronoi import Voronoi
+
+        sites = [Point(x, y, name=None if name == -1 else name)
+                 for (x, y), name in zip(self.sites.tolist(), self.names.tolist())]
+        vertices = [Vertex(None if np.isnan(x) else x, None if np.isnan(y) else y) for x, y in self.vertices.tolist()]
+        links = self.links.tolist()
+        half_edges = [HalfEdge(sites[site] if site != -1 else None) for _, site, _, _, _ in links]
+        for half_edge, (origin, _, twin, following, previous) in zip(half_edges, links):
+            half_edge.origin = vertices[origin] if origin != -1 else None
+            half_edge._twin = half_edges[twin] if twin != -1 else None
+            half_edge.next = half_edges[following] if following != -1 else None
+            half_edge.prev = half_edges[previous] if previous != -1 else None
+        offsets, connected = self.connected_offsets.tolist(), self.connected.tolist()
+        for index, vertex in enumerate(vertices):
+            vertex.connected_edges = [half_edges[entry] for entry in connected[offsets[index]:offsets[index + 1]]]
+        for site, first in zip(sites, self.first_edge.tolist()):
+            site.first_edge = half_edges[first] if first != -1 else None
+        voronoi = Voronoi(Polygon([tuple(corner) for corner in self.polygon.tolist()]))
+        voronoi.sites = sites
+        voronoi.edges = [half_edges[edge] for edge in self.edges.tolist()]
+        voronoi._vertices = list(vertices)
+        return voronoi
+
+    def close(self):
+        """Release this process's view of the block; the arrays must no longer be used"""
+        for name, _, _ in _layout(*self._counts):
+            setattr(self, name, None)
+        self.memory.close()
+
+    def unlink(self):
+        """Free the block, once every process has closed it"""
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        if self.owner:
+            self.unlink()
+
+def share_diagram(voronoi, name=None):
+    """
+    Export a finished diagram into shared memory for other processes.
+
+    Args:
+        voronoi: A finished Voronoi diagram
+        name: Optional name for the shared memory block; a unique one is chosen by default
+
+    Returns:
+        The owning SharedDiagram; pass it (or its `name` to SharedDiagram.attach)
+        to other processes, and unlink it when they are done
+    """
+    return SharedDiagram.share(voronoi, name=name)
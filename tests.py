@@ -1,9 +1,40 @@
+import os
+import io
+import sys
+import gc
+import json
+import math
+import pathlib
+import pickle
+import asyncio
+import struct
+import tempfile
+import threading
+import subprocess
 import unittest
 import numpy as np
 from geometry import Coordinate, Point, HalfEdge, Vertex
-from polygon import Polygon
+from polygon import Polygon, clip_ring
+from voronoi import Voronoi, SweepCancelled
 from events import CircleEvent
-from utils import create_voronoi_diagram, generate_random_points
+from tree import Node, Tree
+from culling import SiteIndex, deduplicate_sites
+from locate import CellLocator
+from region import Region, create_region_diagrams
+from batch import create_voronoi_diagrams
+from shared import SharedDiagram, share_diagram
+from ordering import hilbert_keys
+from outofcore import create_voronoi_diagram_out_of_core
+from periodic import create_periodic_voronoi_diagram, fold_cells
+from raster import rasterize_voronoi, rasterize_cells
+from export import GeoJSONWriter, WKBWriter, SVGWriter
+from interpolate import NaturalNeighborInterpolator
+from jobs import run_jobs
+from tracing import TraceRecorder, load_trace, replay, STALE, START
+from service import LINE_LIMIT, DiagramService, _build
+from delaunay import DelaunayTriangulation, _incircle
+from precision import Precision
+from utils import create_voronoi_diagram, generate_random_points, generate_grid_points
 
 class TestGeometry(unittest.TestCase):
     def test_coordinate(self):
@@ -24,6 +55,16 @@ class TestGeometry(unittest.TestCase):
         p_noname = Point(1.0, 2.0)
         self.assertTrue("Point" in str(p_noname))
 
+    def test_cell_ring(self):
+        diagram = create_voronoi_diagram(generate_random_points(50, 1, 99, 1, 99),
+                                         [(0, 0), (100, 0), (100, 100), (0, 100)])
+        site = diagram.sites[10]
+        ring = site.ring()
+        self.assertEqual(ring, [(vertex.x, vertex.y) for vertex in site.vertices()])
+        self.assertEqual(site.ring(counterclockwise=True), ring[::-1])
+        area = sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]))
+        self.assertLess(area, 0)
+
 class TestPolygon(unittest.TestCase):
     def test_polygon_creation(self):
         poly = Polygon([(0, 0), (10, 0), (10, 10), (0, 10)])
@@ -62,7 +103,627 @@ class TestVoronoi(unittest.TestCase):
         self.assertAlmostEqual(y, 0.375, places=6)  # The correct y-coordinate is 0.375
         self.assertAlmostEqual(r, np.sqrt(0.390625), places=6)  # Radius is approximately 0.625
 
+    def test_recycling_and_disabled_gc(self):
+        points = generate_random_points(400)
+        box = [(0, 0), (100, 0), (100, 100), (0, 100)]
+        areas = [site.area() for site in create_voronoi_diagram(points, box).sites]
+        # Recycled objects must not leak state: rebuilding matches the exact cells
+        exact = [site.area() for site in create_voronoi_diagram(points, box, engine="delaunay").sites]
+        interior = [k for k, (x, y) in enumerate(points) if 20 < x < 80 and 20 < y < 80]
+        np.testing.assert_allclose([areas[k] for k in interior], [exact[k] for k in interior])
+        paused = create_voronoi_diagram(points, box, disable_gc=True)
+        self.assertTrue(gc.isenabled())
+        self.assertEqual([site.area() for site in paused.sites], areas)
+
+    def test_degenerate_fast_path(self):
+        box = [(-1, -1), (101, -1), (101, 101), (-1, 101)]
+        points = generate_grid_points(12, 12)
+        general = create_voronoi_diagram(points, box)
+        fast = Voronoi(Polygon(box), degenerate=True, remove_zero_length_edges=False)
+        fast.create_diagram(points)
+        # Cocircular events were merged during the sweep, leaving nothing to clean up
+        edges = len(fast.edges)
+        fast.clean_up_zero_length_edges()
+        self.assertEqual(len(fast.edges), edges)
+        self.assertEqual(len(fast.edges), len(general.edges))
+        self.assertEqual(len(fast.vertices), len(general.vertices))
+        for a, b in zip(general.sites, fast.sites):
+            self.assertAlmostEqual(a.area(), b.area(), places=9)
+
+    def test_progress_budget_and_cancellation(self):
+        points = generate_random_points(300)
+        calls = []
+        voronoi = create_voronoi_diagram(points, progress=lambda *call: calls.append(call), every=100)
+        self.assertGreaterEqual(len(calls), 5)
+        self.assertEqual([processed for _, processed, _ in calls], list(range(100, 100 * len(calls) + 1, 100)))
+        self.assertEqual([line for line, _, _ in calls], sorted((line for line, _, _ in calls), reverse=True))
+        self.assertGreaterEqual(calls[0][2], 200)
+        with self.assertRaises(TimeoutError):
+            create_voronoi_diagram(points, time_budget=0, every=50)
+        cancel = threading.Event()
+        cancel.set()
+        with self.assertRaises(SweepCancelled):
+            create_voronoi_diagram(points, cancel=cancel, every=50)
+
+    def test_delaunay_engine_honours_budget_and_cancellation(self):
+        points = generate_random_points(300)
+        calls = []
+        create_voronoi_diagram(points, engine="delaunay", progress=lambda *call: calls.append(call), every=100)
+        # Insertions, then cells
+        self.assertEqual([(processed, remaining) for _, processed, remaining in calls],
+                         [(done, 600 - done) for done in range(100, 600, 100)])
+        with self.assertRaises(TimeoutError):
+            create_voronoi_diagram(points, engine="delaunay", time_budget=0, every=50)
+        cancel = threading.Event()
+        cancel.set()
+        with self.assertRaises(SweepCancelled):
+            create_voronoi_diagram(points, engine="delaunay", cancel=cancel, every=50)
+        with self.assertRaises(ValueError):
+            create_voronoi_diagram(points, engine="delaunay", recorder=TraceRecorder())
+
+    def test_trace_replays_the_sweep(self):
+        for points, degenerate in ((generate_random_points(500), False), (generate_grid_points(8, 8), True)):
+            recorder = TraceRecorder()
+            create_voronoi_diagram(points, recorder=recorder, degenerate=degenerate)
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'trace.npz')
+                recorder.save(path)
+                events, settings = load_trace(path)
+            self.assertEqual(len(events), len(recorder))
+            if not degenerate:
+                self.assertGreater(np.count_nonzero(events['kind'] == STALE), 0)
+            result = replay(events, settings)
+            self.assertEqual((result['arcs_differ'], result['depth_differs']), (0, 0))
+
+    def test_trace_records_the_beach_line_size(self):
+        recorder = TraceRecorder()
+        leaves = []
+        record = recorder.record
+
+        def counting(voronoi, event):
+            leaves.append(len(list(Tree.iter_leaves(voronoi.status_tree))))
+            record(voronoi, event)
+
+        recorder.record = counting
+        create_voronoi_diagram(generate_random_points(300), recorder=recorder)
+        events = recorder.to_array()
+        np.testing.assert_array_equal(events['arcs'][events['kind'] != START], leaves)
+
+class TestPrecision(unittest.TestCase):
+    def test_exact_circle(self):
+        precision = Precision(exact=True, grid=0.5)
+        x, y, r = CircleEvent.create_circle(Coordinate(0, 0), Coordinate(1, 0), Coordinate(0.5, 1), precision)
+        self.assertEqual((x, y), (0.5, 0.375))
+        self.assertAlmostEqual(r, 0.625, places=12)
+        self.assertFalse(precision.circle(Coordinate(0, 0), Coordinate(1, 1), Coordinate(3, 3)))
+        self.assertEqual(precision.orientation(Coordinate(0, 0), Coordinate(1, 0), Coordinate(0.5, 1)), 1)
+
+    def test_snap_to_grid(self):
+        precision = Precision(exact=True, grid=0.25)
+        self.assertEqual(precision.snap(1.1), 1.0)
+        self.assertEqual(precision.units(1.3), 5)
+        self.assertEqual(Precision().snap(1.1), 1.1)
+
+    def test_tolerance_scales_with_extent(self):
+        precision = Precision(scale=1000.0)
+        self.assertAlmostEqual(precision.tolerance(), 1e-7)
+        self.assertAlmostEqual(precision.tolerance(degree=2), 1e-4)
+
+    def test_exact_mode_on_large_integer_grid(self):
+        offset = 10 ** 9
+        points = [(offset + 100 * i, offset + 100 * j) for i in range(6) for j in range(6)]
+        box = [(offset - 50, offset - 50), (offset + 550, offset - 50),
+               (offset + 550, offset + 550), (offset - 50, offset + 550)]
+        diagram = create_voronoi_diagram(points, box, precision=Precision(exact=True))
+        for edge in diagram.edges:
+            start, end = edge.get_origin(), edge.twin.get_origin()
+            self.assertGreater(math.hypot(start.x - end.x, start.y - end.y), 1e-6 * 600)
+        for site in diagram.sites:
+            if 0 < site.x - offset < 500 and 0 < site.y - offset < 500:
+                self.assertAlmostEqual(site.area(), 10000.0, places=6)
+
+    def test_exact_mode_drops_short_boundary_edges(self):
+        # The bisector meets the bounding polygon at its corners, clipped in floating point
+        exact = create_voronoi_diagram([(1, 1), (5, 5)], precision=Precision(exact=True))
+        rounded = create_voronoi_diagram([(1, 1), (5, 5)])
+        self.assertEqual(len(exact.edges), len(rounded.edges))
+        for edge in exact.edges:
+            start, end = edge.get_origin(), edge.twin.get_origin()
+            self.assertGreater(math.hypot(start.x - end.x, start.y - end.y), 1e-6 * 8)
+
+class TestTree(unittest.TestCase):
+    def test_leaf_list_matches_tree_order(self):
+        diagram = create_voronoi_diagram(generate_random_points(30))
+        leaves = list(Tree.iter_leaves(diagram.status_tree))
+        self.assertGreater(len(leaves), 1)
+        for leaf in leaves:
+            self.assertIs(leaf.predecessor, Node.predecessor.fget(leaf))
+            self.assertIs(leaf.successor, Node.successor.fget(leaf))
+
+    def test_beach_line_stays_balanced(self):
+        diagram = create_voronoi_diagram(generate_random_points(200))
+        stack = [diagram.status_tree]
+        while stack:
+            node = stack.pop()
+            self.assertLessEqual(abs(node.balance), 1)
+            self.assertEqual(node.height, node.calculate_height())
+            stack.extend(child for child in (node.left, node.right) if child is not None)
+
+class TestCulling(unittest.TestCase):
+    def test_cull_keeps_every_owner(self):
+        rng = np.random.default_rng(0)
+        points = rng.uniform(0, 100, (2000, 2))
+        polygon = Polygon([(40, 40), (55, 40), (55, 55), (40, 55)])
+        keep = set(SiteIndex(points).cull(polygon).tolist())
+        self.assertLess(len(keep), len(points) // 4)
+        queries = rng.uniform(40, 55, (2000, 2))
+        owners = np.argmin(((queries[:, None, :] - points[None]) ** 2).sum(axis=2), axis=1)
+        self.assertTrue(set(owners.tolist()) <= keep)
+
+    def test_culled_diagram_matches_full(self):
+        points = [tuple(p) for p in np.random.default_rng(1).uniform(0, 100, (300, 2))]
+        bounding_polygon = [(30, 30), (60, 30), (60, 60), (30, 60)]
+        full = create_voronoi_diagram(points, bounding_polygon)
+        culled = create_voronoi_diagram(points, bounding_polygon, site_index=SiteIndex(points))
+        self.assertLess(len(culled.sites), len(full.sites))
+        for site, index in zip(culled.sites, culled.site_indices):
+            if culled.bounding_poly.inside(site):
+                self.assertAlmostEqual(site.area(), full.sites[index].area(), places=6)
+
+    def test_deduplicate_sites(self):
+        survivors, site_map = deduplicate_sites([(0, 0), (1, 1), (0, 0), (0.5, 0.5), (1, 1 + 1e-9)], 1e-6)
+        self.assertEqual(survivors.tolist(), [0, 1, 3])
+        self.assertEqual(site_map.tolist(), [0, 1, 0, 2, 1])
+        points = [tuple(p) for p in np.random.default_rng(2).uniform(0, 100, (200, 2))]
+        voronoi = create_voronoi_diagram(points + points[:20], [(0, 0), (100, 0), (100, 100), (0, 100)],
+                                         deduplicate=0)
+        reference = create_voronoi_diagram(points, [(0, 0), (100, 0), (100, 100), (0, 100)])
+        self.assertEqual(len(voronoi.sites), len(points))
+        self.assertEqual(voronoi.site_map[200:].tolist(), list(range(20)))
+        self.assertEqual(len(voronoi.edges), len(reference.edges))
+
+class TestRegion(unittest.TestCase):
+    def setUp(self):
+        angles = np.linspace(0, 2 * np.pi, 60, endpoint=False)
+        # A concave star with two holes (given in either orientation)
+        radii = np.where(np.arange(60) % 2 == 0, 45, 25)
+        exterior = np.column_stack([50 + radii * np.cos(angles), 50 + radii * np.sin(angles)])
+        square = [(40, 40), (48, 40), (48, 48), (40, 48)]
+        triangle = [(55, 52), (58, 60), (52, 58)]
+        self.region = Region(exterior[::-1], [square, triangle])
+        points = [tuple(p) for p in np.random.default_rng(8).uniform(0, 100, (400, 2)).tolist()]
+        self.voronoi = create_voronoi_diagram(points, [(-5, -5), (105, -5), (105, 105), (-5, 105)],
+                                              engine="delaunay")
+
+    @staticmethod
+    def signed_area(rings):
+        return sum(0.5 * (np.dot(r[:, 0], np.roll(r[:, 1], -1)) - np.dot(r[:, 1], np.roll(r[:, 0], -1)))
+                   for r in map(np.array, rings) if len(r) >= 3)
+
+    def test_clipped_cells_match_reference(self):
+        clipped = self.region.clip_cells(self.voronoi)
+        for site, rings in zip(self.voronoi.sites, clipped):
+            cell = [(vertex.x, vertex.y) for vertex in site.vertices()][::-1]
+            edges = [(x1, y1, x2, y2) for (x1, y1), (x2, y2) in zip(cell, cell[1:] + cell[:1])]
+            # Sutherland-Hodgman of each boundary ring against the convex cell gives the exact area
+            expected = sum(self.signed_area([clip_ring([tuple(p) for p in ring.tolist()], edges)])
+                           for ring in [self.region.exterior] + self.region.holes)
+            self.assertAlmostEqual(self.signed_area(rings), expected, places=9)
+        self.assertAlmostEqual(sum(map(self.signed_area, clipped)), self.region.area, places=9)
+
+    def test_clip_to_many_regions(self):
+        points = [(site.x, site.y) for site in self.voronoi.sites]
+        boxes = [[(10, 10), (40, 10), (40, 30), (10, 30)], Polygon([(50, 60), (90, 60), (90, 95), (50, 95)])]
+        _, clipped = create_region_diagrams(points, boxes + [self.region], engine="delaunay")
+        # Matches a diagram swept over each convex region on its own
+        for box, cells in zip(boxes, clipped):
+            reference = create_voronoi_diagram(points, box, engine="delaunay")
+            for index, site in enumerate(reference.sites):
+                self.assertAlmostEqual(self.signed_area(cells.get(index, [])), site.area(), places=9)
+        self.assertAlmostEqual(sum(map(self.signed_area, clipped[2].values())), self.region.area, places=9)
+
+    def test_tolerance_matches_polygon(self):
+        corners = [(10, 10), (40, 10), (40, 30), (10, 30)]
+        self.assertEqual(Region(corners).tolerance, Polygon(corners).precision.tolerance())
+
+    def test_contains(self):
+        self.assertTrue(self.region.contains(50, 30)[0])
+        np.testing.assert_array_equal(self.region.contains([44, 56, 2, 50], [44, 56, 2, 55]),
+                                      [False, False, False, True])
+
+class TestLocate(unittest.TestCase):
+    def test_locate_matches_nearest_site(self):
+        diagram = create_voronoi_diagram(generate_random_points(100))
+        locator = CellLocator(diagram)
+        queries = np.random.default_rng(2).uniform(0, 100, (5000, 2))
+        cells = locator.locate(queries)
+        inside = diagram.bounding_poly.inside_many(queries[:, 0], queries[:, 1])
+        brute = np.argmin(((queries[:, None, :] - locator.sites[None]) ** 2).sum(axis=2), axis=1)
+        np.testing.assert_array_equal(cells[inside], brute[inside])
+        self.assertTrue(np.all(cells[~inside] == -1))
+
+    def test_inside_many_matches_inside(self):
+        poly = Polygon([(0, 0), (10, 0), (12, 6), (5, 12), (-2, 6)])
+        points = np.random.default_rng(3).uniform(-3, 13, (500, 2))
+        expected = [poly.inside(Coordinate(x, y)) for x, y in points]
+        self.assertEqual(poly.inside_many(points[:, 0], points[:, 1]).tolist(), expected)
+
+class TestBatch(unittest.TestCase):
+    def test_batch_matches_single_diagrams(self):
+        box = [(0, 0), (100, 0), (100, 100), (0, 100)]
+        point_sets = [generate_random_points(n, 1, 99, 1, 99) for n in (3, 20, 35)]
+        batch = create_voronoi_diagrams(point_sets, box, chunksize=2, areas=True)
+        self.assertEqual(len(batch), 3)
+        for index, points in enumerate(point_sets):
+            diagram = create_voronoi_diagram(points, box)
+            entry = batch[index]
+            np.testing.assert_allclose(entry['sites'], points)
+            np.testing.assert_allclose(entry['areas'], [site.area() for site in diagram.sites])
+            self.assertEqual(len(entry['edges']), len(diagram.edges))
+
+    def test_float32_output(self):
+        point_sets = [[(1, 1), (5, 5), (9, 1), (4, 8)]]
+        batch = create_voronoi_diagrams(point_sets, precision=Precision(exact=True), dtype=np.float32, areas=True)
+        self.assertEqual(batch.sites.dtype, np.float32)
+        self.assertEqual(batch.vertices.dtype, np.float32)
+        self.assertEqual(batch.areas.dtype, np.float32)
+
+    def test_process_pool_matches_serial(self):
+        point_sets = [generate_random_points(15) for _ in range(6)]
+        box = [(-1, -1), (101, -1), (101, 101), (-1, 101)]
+        serial = create_voronoi_diagrams(point_sets, box)
+        pooled = create_voronoi_diagrams(point_sets, box, processes=2, chunksize=2)
+        np.testing.assert_array_equal(serial.edges, pooled.edges)
+        np.testing.assert_allclose(serial.vertices, pooled.vertices)
+
+class TestOrdering(unittest.TestCase):
+    def test_hilbert_keys_walk_the_grid(self):
+        x, y = np.meshgrid(np.arange(16), np.arange(16))
+        keys = hilbert_keys(x.ravel(), y.ravel(), bounds=(0, 0, 15, 15), bits=4)
+        np.testing.assert_array_equal(np.sort(keys), np.arange(256))
+        order = np.argsort(keys)
+        # Consecutive keys are adjacent grid cells
+        steps = np.abs(np.diff(x.ravel()[order])) + np.abs(np.diff(y.ravel()[order]))
+        self.assertTrue(np.all(steps == 1))
+
+    def test_reordered_diagram_maps_back_to_input(self):
+        points = generate_random_points(300, 1, 99, 1, 99)
+        points += points[:10]
+        box = [(0, 0), (100, 0), (100, 100), (0, 100)]
+        plain = create_voronoi_diagram(points, box, deduplicate=0, engine="delaunay")
+        ordered = create_voronoi_diagram(points, box, deduplicate=0, engine="delaunay", reorder=True)
+        self.assertEqual(len(ordered.edges), len(plain.edges))
+        self.assertEqual(len(ordered.vertices), len(plain.vertices))
+        for index, site in enumerate(ordered.sites):
+            self.assertEqual(site.name, index)
+            self.assertEqual((site.x, site.y), points[ordered.site_indices[index]])
+        np.testing.assert_array_equal(ordered.site_indices[ordered.site_map],
+                                      plain.site_indices[plain.site_map])
+        areas = np.array([site.area() for site in plain.sites])
+        np.testing.assert_allclose([site.area() for site in ordered.sites],
+                                   areas[plain.site_map[ordered.site_indices]], atol=1e-9)
+        keys = hilbert_keys([site.x for site in ordered.sites], [site.y for site in ordered.sites],
+                            bounds=(0, 0, 100, 100))
+        self.assertTrue(np.all(np.diff(keys.astype(np.int64)) >= 0))
+
+    def test_culled_and_reordered_diagram_keeps_its_site_map(self):
+        points = generate_random_points(500)
+        box = [(20, 20), (60, 20), (60, 60), (20, 60)]
+        ordered = create_voronoi_diagram(points, box, site_index=SiteIndex(points), reorder=True)
+        self.assertEqual(len(ordered.site_map), len(points))
+        kept = ordered.site_map >= 0
+        self.assertEqual(np.count_nonzero(kept), len(ordered.sites))
+        np.testing.assert_array_equal(ordered.site_indices[ordered.site_map[kept]], np.flatnonzero(kept))
+        for index, site in enumerate(ordered.sites):
+            self.assertEqual((site.x, site.y), points[ordered.site_indices[index]])
+
+class TestShared(unittest.TestCase):
+    def setUp(self):
+        self.voronoi = create_voronoi_diagram(generate_random_points(40, 1, 99, 1, 99),
+                                              [(0, 0), (100, 0), (100, 100), (0, 100)])
+
+    def test_object_view_matches_diagram(self):
+        with share_diagram(self.voronoi) as shared:
+            rebuilt = SharedDiagram.attach(shared.name)
+            np.testing.assert_allclose(rebuilt.cell(5), [vertex.xy for vertex in self.voronoi.sites[5].vertices()])
+            view = rebuilt.voronoi
+            self.assertEqual(len(view.edges), len(self.voronoi.edges))
+            self.assertIsInstance(view._vertices, list)
+            self.assertEqual([vertex.xy for vertex in view._vertices], [vertex.xy for vertex in self.voronoi._vertices])
+            self.assertEqual([site.area() for site in view.sites], [site.area() for site in self.voronoi.sites])
+            rebuilt.close()
+
+    def test_workers_attach_by_name(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        with share_diagram(self.voronoi) as shared:
+            self.assertLess(len(pickle.dumps(shared)), 200)
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                ring = executor.submit(SharedDiagram.cell, shared, 7).result()
+            np.testing.assert_allclose(ring, shared.cell(7))
+
+    def test_separate_process_leaves_the_block_alive(self):
+        directory = os.path.dirname(os.path.abspath(__file__))
+        with share_diagram(self.voronoi) as shared:
+            code = (f"from shared import SharedDiagram\n"
+                    f"shared = SharedDiagram.attach({shared.name!r})\n"
+                    f"print(len(shared.cell(7)))\n"
+                    f"shared.close()")
+            result = subprocess.run([sys.executable, "-c", code], cwd=directory, capture_output=True, text=True)
+            self.assertEqual(int(result.stdout), len(shared.cell(7)))
+            self.assertNotIn("leaked", result.stderr)
+            # The block outlives the other process's resource tracker
+            SharedDiagram.attach(shared.name).close()
+
+class TestDelaunay(unittest.TestCase):
+    def test_triangulation_is_delaunay(self):
+        points = np.array(generate_random_points(60))
+        triangulation = DelaunayTriangulation(points)
+        xy = triangulation.points
+        for a, b, c in triangulation.triangles:
+            circle = (*xy[a], *xy[b], *xy[c])
+            for d in range(len(points)):
+                if d not in (a, b, c):
+                    self.assertLessEqual(_incircle(*circle, *xy[d]), 1e-6)
+
+    def test_cells_tile_the_polygon(self):
+        box = [(-1, -1), (101, -1), (101, 101), (-1, 101)]
+        points = generate_random_points(80)
+        diagram = create_voronoi_diagram(points, box, engine="delaunay")
+        self.assertAlmostEqual(sum(site.area() for site in diagram.sites), 102 * 102, places=6)
+        fortune = create_voronoi_diagram(points, box)
+        self.assertEqual([site.name for site in diagram.sites], [site.name for site in fortune.sites])
+        queries = np.random.default_rng(1).uniform(0, 100, (2000, 2))
+        brute = np.argmin(((queries[:, None, :] - np.array(points)[None]) ** 2).sum(axis=2), axis=1)
+        cells = CellLocator(diagram).locate(queries)
+        order = [points.index((site.x, site.y)) for site in diagram.sites]
+        np.testing.assert_array_equal(np.array(order)[cells], brute)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            create_voronoi_diagram([(1, 1), (2, 2)], engine="quadtree")
+
+class TestOutOfCore(unittest.TestCase):
+    def test_matches_in_memory_diagram(self):
+        points = np.random.default_rng(2).uniform(0, 100, (400, 2))
+        box = [(-1, -1), (101, -1), (101, 101), (-1, 101)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "points.npy")
+            np.save(path, points)
+            store = create_voronoi_diagram_out_of_core(path, os.path.join(directory, "cells"), box, band_size=60,
+                                                       chunk_size=75, engine="delaunay")
+            diagram = create_voronoi_diagram([tuple(point) for point in points.tolist()], box, engine="delaunay")
+            self.assertEqual(sorted(index for index, _ in store), list(range(len(points))))
+            for index, ring in store:
+                expected = np.array([(vertex.x, vertex.y) for vertex in diagram.sites[index].vertices()])
+                # Same ring, possibly starting at a different vertex
+                start = np.argmin(np.hypot(*(expected - ring[0]).T))
+                np.testing.assert_allclose(ring, np.roll(expected, -start, axis=0), atol=1e-9)
+
+class TestPeriodic(unittest.TestCase):
+    def test_matches_tiled_diagram(self):
+        points = np.random.default_rng(5).uniform(0, 100, (150, 2))
+        voronoi = create_periodic_voronoi_diagram(points, (0, 0, 100, 100))
+        self.assertLess(len(voronoi.sites), 3 * len(points))
+        self.assertEqual(voronoi.site_indices[:150].tolist(), list(range(150)))
+        tiled = [(x + dx, y + dy) for dx in (-100, 0, 100) for dy in (-100, 0, 100) for x, y in points.tolist()]
+        full = create_voronoi_diagram(tiled, [(-100, -100), (200, -100), (200, 200), (-100, 200)],
+                                      engine="delaunay")
+        for index in range(150):
+            self.assertAlmostEqual(voronoi.sites[index].area(), full.sites[4 * 150 + index].area(), places=6)
+
+    def test_folded_cells_tile_the_domain(self):
+        points = np.random.default_rng(6).uniform(-50, 150, (60, 2))
+        voronoi = create_periodic_voronoi_diagram(points, (0, 0, 100, 100))
+        total = 0.0
+        for index, rings in enumerate(fold_cells(voronoi)):
+            area = sum(Point._shoelace(*np.array(ring).T) for ring in rings)
+            self.assertAlmostEqual(area, voronoi.sites[index].area(), places=6)
+            total += area
+        self.assertAlmostEqual(total, 100 * 100, places=6)
+
+class TestRaster(unittest.TestCase):
+    def test_labels_within_a_pixel(self):
+        points = np.random.default_rng(3).uniform(0, 100, (300, 2))
+        labels = rasterize_voronoi(points, [(0, 0), (100, 0), (100, 100), (0, 100)], width=128)
+        self.assertEqual(labels.shape, (128, 128))
+        centers = (np.arange(128) + 0.5) * (100 / 128)
+        grid_x, grid_y = np.meshgrid(centers, centers)
+        distances = np.hypot(points[:, 0] - grid_x[..., None], points[:, 1] - grid_y[..., None])
+        nearest = distances.argmin(axis=2)
+        self.assertGreater(np.mean(labels == nearest), 0.98)
+        excess = np.take_along_axis(distances, labels[..., None], axis=2)[..., 0] - distances.min(axis=2)
+        self.assertLess(excess.max(), 2 * 100 / 128)
+
+    def test_outside_polygon_is_masked(self):
+        triangle = [(0, 0), (10, 0), (5, 10)]
+        labels = rasterize_voronoi([(3, 2), (7, 2), (5, 6)], triangle, width=20)
+        self.assertEqual(labels[-1, 0], -1)
+        self.assertEqual(labels[0, 10], 1)
+        self.assertEqual(labels[12, 10], 2)
+        self.assertEqual(set(np.unique(labels)), {-1, 0, 1, 2})
+
+    def test_scanline_fill_is_exact(self):
+        points = np.random.default_rng(4).uniform(0, 100, (150, 2))
+        diagram = create_voronoi_diagram([tuple(point) for point in points.tolist()],
+                                         [(0, 0), (100, 0), (100, 100), (0, 100)], engine="delaunay")
+        labels = rasterize_cells(diagram, width=100)
+        centers = np.arange(100) + 0.5
+        grid_x, grid_y = np.meshgrid(centers, centers)
+        nearest = np.hypot(points[:, 0] - grid_x[..., None], points[:, 1] - grid_y[..., None]).argmin(axis=2)
+        np.testing.assert_array_equal(labels, nearest)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "labels.npy")
+            rasterize_cells(diagram, width=100, out=path, tile_rows=7)
+            np.testing.assert_array_equal(np.load(path), labels)
+            path = pathlib.Path(directory) / "path.npy"
+            rasterize_cells(diagram, width=100, out=path)
+            np.testing.assert_array_equal(np.load(path), labels)
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.diagram = create_voronoi_diagram(generate_random_points(40), [(0, 0), (100, 0), (100, 100), (0, 100)],
+                                              engine="delaunay")
+        self.rings = [[(vertex.x, vertex.y) for vertex in site.vertices()][::-1] for site in self.diagram.sites]
+
+    def test_geojson_lines(self):
+        output = io.StringIO()
+        with GeoJSONWriter(output, chunk_size=7, buffer_size=100) as writer:
+            writer.write(self.diagram)
+        features = [json.loads(line) for line in output.getvalue().splitlines()]
+        cells = [feature for feature in features if feature["geometry"]["type"] == "Polygon"]
+        self.assertEqual(len(cells), len(self.diagram.sites))
+        self.assertEqual(len(features) - len(cells), len(self.diagram.edges))
+        for cell in cells:
+            ring = cell["geometry"]["coordinates"][0]
+            self.assertEqual(ring[0], ring[-1])
+            np.testing.assert_allclose(ring[:-1], self.rings[cell["properties"]["site"]])
+
+    def test_wkb_round_trip_and_quantization(self):
+        output = io.BytesIO()
+        with WKBWriter(output, digits=2) as writer:
+            writer.write_cells(self.diagram)
+        data = output.getvalue()
+        offset = 0
+        for ring in self.rings:
+            order, kind, rings, count = struct.unpack_from('<BIII', data, offset)
+            self.assertEqual((order, kind, rings, count), (1, 3, 1, len(ring) + 1))
+            points = np.frombuffer(data, dtype='<f8', count=2 * count, offset=offset + 13).reshape(-1, 2)
+            np.testing.assert_array_equal(points[:-1], np.round(ring, 2))
+            offset += 13 + 16 * count
+        self.assertEqual(offset, len(data))
+
+    def test_svg_paths(self):
+        output = io.StringIO()
+        with SVGWriter(output, self.diagram.bounding_poly) as writer:
+            writer.write(self.diagram)
+        svg = output.getvalue()
+        self.assertTrue(svg.startswith("<svg") and svg.endswith("</svg>\n"))
+        self.assertEqual(svg.count("data-site="), len(self.diagram.sites))
+        self.assertEqual(svg.count("<path"), len(self.diagram.sites) + len(self.diagram.edges))
+
+    def test_writers_accept_paths(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory) / "cells.wkb"
+            with WKBWriter(path) as writer:
+                writer.write_cells(self.diagram)
+            output = io.BytesIO()
+            with WKBWriter(output) as writer:
+                writer.write_cells(self.diagram)
+            self.assertEqual(path.read_bytes(), output.getvalue())
+
+class TestInterpolation(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.points = rng.uniform(0, 100, (300, 2))
+        diagram = create_voronoi_diagram([tuple(point) for point in self.points.tolist()],
+                                         [(0, 0), (100, 0), (100, 100), (0, 100)], engine="delaunay")
+        self.interpolator = NaturalNeighborInterpolator(diagram, self.points @ [2.0, -3.0] + 1)
+        self.queries = rng.uniform(25, 75, (500, 2))
+
+    def test_reproduces_linear_functions(self):
+        # Away from the bounding polygon Sibson weights have linear precision
+        np.testing.assert_allclose(self.interpolator(self.queries, chunk_size=64), self.queries @ [2.0, -3.0] + 1)
+        np.testing.assert_allclose(self.interpolator(self.points[:20]), self.points[:20] @ [2.0, -3.0] + 1)
+
+    def test_weights_match_all_candidates(self):
+        neighbors, weights = self.interpolator.weights(self.queries[:10])
+        everything = np.tile(np.arange(len(self.points)), (10, 1))
+        stolen, _, _ = self.interpolator._stolen(self.queries[:10], everything)
+        dense = np.zeros((10, len(self.points)))
+        np.add.at(dense, (np.repeat(np.arange(10), neighbors.shape[1]), neighbors.ravel()), weights.ravel())
+        np.testing.assert_allclose(dense, stolen / stolen.sum(axis=1, keepdims=True), atol=1e-12)
+
+    def test_threads_and_outside(self):
+        queries = np.concatenate([self.queries, [(-5, 50)]])
+        serial = self.interpolator(queries, chunk_size=100)
+        threaded = self.interpolator(queries, chunk_size=100, workers=3)
+        np.testing.assert_array_equal(serial, threaded)
+        self.assertTrue(np.isnan(serial[-1]))
+
+class TestService(unittest.TestCase):
+    def exchange(self, requests, queue_size=4):
+        async def run():
+            service = await DiagramService(processes=1, queue_size=queue_size).start()
+            try:
+                reader, writer = await asyncio.open_connection(service.host, service.port, limit=LINE_LIMIT)
+                # Pipelined on one connection; answers come back as they finish
+                writer.write(b''.join(json.dumps(request).encode() + b'\n' for request in requests))
+                await writer.drain()
+                responses = [json.loads(await reader.readline()) for _ in requests]
+                writer.close()
+                await writer.wait_closed()
+                return {response['id']: response for response in responses}, dict(service.stats)
+            finally:
+                await service.close()
+        return asyncio.run(run())
+
+    def test_responses_match_batch_arrays(self):
+        points = [[10, 20], [80, 30], [40, 70], [60, 60]]
+        box = [[0, 0], [100, 0], [100, 100], [0, 100]]
+        many = np.random.default_rng(3).uniform(0, 100, (1000, 2)).tolist()
+        responses, stats = self.exchange([{'id': 1, 'points': points, 'bounding_polygon': box, 'areas': True},
+                                          {'id': 2, 'points': 'nonsense'}, {'id': 3},
+                                          {'id': 4, 'points': many, 'time_budget': 0}])
+        self.assertEqual({key: value for key, value in responses[1].items() if key != 'id'},
+                         _build(points, box, 'fortune', True))
+        self.assertIn('error', responses[2])
+        self.assertIn('error', responses[3])
+        self.assertIn('TimeoutError', responses[4]['error'])
+        self.assertEqual(stats['errors'], 3)
+
+    def test_duplicate_requests_are_coalesced(self):
+        points = np.random.default_rng(9).uniform(0, 100, (400, 2)).tolist()
+        requests = [{'id': k, 'points': points} for k in range(6)] + [{'id': 6, 'points': points[:100]}]
+        responses, stats = self.exchange(requests, queue_size=2)
+        self.assertEqual(len(responses), 7)
+        for k in range(1, 6):
+            self.assertEqual(responses[k]['sites'], responses[0]['sites'])
+        self.assertEqual(len(responses[6]['sites']), 100)
+        self.assertEqual(stats['computed'] + stats['coalesced'], 7)
+        self.assertGreater(stats['coalesced'], 0)
+
+class TestJobs(unittest.TestCase):
+    def test_pipeline_writes_outputs_and_statistics(self):
+        rng = np.random.default_rng(4)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for index in range(3):
+                paths.append(os.path.join(directory, f'input{index}.json'))
+                with open(paths[-1], 'w') as f:
+                    json.dump({'points': rng.uniform(0, 100, (50 + index, 2)).tolist()}, f)
+            paths.append(os.path.join(directory, 'broken.json'))
+            with open(paths[-1], 'w') as f:
+                f.write('{')
+            log = io.StringIO()
+            summary = run_jobs(paths, os.path.join(directory, 'out'), render='geojson', processes=1,
+                               readers=2, writers=2, queue_size=1, log=log)
+            records = [json.loads(line) for line in log.getvalue().splitlines()]
+            records = {os.path.basename(record['file']): record for record in records}
+            self.assertEqual((summary['files'], summary['failed']), (4, 1))
+            self.assertIn('JSONDecodeError', records['broken.json']['error'])
+            for index in range(3):
+                record = records[f'input{index}.json']
+                self.assertEqual(record['points'], 50 + index)
+                self.assertEqual(set(record['timings']), {'load', 'construct', 'statistics', 'render', 'write'})
+                with open(record['output']) as f:
+                    self.assertEqual(json.loads(f.readline())['type'], 'Feature')
+
 class TestUtilities(unittest.TestCase):
+    def test_core_modules_do_not_import_matplotlib(self):
+        code = ("import sys, geometry, polygon, events, beachline, tree, voronoi, batch, utils\n"
+                "sys.exit('matplotlib' in sys.modules)")
+        directory = os.path.dirname(os.path.abspath(__file__))
+        self.assertEqual(subprocess.run([sys.executable, "-c", code], cwd=directory).returncode, 0)
+
+    def test_package_import_leaves_out_services_and_pools(self):
+        code = ("import sys, importlib\n"
+                "importlib.import_module('__init__')\n"
+                "heavy = ('asyncio', 'multiprocessing.shared_memory', 'concurrent.futures.process', 'matplotlib')\n"
+                "sys.exit(any(name in sys.modules for name in heavy))")
+        directory = os.path.dirname(os.path.abspath(__file__))
+        self.assertEqual(subprocess.run([sys.executable, "-c", code], cwd=directory).returncode, 0)
+
     def test_random_points(self):
         n = 10
         points = generate_random_points(n)
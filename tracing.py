@@ -0,0 +1,160 @@
+import sys
+import json
+import time
+import argparse
+from collections import defaultdict
+
+import numpy as np
+
+from geometry import Point
+from events import SiteEvent
+from precision import Precision
+from voronoi import Voronoi
+
+SITE, CIRCLE, STALE, START = 0, 1, 2, 3
+
+# One record per event popped by the sweep, with the beach line it was popped against.
+# `arc` is the name of the site whose arc a circle event removes, -1 for site events.
+TRACE_DTYPE = np.dtype([('kind', 'u1'), ('x', '<f8'), ('y', '<f8'), ('arc', '<i4'),
+                        ('arcs', '<u4'), ('depth', '<u2'), ('queue', '<u4')], align=False)
+
+class TraceRecorder:
+    """
+    Opt-in log of every event the sweep pops, stale circle events included.
+
+    Pass one to Voronoi.create_diagram (or create_voronoi_diagram) as
+    `recorder`, then `save` it. Each record holds the event and the beach line
+    size, tree depth and event queue size at the moment it was popped; sites
+    laid out in bulk by the degenerate fast path are recorded as START records.
+    """
+
+    def __init__(self):
+        self.settings = None
+        self._records = []
+
+    def __len__(self):
+        return len(self._records)
+
+    def begin(self, voronoi, started=()):
+        precision = voronoi.precision
+        self.settings = {'degenerate': voronoi.degenerate, 'scale': precision.scale,
+                         'relative': precision.relative, 'exact': precision.exact, 'grid': precision.grid}
+        self._records = [(START, point.x, point.y, -1, 0, 0, 0) for point in started]
+
+    def record(self, voronoi, event):
+        if event.circle_event:
+            kind = CIRCLE if event.is_valid else STALE
+            arc = event.point_triple[1].name
+        else:
+            kind, arc = SITE, -1
+        depth = voronoi.status_tree.height if voronoi.status_tree is not None else 0
+        self._records.append((kind, event.x, event.y, arc, len(voronoi._arcs), depth,
+                              voronoi.event_queue.qsize()))
+
+    def to_array(self):
+        return np.array(self._records, dtype=TRACE_DTYPE)
+
+    def save(self, path):
+        np.savez(path, events=self.to_array(), settings=np.array(json.dumps(self.settings)))
+
+def load_trace(path):
+    """Read a trace written by TraceRecorder.save, returning (events, settings)"""
+    with np.load(path) as data:
+        return data['events'], json.loads(str(data['settings']))
+
+class _PendingEvents:
+    """Stands in for the event queue during a replay, holding circle events by the key they are traced under"""
+
+    def __init__(self):
+        self.events = defaultdict(list)
+
+    def put(self, event):
+        self.events[(event.x, event.y, event.point_triple[1].name)].append(event)
+
+    def take(self, key, valid):
+        candidates = self.events.get(key, [])
+        for index, event in enumerate(candidates):
+            if event.is_valid == valid:
+                return candidates.pop(index)
+        return None
+
+    def qsize(self):
+        return sum(len(events) for events in self.events.values())
+
+def replay(events, settings):
+    """
+    Re-run the beach line operations of a trace, without the input or the event queue.
+
+    Site records are fed to handle_site_event and circle records to
+    handle_circle_event in the traced order, so the tree and event code run
+    exactly as they did in the original sweep. The circle events themselves
+    come from the replayed handlers and are matched to the trace by centre,
+    y and arc. Bounding polygon clipping is not part of the replay.
+
+    Args:
+        events: Structured array of TRACE_DTYPE records
+        settings: The settings dict saved with the trace
+
+    Returns:
+        A dict with the replay time in seconds, the number of events, and the
+        number of steps whose beach line size or tree depth differ from the trace
+    """
+    precision = Precision(scale=settings['scale'], relative=settings['relative'], exact=settings['exact'],
+                          grid=settings['grid'])
+    voronoi = Voronoi(precision=precision, degenerate=settings['degenerate'])
+    rows = events.tolist()
+    started = 0
+    while started < len(rows) and rows[started][0] == START:
+        started += 1
+    start = time.perf_counter()
+    if started:
+        for _, x, y, *_ in rows[:started]:
+            voronoi.event_queue.put(SiteEvent(Point(x, y)))
+        voronoi._start_beach_line()
+    queue, voronoi.event_queue = voronoi.event_queue, _PendingEvents()
+    for event in queue.queue:
+        voronoi.event_queue.put(event)
+    name = started
+    arcs_differ = depth_differs = 0
+    for step, (kind, x, y, arc, arcs, depth, _) in enumerate(rows[started:], started):
+        arcs_differ += len(voronoi._arcs) != arcs
+        tree_depth = voronoi.status_tree.height if voronoi.status_tree is not None else 0
+        depth_differs += tree_depth != depth
+        if kind == SITE:
+            voronoi.sweep_line = y
+            voronoi.handle_site_event(SiteEvent(Point(x, y, name=name)))
+            name += 1
+            continue
+        event = voronoi.event_queue.take((x, y, arc), kind == CIRCLE)
+        if event is None:
+            raise ValueError(f"Replay diverged from the trace at event {step}")
+        if kind == CIRCLE:
+            voronoi.sweep_line = event.y
+            voronoi.handle_circle_event(event)
+        else:
+            voronoi._free_events.append(event)
+    return {'time': time.perf_counter() - start, 'events': len(rows), 'arcs_differ': arcs_differ,
+            'depth_differs': depth_differs}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Replay a recorded sweep trace')
+    parser.add_argument('trace', help='Trace file written by TraceRecorder.save (main.py --trace)')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of replays; the best time is reported')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    events, settings = load_trace(args.trace)
+    kinds = np.bincount(events['kind'], minlength=4)
+    print(f"{len(events)} events: {kinds[SITE] + kinds[START]} sites, {kinds[CIRCLE]} circle events, "
+          f"{kinds[STALE]} stale; beach line up to {events['arcs'].max(initial=0)} arcs, "
+          f"tree depth up to {events['depth'].max(initial=0)}, queue up to {events['queue'].max(initial=0)}")
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    results = [replay(events, settings) for _ in range(args.repeat)]
+    best = min(results, key=lambda result: result['time'])
+    print(f"replay {best['time']:.3f}s ({best['time'] / max(len(events), 1) * 1e6:.1f} us per event); "
+          f"beach line size differs at {best['arcs_differ']} events, tree depth at {best['depth_differs']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -120,8 +120,16 @@ class Node:
         return current.parent.left.maximum()
 
     def replace_leaf(self, replacement, root):
+        # Leaves form a doubly linked list in beach line order; splice the
+        # replacement's leaves in where this subtree's leaves used to be.
+        before = self.minimum().predecessor
+        after = self.maximum().successor
         if replacement is not None:
+            LeafNode.link(before, replacement.minimum())
+            LeafNode.link(replacement.maximum(), after)
             replacement.parent = self.parent
+        else:
+            LeafNode.link(before, after)
         if self.is_left_child():
             self.parent.left = replacement
         elif self.is_right_child():
@@ -137,10 +145,27 @@ class Node:
 class LeafNode(Node):
     def __init__(self, data: Arc):
         super().__init__(data)
+        self._predecessor = None
+        self._successor = None
 
     def __repr__(self):
         return f"Leaf({self.data}, left={self.left}, right={self.right})"
 
+    @property
+    def predecessor(self):
+        return self._predecessor
+
+    @property
+    def successor(self):
+        return self._successor
+
+    @staticmethod
+    def link(left, right):
+        if left is not None:
+            left._successor = right
+        if right is not None:
+            right._predecessor = left
+
     def get_key(self, sweep_line=None):
         return self.data.origin.x
 
@@ -158,7 +183,7 @@ class InternalNode(Node):
         return f"Internal({self.data}, left={self.left}, right={self.right})"
 
     def get_key(self, sweep_line=None):
-        return self.data.get_intersection(sweep_line).x
+        return self.data.intersection_x(sweep_line)
 
     def get_value(self, **kwargs):
         return self.data
@@ -167,17 +192,25 @@ class InternalNode(Node):
         return f"{self.data.breakpoint[0].name},{self.data.breakpoint[1].name}"
 
 class Tree:
+    @staticmethod
+    def iter_leaves(root: Node):
+        node = root.minimum() if root is not None else None
+        while node is not None:
+            yield node
+            node = node.successor
+
     @staticmethod
     def find_leaf_node(root: Node, key, **kwargs):
         node = root
         while node is not None:
             if node.is_leaf():
                 return node
-            elif key == node.get_key(**kwargs) and not node.is_leaf():
+            node_key = node.get_key(**kwargs)
+            if key == node_key:
                 if node.left is not None:
                     return node.left.maximum()
                 return node.right.minimum()
-            elif key < node.get_key(**kwargs):
+            elif key < node_key:
                 node = node.left
             else:
                 node = node.right
@@ -210,6 +243,16 @@ class Tree:
             return node
         return Tree.balance_and_propagate(node.parent)
 
+    @staticmethod
+    def update_and_balance(node):
+        # Single walk to the root: refresh each height, then rebalance it.
+        while True:
+            node.update_height()
+            node = Tree.balance(node)
+            if node.parent is None:
+                return node
+            node = node.parent
+
     @staticmethod
     def balance(node):
         if node.balance > 1 and node.left.balance >= 0:
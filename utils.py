@@ -1,5 +1,4 @@
 import random
-import matplotlib.pyplot as plt
 import numpy as np
 
 def visualize_voronoi(voronoi, output_file=None, show_labels=False, title=None, dpi=300):
@@ -16,6 +15,9 @@ def visualize_voronoi(voronoi, output_file=None, show_labels=False, title=None,
     Returns:
         The file path if saved, otherwise None
     """
+    # Imported here so that building diagrams never loads the plotting stack
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(10, 10))
     
     min_x = voronoi.bounding_poly.min_x
@@ -69,13 +71,46 @@ def visualize_voronoi(voronoi, output_file=None, show_labels=False, title=None,
         plt.show()
         return None
 
-def create_voronoi_diagram(points, bounding_polygon=None):
+def create_voronoi_diagram(points, bounding_polygon=None, site_index=None, precision=None, engine="fortune",
+                           disable_gc=False, degenerate=False, deduplicate=None, progress=None, every=1000,
+                           time_budget=None, cancel=None, recorder=None, reorder=False):
     """
     Create a Voronoi diagram from a set of points.
     
     Args:
         points: List of (x, y) coordinates
-        bounding_polygon: Optional list of (x, y) coordinates defining the bounding polygon
+        bounding_polygon: Optional list of (x, y) coordinates defining the bounding polygon,
+            or an existing Polygon to reuse without re-sorting its corners
+        site_index: Optional culling.SiteIndex built over `points`; when given, only the
+            sites whose cells can reach the bounding polygon are swept,
+            `site_indices` on the result maps each site back to its index in `points`
+            and `site_map` maps each index in `points` to its site's position (-1 if culled)
+        precision: Optional precision.Precision; Precision(exact=True, grid=...) snaps the
+            sites to a grid and evaluates the circle predicates with integer arithmetic
+        engine: "fortune" for the sweep line, or "delaunay" to build the dual of a
+            randomized incremental Delaunay triangulation
+        disable_gc: Pause Python's cyclic garbage collector while the diagram is built,
+            which saves its repeated passes over the growing diagram on large inputs
+        degenerate: Fast path for inputs with many co-horizontal or cocircular sites, such as
+            grids: cocircular circle events are merged into one vertex during the sweep
+            instead of leaving zero-length edges to clean up
+        deduplicate: Optional tolerance; sites snapping to the same grid cell of this size
+            (or exactly equal ones, for 0) are swept once. `site_indices` on the result then
+            maps each site to its index in `points`, and `site_map` maps each index in
+            `points` to the position of its surviving site in `sites` (-1 if culled)
+        progress: Optional callback progress(sweep_line, processed, remaining) called every
+            `every` events of the sweep, with the number of events processed and still queued; the
+            delaunay engine counts point insertions and then cells built instead, with sweep_line inf
+        every: Number of sweep events (or delaunay steps) between progress calls and budget or
+            cancellation checks
+        time_budget: Optional wall-clock limit in seconds; the sweep raises TimeoutError past it
+        cancel: Optional token such as a threading.Event; the sweep raises voronoi.SweepCancelled
+            once it is set
+        recorder: Optional tracing.TraceRecorder logging every event the sweep pops; the delaunay
+            engine has no events and raises ValueError
+        reorder: Renumber the sites, vertices and edges of the result along a Hilbert curve, so
+            that nearby cells are stored close together; `site_indices` and `site_map` then map
+            between sites and `points` (see ordering.reorder_diagram)
         
     Returns:
         A Voronoi diagram object
@@ -85,23 +120,53 @@ def create_voronoi_diagram(points, bounding_polygon=None):
     
     if bounding_polygon is None:
         # Create default bounding box
-        min_x = min(p[0] for p in points) - 2
-        max_x = max(p[0] for p in points) + 2
-        min_y = min(p[1] for p in points) - 2
-        max_y = max(p[1] for p in points) + 2
-        bounding_polygon = [(min_x, min_y), (max_x, min_y), (max_x, max_y), (min_x, max_y)]
+        bounding_polygon = default_bounding_box(min(p[0] for p in points), min(p[1] for p in points),
+                                                max(p[0] for p in points), max(p[1] for p in points))
     
     # Create a polygon for bounding
-    polygon = Polygon(bounding_polygon)
+    if isinstance(bounding_polygon, Polygon):
+        polygon = bounding_polygon.copy()
+    else:
+        polygon = Polygon(bounding_polygon)
     
     # Initialize the algorithm
-    v = Voronoi(polygon)
+    v = Voronoi(polygon, precision=precision, engine=engine, disable_gc=disable_gc, degenerate=degenerate)
+    
+    # Drop the sites that cannot influence anything inside the polygon
+    if site_index is not None:
+        v.site_indices = site_index.cull(polygon)
+        v.site_map = np.full(len(site_index.points), -1, dtype=np.int64)
+        v.site_map[v.site_indices] = np.arange(len(v.site_indices))
+        points = [points[i] for i in v.site_indices]
+    
+    # Sweep each group of coincident sites once
+    if deduplicate is not None:
+        from culling import deduplicate_sites
+        
+        survivors, site_map = deduplicate_sites(points, deduplicate)
+        if v.site_indices is None:
+            v.site_indices, v.site_map = survivors, site_map
+        else:
+            v.site_map[v.site_indices] = site_map
+            v.site_indices = v.site_indices[survivors]
+        points = [points[i] for i in survivors]
     
     # Create the diagram
-    v.create_diagram(points=points)
+    v.create_diagram(points=points, progress=progress, every=every, time_budget=time_budget, cancel=cancel,
+                     recorder=recorder)
+    
+    # Store nearby cells close together
+    if reorder:
+        from ordering import reorder_diagram
+        
+        reorder_diagram(v)
     
     return v
 
+def default_bounding_box(min_x, min_y, max_x, max_y):
+    """Corners of the default bounding polygon: the box around the points grown by 2 on every side"""
+    return [(min_x - 2, min_y - 2), (max_x + 2, min_y - 2), (max_x + 2, max_y + 2), (min_x - 2, max_y + 2)]
+
 def generate_random_points(n, min_x=0, max_x=100, min_y=0, max_y=100):
     """Generate n random points within the specified bounds"""
     return [(random.uniform(min_x, max_x), random.uniform(min_y, max_y)) for _ in range(n)]
@@ -1,3 +1,5 @@
+import gc
+import time
 from queue import PriorityQueue
 from typing import List, Set, Tuple
 
@@ -8,9 +10,19 @@ from events import SiteEvent, CircleEvent
 from beachline import Arc, Breakpoint
 from tree import Tree, LeafNode, InternalNode, Node
 from polygon import Polygon
+from precision import Precision
+import delaunay
+
+ENGINES = ("fortune", "delaunay")
+
+class SweepCancelled(Exception):
+    """Raised inside create_diagram once its cancellation token is set"""
 
 class Voronoi:
-    def __init__(self, bounding_poly: Polygon = None, remove_zero_length_edges=True):
+    def __init__(self, bounding_poly: Polygon = None, remove_zero_length_edges=True, precision: Precision = None,
+                 engine="fortune", disable_gc=False, degenerate=False):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {', '.join(ENGINES)}")
         self.bounding_poly = bounding_poly
         self.event_queue = PriorityQueue()
         self.event = None
@@ -19,9 +31,27 @@ class Voronoi:
         self.sweep_line = float("inf")
         self._arcs = set()
         self.sites = None
+        self.site_indices = None
+        # For each input point, the position in `sites` of the site that stands in for it
+        self.site_map = None
+        # The wrapped box of a periodic diagram, see periodic.py
+        self.periodic_domain = None
         self.edges = list()
         self._vertices = set()
         self.remove_zero_length_edges = remove_zero_length_edges
+        self.precision = precision
+        self.engine = engine
+        # Pausing the cyclic GC spares it from repeatedly traversing the growing DCEL
+        self.disable_gc = disable_gc
+        # Fast path for inputs with many co-horizontal or cocircular sites, such as grids:
+        # the first row of sites is laid out in bulk, and circle events meeting at the
+        # vertex just created are merged into it instead of leaving zero-length edges
+        self.degenerate = degenerate
+        # Discarded sweep objects kept for reuse: invalidated circle events,
+        # and leaves (with their arcs) and internal nodes dropped from the beach line
+        self._free_events = []
+        self._free_leaves = []
+        self._free_internals = []
 
     @property
     def arcs(self) -> List[Arc]:
@@ -38,13 +68,61 @@ class Voronoi:
             self.event_queue.put(site_event)
         return self.event_queue
 
-    def create_diagram(self, points: list):
-        points = [Point(x, y) for x, y in points]
+    def create_diagram(self, points: list, progress=None, every=1000, time_budget=None, cancel=None, recorder=None):
+        # Every `every` events the sweep calls progress(sweep_line, processed, remaining),
+        # raises TimeoutError once `time_budget` seconds have passed and raises
+        # SweepCancelled once cancel.is_set() (any threading.Event-like token) is true.
+        # A tracing.TraceRecorder passed as `recorder` logs every event popped.
+        # The delaunay engine has no events: it counts point insertions and then
+        # cells built instead, and the sweep line it reports stays at inf.
+        if recorder is not None and self.engine == "delaunay":
+            raise ValueError("The delaunay engine has no sweep events to record")
+        monitor = None
+        if progress is not None or time_budget is not None or cancel is not None:
+            deadline = None if time_budget is None else time.perf_counter() + time_budget
+            monitor = (progress, deadline, cancel)
+        collecting = self.disable_gc and gc.isenabled()
+        if collecting:
+            gc.disable()
+        try:
+            self._create_diagram(points, monitor, every, recorder)
+        finally:
+            if collecting:
+                gc.enable()
+            self._free_events, self._free_leaves, self._free_internals = [], [], []
+
+    def _create_diagram(self, points: list, monitor=None, every=1000, recorder=None):
+        self.precision = self._resolve_precision(points)
+        snap = self.precision.snap
+        if self.engine == "delaunay":
+            checkpoint = None
+            if monitor is not None:
+                def checkpoint(done, remaining):
+                    self._checkpoint(monitor, done, remaining)
+            delaunay.build_diagram(self, [(snap(x), snap(y)) for x, y in points], checkpoint, every)
+            if self.remove_zero_length_edges:
+                self.clean_up_zero_length_edges()
+            return
+        points = [Point(snap(x), snap(y)) for x, y in points]
         self.initialize(points)
         index = 0
         genesis_point = None
+        if self.degenerate and not self.event_queue.empty():
+            index = self._start_beach_line()
+        if recorder is not None:
+            recorder.begin(self, sorted((site for site in self.sites if site.name is not None),
+                                        key=lambda site: site.name))
+        # Counting popped events is the only cost of the checkpoints when they are unused
+        processed = index
+        checkpoint = processed + every if monitor is not None else float("inf")
         while not self.event_queue.empty():
+            if processed >= checkpoint:
+                checkpoint += every
+                self._checkpoint(monitor, processed, self.event_queue.qsize())
             event = self.event_queue.get()
+            processed += 1
+            if recorder is not None:
+                recorder.record(self, event)
             genesis_point = genesis_point or getattr(event, 'point', None)
             if isinstance(event, CircleEvent) and event.is_valid:
                 self.sweep_line = event.y
@@ -55,6 +133,8 @@ class Voronoi:
                 self.sweep_line = event.y
                 self.handle_site_event(event)
             else:
+                # Invalidated circle events are referenced by nothing else once popped
+                self._free_events.append(event)
                 continue
             self.event = event
         self.edges = self.bounding_poly.finish_edges(
@@ -64,29 +144,45 @@ class Voronoi:
         if self.remove_zero_length_edges:
             self.clean_up_zero_length_edges()
 
+    def _checkpoint(self, monitor, processed, remaining):
+        progress, deadline, cancel = monitor
+        if cancel is not None and cancel.is_set():
+            raise SweepCancelled(f"Sweep cancelled after {processed} events")
+        if deadline is not None and time.perf_counter() > deadline:
+            raise TimeoutError(f"Sweep ran out of time after {processed} events")
+        if progress is not None:
+            progress(float(self.sweep_line), processed, remaining)
+
+    def _resolve_precision(self, points):
+        precision = self.precision or Precision()
+        if precision.scale is not None:
+            return precision
+        polygon = self.bounding_poly
+        min_x, min_y, max_x, max_y = polygon.min_x, polygon.min_y, polygon.max_x, polygon.max_y
+        if len(points) > 0:
+            min_x = min(min_x, min(x for x, _ in points))
+            min_y = min(min_y, min(y for _, y in points))
+            max_x = max(max_x, max(x for x, _ in points))
+            max_y = max(max_y, max(y for _, y in points))
+        return precision.with_scale(Precision.extent(min_x, min_y, max_x, max_y))
+
     def handle_site_event(self, event: SiteEvent):
         point_i = event.point
-        new_arc = Arc(origin=point_i)
+        new_node = self._new_leaf(point_i)
+        new_arc = new_node.data
         self._arcs.add(new_arc)
         if self.status_tree is None:
-            self.status_tree = LeafNode(new_arc)
+            self.status_tree = new_node
             return
         arc_node_above_point = Tree.find_leaf_node(self.status_tree, key=point_i.x, sweep_line=self.sweep_line)
         arc_above_point = arc_node_above_point.get_value()
         if arc_above_point.circle_event is not None:
             arc_above_point.circle_event.remove()
+            arc_above_point.circle_event = None
         point_j = arc_above_point.origin
-        breakpoint_left = Breakpoint(breakpoint=(point_j, point_i))
-        breakpoint_right = Breakpoint(breakpoint=(point_i, point_j))
-        root = InternalNode(breakpoint_left)
-        root.left = LeafNode(Arc(origin=point_j, circle_event=None))
-        if breakpoint_right.does_intersect():
-            root.right = InternalNode(breakpoint_right)
-            root.right.left = LeafNode(new_arc)
-            root.right.right = LeafNode(Arc(origin=point_j, circle_event=None))
-        else:
-            root.right = LeafNode(new_arc)
-        self.status_tree = arc_node_above_point.replace_leaf(replacement=root, root=self.status_tree)
+        breakpoint_left = Breakpoint(breakpoint=(point_j, point_i), precision=self.precision)
+        breakpoint_right = Breakpoint(breakpoint=(point_i, point_j), precision=self.precision)
+        new_node, right_node = self._split_arc(arc_node_above_point, new_node, breakpoint_left, breakpoint_right)
         A, B = point_j, point_i
         AB = breakpoint_left
         BA = breakpoint_right
@@ -95,33 +191,139 @@ class Voronoi:
         self.edges.append(AB.edge)
         B.first_edge = B.first_edge or AB.edge
         A.first_edge = A.first_edge or BA.edge
-        if not breakpoint_right.does_intersect():
+        if right_node is None:
             return
-        node_a, node_b, node_c = root.left.predecessor, root.left, root.right.left
-        node_c, node_d, node_e = node_c, root.right.right, root.right.right.successor
+        node_a, node_b, node_c = arc_node_above_point.predecessor, arc_node_above_point, new_node
+        node_c, node_d, node_e = node_c, right_node, right_node.successor
         self._check_circles((node_a, node_b, node_c), (node_c, node_d, node_e))
-        self.status_tree = Tree.balance_and_propagate(root)
 
-    def handle_circle_event(self, event: CircleEvent):
+    def _start_beach_line(self):
+        # Sites on the first sweep line have vertical parabolas: the beach line is
+        # simply those sites in x order, with a breakpoint between neighbours
+        run = [self.event_queue.get()]
+        heap = self.event_queue.queue
+        while heap and heap[0].y == run[0].y:
+            run.append(self.event_queue.get())
+        points = [event.point for event in run]
+        for index, event in enumerate(run):
+            event.point.name = index
+        self.sweep_line = run[0].y
+        self.event = run[-1]
+        if any(a.x == b.x for a, b in zip(points, points[1:])):
+            # Coincident sites take the general path
+            for event in run:
+                self.handle_site_event(event)
+            return len(run)
+        leaves = []
+        for point in points:
+            leaf = self._new_leaf(point)
+            self._arcs.add(leaf.data)
+            leaves.append(leaf)
+        breakpoints = []
+        for A, B in zip(points, points[1:]):
+            # The same breakpoints and edges the site events would create one by one
+            AB = Breakpoint(breakpoint=(A, B), precision=self.precision)
+            BA = Breakpoint(breakpoint=(B, A), precision=self.precision)
+            AB.edge = HalfEdge(B, origin=AB)
+            BA.edge = HalfEdge(A, origin=BA, twin=AB.edge)
+            self.edges.append(AB.edge)
+            B.first_edge = B.first_edge or AB.edge
+            A.first_edge = A.first_edge or BA.edge
+            breakpoints.append(AB)
+        for left, right in zip(leaves, leaves[1:]):
+            LeafNode.link(left, right)
+
+        def build(start, stop):
+            if stop - start == 1:
+                return leaves[start]
+            middle = (start + stop) // 2
+            node = self._new_internal(breakpoints[middle - 1])
+            node.left = build(start, middle)
+            node.right = build(middle, stop)
+            node.update_height()
+            return node
+
+        self.status_tree = build(0, len(leaves))
+        return len(run)
+
+    def _new_leaf(self, origin):
+        if self._free_leaves:
+            node = self._free_leaves.pop()
+            node.data.__init__(origin)
+            node.__init__(node.data)
+            return node
+        return LeafNode(Arc(origin=origin))
+
+    def _new_internal(self, breakpoint):
+        if self._free_internals:
+            node = self._free_internals.pop()
+            node.__init__(breakpoint)
+            return node
+        return InternalNode(breakpoint)
+
+    def _split_arc(self, arc_node: LeafNode, new_node: LeafNode, breakpoint_left: Breakpoint,
+                   breakpoint_right: Breakpoint):
+        # The existing leaf keeps the left piece and moves under the new breakpoint;
+        # only the new arc and the right piece get fresh leaves.
+        parent = arc_node.parent
+        was_left_child = arc_node.is_left_child()
+        successor = arc_node.successor
+        root = self._new_internal(breakpoint_left)
+        if was_left_child:
+            parent.left = root
+        elif parent is not None:
+            parent.right = root
+        root.left = arc_node
+        right_node = None
+        if breakpoint_right.does_intersect():
+            right_node = self._new_leaf(arc_node.data.origin)
+            self._arcs.add(right_node.data)
+            root.right = self._new_internal(breakpoint_right)
+            root.right.left = new_node
+            root.right.right = right_node
+            LeafNode.link(arc_node, new_node)
+            LeafNode.link(new_node, right_node)
+            LeafNode.link(right_node, successor)
+        else:
+            root.right = new_node
+            LeafNode.link(arc_node, new_node)
+            LeafNode.link(new_node, successor)
+        self.status_tree = Tree.update_and_balance(root)
+        return new_node, right_node
+
+    def handle_circle_event(self, event: CircleEvent, vertex: Vertex = None):
         arc = event.arc_pointer.data
         if arc in self._arcs:
             self._arcs.remove(arc)
         arc_node: LeafNode = event.arc_pointer
+        parent = arc_node.parent
         predecessor = arc_node.predecessor
         successor = arc_node.successor
         self.status_tree, updated, removed, left, right = self._update_breakpoints(
-            self.status_tree, self.sweep_line, arc_node, predecessor, successor)
+            self.status_tree, self.sweep_line, arc_node, predecessor, successor, self.precision)
         if updated is None:
             return
-        def remove(neighbor_event):
-            if neighbor_event is None:
+        # Both nodes are out of the beach line; only invalid events still point at them
+        self._free_leaves.append(arc_node)
+        self._free_internals.append(parent)
+        def remove(neighbor_arc):
+            if neighbor_arc.circle_event is None:
                 return None
+            # Forget the invalidated event so it can be recycled once popped
+            neighbor_event, neighbor_arc.circle_event = neighbor_arc.circle_event, None
             return neighbor_event.remove()
-        remove(predecessor.get_value().circle_event)
-        remove(successor.get_value().circle_event)
+        remove(predecessor.get_value())
+        remove(successor.get_value())
         convergence_point = event.center
-        v = Vertex(convergence_point.x, convergence_point.y)
-        self._vertices.add(v)
+        if vertex is None:
+            v = Vertex(convergence_point.x, convergence_point.y)
+            self._vertices.add(v)
+        else:
+            # Keep the latest centre, as clean_up_zero_length_edges keeps the later vertex
+            v = vertex
+            v.x, v.y = convergence_point.x, convergence_point.y
+        # With a merged event, one of the edges ending here started at v as well
+        collapsed = [edge for edge in (updated.edge, removed.edge) if vertex is not None and edge.twin.origin is v]
         updated.edge.origin = v
         removed.edge.origin = v
         v.connected_edges.append(updated.edge)
@@ -135,34 +337,69 @@ class Voronoi:
         self.edges.append(new_edge)
         v.connected_edges.append(new_edge)
         updated.edge = new_edge.twin
+        for edge in collapsed:
+            self._collapse(edge)
         former_left = predecessor
         former_right = successor
         node_a, node_b, node_c = former_left.predecessor, former_left, former_left.successor
         node_d, node_e, node_f = former_right.predecessor, former_right, former_right.successor
-        self._check_circles((node_a, node_b, node_c), (node_d, node_e, node_f))
+        self._check_circles((node_a, node_b, node_c), (node_d, node_e, node_f), v if self.degenerate else None)
+
+    def _collapse(self, edge):
+        # Drop a zero-length edge as clean_up_zero_length_edges would, its ends being one vertex
+        edge.delete()
+        edge.twin.delete()
+        for index in range(len(self.edges) - 1, -1, -1):
+            if self.edges[index] is edge or self.edges[index] is edge.twin:
+                del self.edges[index]
+                break
+
+    def _coincides(self, point, vertex):
+        # Both are circle centres, which exact mode computes exactly
+        tolerance = 0 if self.precision.exact else self.precision.tolerance()
+        return abs(point.x - vertex.x) <= tolerance and abs(point.y - vertex.y) <= tolerance
 
-    def _check_circles(self, triple_left, triple_right):
+    def _check_circles(self, triple_left, triple_right, vertex=None):
         node_a, node_b, node_c = triple_left
         node_d, node_e, node_f = triple_right
-        left_event = CircleEvent.create_circle_event(node_a, node_b, node_c, sweep_line=self.sweep_line)
-        right_event = CircleEvent.create_circle_event(node_d, node_e, node_f, sweep_line=self.sweep_line)
+        left_event = CircleEvent.create_circle_event(node_a, node_b, node_c, sweep_line=self.sweep_line,
+                                                     precision=self.precision, free_list=self._free_events)
+        right_event = CircleEvent.create_circle_event(node_d, node_e, node_f, sweep_line=self.sweep_line,
+                                                      precision=self.precision, free_list=self._free_events)
         if left_event:
             if not self._check_clockwise(node_a.data.origin, node_b.data.origin, node_c.data.origin,
                                      left_event.center):
+                self._free_events.append(left_event)
                 left_event = None
         if right_event:
             if not self._check_clockwise(node_d.data.origin, node_e.data.origin, node_f.data.origin,
                                       right_event.center):
+                self._free_events.append(right_event)
                 right_event = None
+        if vertex is not None:
+            # A circle event at the vertex just created is cocircular with it: handle it now,
+            # into the same vertex. Its arc's removal would invalidate the other event anyway.
+            for event, other in ((left_event, right_event), (right_event, left_event)):
+                if event is not None and self._coincides(event.center, vertex):
+                    if other is not None:
+                        self._free_events.append(other)
+                    self.handle_circle_event(event, vertex)
+                    self._free_events.append(event)
+                    return None, None
         if left_event is not None:
             self.event_queue.put(left_event)
             node_b.data.circle_event = left_event
         if right_event is not None and left_event != right_event:
             self.event_queue.put(right_event)
             node_e.data.circle_event = right_event
+        elif right_event is not None:
+            self._free_events.append(right_event)
+            right_event = None
         return left_event, right_event
 
     def _check_clockwise(self, a, b, c, center):
+        if self.precision.exact:
+            return self.precision.orientation(a, b, c) < 0
         angle_1 = self._calculate_angle(a, center)
         angle_2 = self._calculate_angle(b, center)
         angle_3 = self._calculate_angle(c, center)
@@ -177,13 +414,15 @@ class Voronoi:
         return np.degrees(np.arctan2(dy, dx)) % 360
 
     @staticmethod
-    def _update_breakpoints(root, sweep_line, arc_node, predecessor, successor):
+    def _update_breakpoints(root, sweep_line, arc_node, predecessor, successor, precision):
         if arc_node.is_left_child():
-            root = arc_node.parent.replace_leaf(arc_node.parent.right, root)
+            sibling = arc_node.parent.right
+            root = arc_node.parent.replace_leaf(sibling, root)
             removed = arc_node.parent.data
             right = removed
-            root = Tree.balance_and_propagate(root)
-            left_breakpoint = Breakpoint(breakpoint=(predecessor.get_value().origin, arc_node.get_value().origin))
+            root = Tree.update_and_balance(sibling.parent or sibling)
+            left_breakpoint = Breakpoint(breakpoint=(predecessor.get_value().origin, arc_node.get_value().origin),
+                                         precision=precision)
             query = InternalNode(left_breakpoint)
             compare = lambda x, y: hasattr(x, "breakpoint") and x.breakpoint == y.breakpoint
             breakpoint: InternalNode = Tree.find_value(root, query, compare, sweep_line=sweep_line)
@@ -192,11 +431,13 @@ class Voronoi:
             updated = breakpoint.data if breakpoint is not None else None
             left = updated
         else:
-            root = arc_node.parent.replace_leaf(arc_node.parent.left, root)
+            sibling = arc_node.parent.left
+            root = arc_node.parent.replace_leaf(sibling, root)
             removed = arc_node.parent.data
             left = removed
-            root = Tree.balance_and_propagate(root)
-            right_breakpoint = Breakpoint(breakpoint=(arc_node.get_value().origin, successor.get_value().origin))
+            root = Tree.update_and_balance(sibling.parent or sibling)
+            right_breakpoint = Breakpoint(breakpoint=(arc_node.get_value().origin, successor.get_value().origin),
+                                          precision=precision)
             query = InternalNode(right_breakpoint)
             compare = lambda x, y: hasattr(x, "breakpoint") and x.breakpoint == y.breakpoint
             breakpoint: InternalNode = Tree.find_value(root, query, compare, sweep_line=sweep_line)
@@ -208,11 +449,21 @@ class Voronoi:
 
     def clean_up_zero_length_edges(self):
         resulting_edges = []
+        merged = set()
+        tolerance = self.precision.tolerance()
+        # Exact mode computes circle centres exactly, so two of them coincide only when equal.
+        # The vertices clipping adds on the bounding polygon, and the delaunay engine's
+        # circumcentres, are still rounded and keep the tolerance.
+        boundary = None
+        if self.precision.exact and self.engine != "delaunay":
+            boundary = set(self.bounding_poly.polygon_vertices)
         for edge in self.edges:
             start = edge.get_origin()
             end = edge.twin.get_origin()
-            # Use epsilon comparison for floating-point equality
-            if start and end and abs(start.x - end.x) < 1e-10 and abs(start.y - end.y) < 1e-10:
+            limit = tolerance
+            if boundary is not None and edge.origin not in boundary and edge.twin.origin not in boundary:
+                limit = 0
+            if start and end and abs(start.x - end.x) <= limit and abs(start.y - end.y) <= limit:
                 v1: Vertex = edge.origin
                 v2: Vertex = edge.twin.origin
                 for connected in list(v1.connected_edges):  # Use a copy of the list
@@ -220,10 +471,13 @@ class Voronoi:
                     if connected in v1.connected_edges:  # Check if it's still in the list
                         v1.connected_edges.remove(connected)
                     v2.connected_edges.append(connected)
-                if v1 in self._vertices:  # Check if it's in the set
-                    self._vertices.remove(v1)
+                merged.add(v1)
                 edge.delete()
                 edge.twin.delete()
             else:
                 resulting_edges.append(edge)
-        self.edges = resulting_edges
\ No newline at end of file
+        self.edges = resulting_edges
+        if merged:
+            # finish_polygon leaves a list here, so drop merged vertices in one pass
+            # rather than with a linear search each
+            self._vertices = type(self._vertices)(v for v in self._vertices if v not in merged)
\ No newline at end of file